@@ -1,8 +1,19 @@
 from typing import Optional
 from telethon import TelegramClient, events
+import signal
 import asyncio
 import logging
 from core.config_manager import config_manager
+from core.outbox import outbox
+from core.token_index import seen_tokens
+from core.async_db import adb
+from core.spool import spool
+from core.chat_executor import ChatExecutor
+from core.admission import admission
+from core.chat_filter import chat_filter, FilteredNewMessage
+from core.profiler import LoopWatchdog, Profiler
+from core.memory_monitor import MemoryMonitor
+from core.session import BufferedSession
 from handlers.message_handler import MessageHandler
 
 # 配置日志
@@ -21,8 +32,13 @@ class Tgbot:
     Attributes:
         api_id (int): Telegram API ID
         api_hash (str): Telegram API Hash
+        session (BufferedSession): 写合并的会话存储
         client (TelegramClient): Telegram客户端实例
         message_handler (MessageHandler): 消息处理器实例
+        executor (ChatExecutor): 按聊天有序分发消息的执行器
+        watchdog (LoopWatchdog): 事件循环阻塞看门狗
+        profiler (Profiler): 按需启动的性能分析器
+        memory_monitor (Optional[MemoryMonitor]): 内存泄漏检测器，未启用时为None
     """
 
     def __init__(self, api_id: int, api_hash: str) -> None:
@@ -42,12 +58,41 @@ class Tgbot:
             
         self.api_id = api_id
         self.api_hash = api_hash
-        self.client = TelegramClient(
+        memory_settings = config_manager.memory_settings
+        self.session = BufferedSession(
             "my_bot_session",
+            flush_interval=config_manager.session_flush_interval,
+            max_entities=memory_settings['session_max_entities']
+        )
+        self.client = TelegramClient(
+            self.session,
             self.api_id,
-            self.api_hash
+            self.api_hash,
+            entity_cache_limit=memory_settings['entity_cache_limit']
         )
         self.message_handler = MessageHandler(self.client)
+        self.executor = ChatExecutor(
+            self.message_handler.handle_message,
+            **config_manager.executor_settings
+        )
+        self.profiler_settings = config_manager.profiler_settings
+        self.watchdog = LoopWatchdog(
+            interval=self.profiler_settings['watchdog_interval'],
+            threshold=self.profiler_settings['watchdog_threshold']
+        )
+        self.profiler = Profiler(
+            duration=self.profiler_settings['duration'],
+            sample_interval=self.profiler_settings['sample_interval'],
+            output_dir=self.profiler_settings['output_dir']
+        )
+        self.memory_monitor: Optional[MemoryMonitor] = None
+        if memory_settings['enabled']:
+            self.memory_monitor = MemoryMonitor(
+                interval=memory_settings['snapshot_interval'],
+                top_n=memory_settings['top_n'],
+                frames=memory_settings['frames'],
+                rss_budget_mb=memory_settings['rss_budget_mb']
+            )
 
     async def start(self) -> None:
         """启动客户端并处理登录流程
@@ -58,20 +103,38 @@ class Tgbot:
         """
         try:
             logger.info("正在连接Telegram服务器...")
+            self.watchdog.start()
+            if self.memory_monitor:
+                self.memory_monitor.start()
+            self.profiler.install_signal_handler()
+            if self.profiler_settings['profile_on_start']:
+                self.profiler.start()
             await self.client.start()
             
             if not await self.client.is_user_authorized():
                 logger.info("检测到未认证用户，开始认证流程...")
                 await self._handle_authentication()
             
+            self.session.start_autoflush()
+            adb.start()
+            await spool.start()
+
             # 设置全局客户端实例
-            from handlers.str_handler import TelegramSender
+            from handlers.str_handler import TelegramSender, release_failed_tokens
             TelegramSender.set_client(self.client)
 
-            # 添加消息处理器
+            # 启动发件箱调度，重放上次未完成的发送；最终失败的令牌发送撤销其发送记录
+            outbox.add_failure_listener(release_failed_tokens)
+            await outbox.start(self.client)
+            await seen_tokens.start()
+            await self.executor.start()
+            await admission.start(lambda: self.executor.pending)
+            chat_filter.start(self.client)
+
+            # 添加消息处理器：屏蔽的聊天在分发前丢弃，其余经准入控制后由执行器按聊天有序处理
             self.client.add_event_handler(
-                self.message_handler.handle_message,
-                events.NewMessage()
+                self._on_new_message,
+                FilteredNewMessage(chat_filter)
             )
             
             logger.info("机器人启动成功，正在监听消息...")
@@ -85,6 +148,16 @@ class Tgbot:
             logger.error(f"启动机器人时发生未知错误: {str(e)}", exc_info=True)
             raise
 
+    async def _on_new_message(self, event: events.NewMessage.Event) -> None:
+        """新消息入口：过载时丢弃低优先级聊天的消息，其余交给执行器
+        
+        Args:
+            event: 新消息事件对象
+        """
+        if not admission.admit(event.chat_id):
+            return
+        await self.executor.submit(event)
+
     async def _handle_authentication(self) -> None:
         """处理用户认证流程
         
@@ -114,11 +187,34 @@ class Tgbot:
             raise RuntimeError("认证失败") from e
 
     async def stop(self) -> None:
-        """停止客户端连接
+        """依次停止各组件并断开客户端连接
+
+        各组件的停止互不影响：某个组件停止失败时记录错误并继续停止其余组件，
+        执行器排空、发件箱与缓冲区的剩余写入都会在关闭数据库之前完成。
         
         Raises:
             ConnectionError: 当断开连接失败时抛出
         """
+        logger.info("正在停止机器人...")
+        steps = (
+            ('聊天过滤', chat_filter.stop),
+            ('执行器', self.executor.stop),
+            ('准入控制', admission.stop),
+            ('发件箱', outbox.stop),
+            ('消息缓冲区', spool.stop),
+            ('数据库', adb.close),
+            ('性能分析', self.profiler.finish),
+            ('看门狗', self.watchdog.stop),
+        )
+        if self.memory_monitor:
+            steps += (('内存监控', self.memory_monitor.stop),)
+        for name, step in steps:
+            try:
+                result = step()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"停止{name}时出错: {str(e)}", exc_info=True)
         try:
             logger.info("正在断开Telegram连接...")
             await self.client.disconnect()
@@ -126,26 +222,61 @@ class Tgbot:
         except ConnectionError as e:
             logger.error(f"断开连接失败: {str(e)}")
             raise
-        except Exception as e:
-            logger.error(f"停止机器人时发生未知错误: {str(e)}", exc_info=True)
-            raise
+
+    def _install_stop_handlers(self) -> None:
+        """收到 SIGINT/SIGTERM 时断开客户端，使 run 退出等待并执行 stop"""
+        loop = self.client.loop
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._request_stop, signum)
+            except (NotImplementedError, RuntimeError) as e:
+                logger.warning(f"注册停止信号处理器失败: {str(e)}")
+
+    def _remove_stop_handlers(self) -> None:
+        """移除 SIGINT/SIGTERM 处理器，恢复默认行为"""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.client.loop.remove_signal_handler(signum)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def _request_stop(self, signum: int) -> None:
+        """信号处理器：断开客户端连接
+
+        Args:
+            signum: 收到的信号编号
+        """
+        logger.info(f"接收到信号 {signum}，正在停止机器人...")
+        self.client.loop.create_task(self.client.disconnect())
 
     def run(self) -> None:
         """运行机器人的主方法
+
+        自行等待客户端断开（而不是 run_until_disconnected，其内部会吞掉 KeyboardInterrupt），
+        无论正常断开、收到中断信号还是运行出错，退出前都会执行 stop。
         
         Raises:
             SystemExit: 当程序异常退出时抛出
         """
+        loop = self.client.loop
+        code = 0
         try:
             logger.info("正在启动Telegram机器人...")
-            self.client.loop.run_until_complete(self.start())
+            loop.run_until_complete(self.start())
+            self._install_stop_handlers()
             logger.info("机器人已成功运行，等待消息...")
-            self.client.run_until_disconnected()
+            loop.run_until_complete(self.client.disconnected)
         except KeyboardInterrupt:
-            logger.info("\n接收到中断信号，正在停止机器人...")
-            self.client.loop.run_until_complete(self.stop())
-            logger.info("机器人已成功停止！")
-            raise SystemExit(0)
+            logger.info("接收到中断信号，正在停止机器人...")
         except Exception as e:
             logger.critical(f"机器人运行出错: {str(e)}", exc_info=True)
-            raise SystemExit(1) from e
+            code = 1
+        finally:
+            self._remove_stop_handlers()
+            try:
+                loop.run_until_complete(self.stop())
+            except Exception as e:
+                logger.error(f"停止机器人时发生错误: {str(e)}", exc_info=True)
+        if code:
+            raise SystemExit(code)
+        logger.info("机器人已成功停止！")
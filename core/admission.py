@@ -0,0 +1,292 @@
+"""准入控制模块
+
+该模块根据执行器队列深度与事件循环延迟判断负载等级，在过载时逐级降级处理流程：
+1. 关闭控制台详细输出
+2. 延后仅含媒体消息的数据库持久化（仅在消息缓冲区不可用或已满时；写入缓冲区本身不产生系统调用，无需延后）
+3. 延后 target_channel 镜像转发（仍处理模式匹配的机器人发送）
+4. 丢弃低优先级聊天的消息
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from core.config_manager import config_manager
+from core.async_db import adb
+from core.outbox import outbox
+from core.spool import spool
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 负载等级
+LEVEL_NORMAL = 0
+LEVEL_QUIET = 1
+LEVEL_DEFER_MEDIA = 2
+LEVEL_DEFER_MIRROR = 3
+LEVEL_SHED = 4
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: '正常',
+    LEVEL_QUIET: '静默输出',
+    LEVEL_DEFER_MEDIA: '延后媒体持久化',
+    LEVEL_DEFER_MIRROR: '延后镜像转发',
+    LEVEL_SHED: '丢弃低优先级消息'
+}
+
+class AdmissionController:
+    """过载时逐级降级的准入控制器
+
+    负载等级取队列深度与事件循环延迟各自对应等级中的较高者；升级立即生效，
+    降级每个检测周期最多回落一级，避免在阈值附近来回抖动。
+
+    Attributes:
+        interval (float): 检测周期（秒）
+        depth_thresholds (List[int]): 进入第1~4级的队列深度阈值
+        lag_thresholds (List[float]): 进入第1~4级的事件循环延迟阈值（秒）
+        log_sample_rate (int): 每种降级决策每发生多少次记录一次日志
+        max_deferred (int): 延后持久化的消息数上限，超过后立即写入
+        low_priority_chats (Set[int]): 低优先级聊天ID集合，最高负载等级时被丢弃
+        high_priority_chats (Set[int]): 高优先级聊天ID集合，不参与延后持久化与延后镜像
+        level (int): 当前负载等级
+        loop_lag (float): 最近一次测得的事件循环延迟（秒）
+        counters (Dict[str, int]): 各类降级决策计数
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        depth_thresholds: Sequence[int] = (200, 500, 1000, 2000),
+        lag_thresholds: Sequence[float] = (0.2, 0.5, 1.0, 2.0),
+        log_sample_rate: int = 100,
+        max_deferred: int = 10000,
+        low_priority_chats: Sequence[int] = (),
+        high_priority_chats: Sequence[int] = ()
+    ) -> None:
+        """初始化准入控制器
+
+        Args:
+            interval: 检测周期（秒），默认为1.0
+            depth_thresholds: 进入第1~4级的队列深度阈值
+            lag_thresholds: 进入第1~4级的事件循环延迟阈值（秒）
+            log_sample_rate: 每种降级决策每发生多少次记录一次日志，默认为100
+            max_deferred: 延后持久化的消息数上限，默认为10000
+            low_priority_chats: 低优先级聊天ID列表
+            high_priority_chats: 高优先级聊天ID列表
+
+        Raises:
+            ValueError: 当阈值数量不为4时抛出
+        """
+        if len(depth_thresholds) != LEVEL_SHED or len(lag_thresholds) != LEVEL_SHED:
+            raise ValueError(f"阈值数量必须为 {LEVEL_SHED}")
+
+        self.interval = interval
+        self.depth_thresholds = list(depth_thresholds)
+        self.lag_thresholds = list(lag_thresholds)
+        self.log_sample_rate = max(1, log_sample_rate)
+        self.max_deferred = max_deferred
+        self.low_priority_chats = set(low_priority_chats)
+        self.high_priority_chats = set(high_priority_chats)
+        self.level = LEVEL_NORMAL
+        self.loop_lag = 0.0
+        self.counters: Dict[str, int] = {
+            'verbose_suppressed': 0,
+            'media_deferred': 0,
+            'mirror_deferred': 0,
+            'shed': 0
+        }
+        self._depth: Callable[[], int] = lambda: 0
+        self._deferred_messages: List[Dict[str, Any]] = []
+        self._saved_log_level: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def verbose(self) -> bool:
+        """是否允许控制台详细输出"""
+        if self.level < LEVEL_QUIET:
+            return True
+        self._count('verbose_suppressed')
+        return False
+
+    def admit(self, chat_id: int) -> bool:
+        """判断是否接收来自指定聊天的消息
+
+        Args:
+            chat_id: 聊天ID
+
+        Returns:
+            bool: 是否接收
+        """
+        if self.level >= LEVEL_SHED and chat_id in self.low_priority_chats:
+            self._count('shed', chat_id)
+            return False
+        return True
+
+    async def persist(self, data: Dict[str, Any], media_only: bool) -> None:
+        """保存消息：优先写入消息缓冲区，缓冲区不可用时过载期间在内存中延后仅含媒体的消息
+
+        写入缓冲区的消息在崩溃后可以重放，因此只有缓冲区未启用或已满时才会在内存中延后。
+
+        Args:
+            data: 消息数据字典
+            media_only: 是否为不含文字的媒体消息
+
+        Raises:
+            ValueError: 当输入数据无效时抛出
+        """
+        if spool.append(data):
+            return
+        chat_id = data.get('chat_id')
+        if (
+            media_only
+            and self.level >= LEVEL_DEFER_MEDIA
+            and chat_id not in self.high_priority_chats
+        ):
+            self._deferred_messages.append(data)
+            self._count('media_deferred', chat_id)
+            if len(self._deferred_messages) >= self.max_deferred:
+                await self._flush_deferred_messages()
+            return
+        await adb.save_message(data)
+
+    def defer_mirror(self, chat_id: int) -> bool:
+        """是否延后 target_channel 镜像转发
+
+        Args:
+            chat_id: 来源聊天ID
+
+        Returns:
+            bool: 为真时镜像转发应以延后状态写入发件箱
+        """
+        if self.level < LEVEL_DEFER_MIRROR or chat_id in self.high_priority_chats:
+            return False
+        self._count('mirror_deferred', chat_id)
+        return True
+
+    def _count(self, decision: str, chat_id: Optional[int] = None) -> None:
+        """记录一次降级决策，并按采样率输出日志
+
+        Args:
+            decision: 决策类型
+            chat_id: 相关聊天ID
+        """
+        self.counters[decision] += 1
+        count = self.counters[decision]
+        if count % self.log_sample_rate == 1 or self.log_sample_rate == 1:
+            source = f"，聊天 {chat_id}" if chat_id is not None else ""
+            logger.warning(
+                f"负载等级 {self.level} ({LEVEL_NAMES[self.level]})：{decision}{source}，累计 {count} 次"
+            )
+
+    async def start(self, depth: Callable[[], int]) -> None:
+        """启动负载检测任务
+
+        Args:
+            depth: 返回当前待处理事件数量的函数
+        """
+        self._depth = depth
+        self._task = asyncio.create_task(self._monitor())
+        logger.info("准入控制器已启动")
+
+    async def stop(self) -> None:
+        """停止负载检测任务并写入所有延后的消息"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._set_level(LEVEL_NORMAL)
+        await self._flush_deferred_messages()
+        logger.info(f"准入控制器已停止，降级决策统计: {self.counters}")
+
+    async def _monitor(self) -> None:
+        """周期性测量事件循环延迟与队列深度并调整负载等级"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(0.0, loop.time() - started - self.interval)
+            try:
+                target = max(
+                    self._level_for(self._depth(), self.depth_thresholds),
+                    self._level_for(self.loop_lag, self.lag_thresholds)
+                )
+                if target > self.level:
+                    self._set_level(target)
+                elif target < self.level:
+                    self._set_level(self.level - 1)
+            except Exception as e:
+                logger.error(f"调整负载等级失败: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def _level_for(value: float, thresholds: List[Any]) -> int:
+        """根据阈值计算负载等级
+
+        Args:
+            value: 测量值
+            thresholds: 升序排列的阈值列表
+
+        Returns:
+            int: 对应的负载等级
+        """
+        level = LEVEL_NORMAL
+        for index, threshold in enumerate(thresholds, start=1):
+            if value >= threshold:
+                level = index
+        return level
+
+    def _set_level(self, level: int) -> None:
+        """切换负载等级并执行进入/退出各等级时的动作
+
+        Args:
+            level: 新的负载等级
+        """
+        previous = self.level
+        if level == previous:
+            return
+        self.level = level
+
+        root = logging.getLogger()
+        if level >= LEVEL_QUIET and self._saved_log_level is None:
+            self._saved_log_level = root.level
+            root.setLevel(logging.WARNING)
+        elif level < LEVEL_QUIET and self._saved_log_level is not None:
+            root.setLevel(self._saved_log_level)
+            self._saved_log_level = None
+
+        loop = asyncio.get_running_loop()
+        if level < LEVEL_DEFER_MEDIA <= previous:
+            loop.create_task(self._flush_deferred_messages())
+        if level < LEVEL_DEFER_MIRROR <= previous:
+            loop.create_task(self._release_deferred_mirrors())
+
+        log = logger.warning if level > previous else logger.info
+        log(
+            f"负载等级 {previous} -> {level} ({LEVEL_NAMES[level]})，"
+            f"队列深度 {self._depth()}，事件循环延迟 {self.loop_lag:.3f}s"
+        )
+
+    async def _release_deferred_mirrors(self) -> None:
+        """释放延后的镜像转发"""
+        try:
+            await outbox.release_deferred()
+        except Exception as e:
+            logger.error(f"释放延后的镜像转发失败: {str(e)}")
+
+    async def _flush_deferred_messages(self) -> None:
+        """写入延后的消息（优先写入消息缓冲区，不可用时批量写入数据库）
+
+        写入数据库失败时未写入的消息放回延后队列头部，等待下次写入。
+        """
+        if not self._deferred_messages:
+            return
+        batch, self._deferred_messages = self._deferred_messages, []
+        batch = [data for data in batch if not spool.append(data)]
+        if not batch:
+            return
+        try:
+            await adb.save_messages(batch)
+        except Exception as e:
+            self._deferred_messages[:0] = batch
+            logger.error(f"写入延后的 {len(batch)} 条消息失败，已放回延后队列: {str(e)}")
+
+# 创建全局准入控制器实例
+admission = AdmissionController(**config_manager.admission_settings)
@@ -0,0 +1,552 @@
+"""异步数据库访问模块
+
+该模块为事件循环提供可 await 的数据库接口：
+1. 所有写操作交给单个专用写线程，按批合并到同一事务中提交；
+   发件箱、令牌索引等需要逐行结果的写入以函数形式提交到同一写线程（call）
+2. 读操作在线程池中执行，每个线程持有一个只读连接（WAL模式下读写互不阻塞）
+各连接都启用语句缓存，固定的SQL语句只会预编译一次；
+启用压缩时消息文本在入队前压缩，只读连接通过 message_text 函数解压
+"""
+
+import time
+import queue
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from core.config_manager import config_manager
+from core.compression import MessageCodec
+from core.db_handler import (
+    INSERT_MESSAGE_SQL, RECENT_MESSAGES_SQL, SEARCH_MESSAGES_SQL, message_to_row
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个连接缓存的预编译语句数量
+STATEMENT_CACHE_SIZE = 256
+
+# 写队列已满时重试入队的间隔（秒）
+WRITE_QUEUE_POLL_INTERVAL = 0.005
+
+# 写队列已满的警告日志最小间隔（秒）
+WRITE_QUEUE_WARNING_INTERVAL = 60.0
+
+COUNT_MESSAGES_SQL = 'SELECT COUNT(*) FROM messages'
+COUNT_CHAT_MESSAGES_SQL = 'SELECT COUNT(*) FROM messages WHERE chat_id = ?'
+
+# 写请求: (sql, 参数, 是否executemany, 结果future, 事件循环)
+# sql 为None时参数为 (sql, 参数, 是否executemany) 语句列表，作为一个整体执行；
+# sql 为函数时以 func(conn, *参数) 的形式在写线程中调用
+WriteRequest = Tuple[
+    Union[None, str, Callable[..., Any]], Any, bool, asyncio.Future, asyncio.AbstractEventLoop
+]
+Statement = Tuple[str, Any, bool]
+
+class AsyncDatabase:
+    """异步数据库门面
+
+    Attributes:
+        db_path (str): 数据库文件路径
+        readers (int): 只读连接线程数量
+        batch_size (int): 写线程单个事务最多合并的写请求数
+        max_pending_writes (int): 写队列中最多排队的写请求数，0 表示不限制
+        write_waits (int): 因写队列已满而等待的写请求数
+        codec (MessageCodec): 消息文本编解码器
+    """
+
+    def __init__(
+        self,
+        db_path: str = 'data/messages.db',
+        readers: int = 4,
+        batch_size: int = 256,
+        max_pending_writes: int = 0,
+        compress: bool = False,
+        compression_level: int = 3
+    ) -> None:
+        """初始化异步数据库门面（线程在首次使用时启动）
+
+        Args:
+            db_path: 数据库文件路径，默认为'data/messages.db'
+            readers: 只读连接线程数量，默认为4
+            batch_size: 写线程单个事务最多合并的写请求数，默认为256
+            max_pending_writes: 写队列中最多排队的写请求数，队列已满时写操作等待空位，默认为0（不限制）
+            compress: 是否压缩新写入的消息文本，默认为False
+            compression_level: zstd 压缩级别，默认为3
+        """
+        self.db_path = db_path
+        self.readers = readers
+        self.batch_size = batch_size
+        self.max_pending_writes = max_pending_writes
+        self.write_waits = 0
+        self.codec = MessageCodec(db_path, compress, compression_level)
+        self._writes: "queue.Queue[Optional[WriteRequest]]" = queue.Queue(maxsize=max_pending_writes)
+        self._write_waiters: Deque[object] = deque()
+        self._last_full_warning = 0.0
+        self._writer: Optional[threading.Thread] = None
+        self._writer_ready = threading.Event()
+        self._reader_pool: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """启动写线程与只读线程池
+
+        Raises:
+            RuntimeError: 当写连接初始化失败时抛出
+        """
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer_ready.clear()
+            self._writer = threading.Thread(target=self._write_loop, name='db-writer', daemon=True)
+            self._writer.start()
+            self._reader_pool = ThreadPoolExecutor(
+                max_workers=self.readers,
+                thread_name_prefix='db-reader'
+            )
+        self._writer_ready.wait()
+        if not self._writer.is_alive():
+            self._writer = None
+            raise RuntimeError("数据库写线程启动失败")
+        logger.info(f"异步数据库已启动: 1 个写线程，{self.readers} 个只读线程")
+
+    def close(self) -> None:
+        """等待已提交的写请求完成后关闭所有连接"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            pool, self._reader_pool = self._reader_pool, None
+        if writer is None:
+            return
+        self._writes.put(None)
+        writer.join()
+        if pool:
+            pool.shutdown(wait=True)
+        for conn in self._reader_conns:
+            conn.close()
+        self._reader_conns = []
+        logger.info("异步数据库已关闭")
+
+    # 写操作
+
+    def _write_loop(self) -> None:
+        """写线程：合并排队的写请求，每批在一个事务中提交"""
+        try:
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        except sqlite3.Error as e:
+            logger.error(f"数据库写连接初始化失败: {str(e)}")
+            self._writer_ready.set()
+            return
+        self._writer_ready.set()
+
+        running = True
+        while running:
+            batch: List[WriteRequest] = []
+            request = self._writes.get()
+            while request is not None:
+                batch.append(request)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    request = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+            if request is None:
+                running = False
+            if batch:
+                self._apply_batch(conn, batch)
+        conn.close()
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: List[WriteRequest]) -> None:
+        """在一个事务中执行一批写请求，单条失败不影响同批其他请求
+
+        每个请求在各自的保存点中执行，失败的请求（包括执行到一半的 executemany）
+        其写入全部回滚，不会随同批其他请求一起提交。
+
+        Args:
+            conn: 写连接
+            batch: 写请求列表
+        """
+        results: List[Tuple[WriteRequest, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute('BEGIN')
+            for request in batch:
+                sql, params, many, _, _ = request
+                try:
+                    if sql is None:
+                        results.append((request, self._apply_group(conn, params), None))
+                        continue
+                    if callable(sql):
+                        results.append((request, self._apply_call(conn, sql, params), None))
+                        continue
+                    results.append((request, self._apply_statement(conn, sql, params, many), None))
+                except Exception as e:
+                    # 写函数可能抛出非sqlite3异常，不能让写线程退出
+                    results.append((request, None, e))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            logger.error(f"提交写事务失败: {str(e)}")
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            results = [(request, None, e) for request in batch]
+
+        for (_, _, _, future, loop), result, error in results:
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, result, error)
+            except RuntimeError:
+                # 事件循环已关闭，调用方已不再等待结果
+                pass
+
+    @staticmethod
+    def _apply_statement(conn: sqlite3.Connection, sql: str, params: Any, many: bool) -> Any:
+        """在保存点中执行单条语句，失败时其写入全部回滚
+
+        Args:
+            conn: 写连接（已在事务中）
+            sql: SQL语句
+            params: 参数（many为真时为参数序列）
+            many: 是否使用executemany
+
+        Returns:
+            Any: 单条写入返回lastrowid，批量写入返回rowcount
+
+        Raises:
+            Exception: 当语句执行失败时抛出（其写入已回滚）
+        """
+        conn.execute('SAVEPOINT write_statement')
+        try:
+            cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+        except Exception:
+            conn.execute('ROLLBACK TO write_statement')
+            conn.execute('RELEASE write_statement')
+            raise
+        conn.execute('RELEASE write_statement')
+        return cursor.rowcount if many else cursor.lastrowid
+
+    @staticmethod
+    def _apply_group(conn: sqlite3.Connection, statements: List[Statement]) -> int:
+        """在保存点中执行一组语句，任一语句失败时整组回滚
+
+        Args:
+            conn: 写连接（已在事务中）
+            statements: 语句列表
+
+        Returns:
+            int: 执行的语句数
+
+        Raises:
+            Exception: 当任一语句失败时抛出（整组已回滚）
+        """
+        conn.execute('SAVEPOINT write_group')
+        try:
+            for sql, params, many in statements:
+                if many:
+                    conn.executemany(sql, params)
+                else:
+                    conn.execute(sql, params)
+        except Exception:
+            conn.execute('ROLLBACK TO write_group')
+            conn.execute('RELEASE write_group')
+            raise
+        conn.execute('RELEASE write_group')
+        return len(statements)
+
+    @staticmethod
+    def _apply_call(conn: sqlite3.Connection, func: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        """在保存点中调用写函数，函数抛出异常时其写入全部回滚
+
+        Args:
+            conn: 写连接（已在事务中）
+            func: 写函数，以 func(conn, *args) 的形式调用
+            args: 写函数的其他参数
+
+        Returns:
+            Any: 写函数的返回值
+
+        Raises:
+            Exception: 当写函数执行失败时抛出（其写入已回滚）
+        """
+        conn.execute('SAVEPOINT write_call')
+        try:
+            result = func(conn, *args)
+        except Exception:
+            conn.execute('ROLLBACK TO write_call')
+            conn.execute('RELEASE write_call')
+            raise
+        conn.execute('RELEASE write_call')
+        return result
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+        """在事件循环线程中设置写请求的结果
+
+        Args:
+            future: 写请求对应的future
+            result: 执行结果
+            error: 执行异常
+        """
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(f"数据库写入失败: {error}"))
+        else:
+            future.set_result(result)
+
+    async def _submit_write(self, sql: Union[None, str, Callable[..., Any]], params: Any, many: bool) -> Any:
+        """提交写请求并等待写线程提交
+
+        Args:
+            sql: SQL语句
+            params: 参数（many为真时为参数序列）
+            many: 是否使用executemany
+
+        Returns:
+            Any: 单条写入返回lastrowid，批量写入返回rowcount
+        """
+        if self._writer is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request = (sql, params, many, future, loop)
+        if self._write_waiters or not self._offer_write(request):
+            await self._wait_for_write_slot(request)
+        return await future
+
+    def _offer_write(self, request: WriteRequest) -> bool:
+        """尝试将写请求放入写队列
+
+        Args:
+            request: 写请求
+
+        Returns:
+            bool: 入队成功返回True，队列已满返回False
+        """
+        try:
+            self._writes.put_nowait(request)
+        except queue.Full:
+            return False
+        return True
+
+    async def _wait_for_write_slot(self, request: WriteRequest) -> None:
+        """写队列已满时按到达顺序等待空位，不阻塞事件循环
+
+        Args:
+            request: 写请求
+        """
+        self.write_waits += 1
+        now = time.monotonic()
+        if now - self._last_full_warning >= WRITE_QUEUE_WARNING_INTERVAL:
+            self._last_full_warning = now
+            logger.warning(
+                f"数据库写队列已满（{self.max_pending_writes}），写操作等待写线程处理，"
+                f"累计等待 {self.write_waits} 次"
+            )
+        token = object()
+        self._write_waiters.append(token)
+        try:
+            while not (self._write_waiters[0] is token and self._offer_write(request)):
+                await asyncio.sleep(WRITE_QUEUE_POLL_INTERVAL)
+        finally:
+            self._write_waiters.remove(token)
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        """执行单条写语句
+
+        Args:
+            sql: SQL语句
+            params: 参数
+
+        Returns:
+            Any: lastrowid
+
+        Raises:
+            RuntimeError: 当写入失败时抛出
+        """
+        return await self._submit_write(sql, tuple(params), False)
+
+    async def executemany(self, sql: str, seq: Iterable[Sequence[Any]]) -> int:
+        """批量执行写语句
+
+        Args:
+            sql: SQL语句
+            seq: 参数序列
+
+        Returns:
+            int: 受影响的行数
+
+        Raises:
+            RuntimeError: 当写入失败时抛出
+        """
+        return await self._submit_write(sql, list(seq), True)
+
+    async def execute_group(self, statements: Sequence[Statement]) -> int:
+        """原子地执行一组写语句（全部成功或全部回滚）
+
+        Args:
+            statements: (sql, 参数, 是否executemany) 列表
+
+        Returns:
+            int: 执行的语句数
+
+        Raises:
+            RuntimeError: 当写入失败时抛出
+        """
+        return await self._submit_write(None, list(statements), False)
+
+    async def call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在写线程的事务中调用写函数，用于需要逐行结果或读写一致的操作
+
+        写函数与其他写请求按提交顺序串行执行，不应执行耗时的非数据库操作。
+
+        Args:
+            func: 写函数，以 func(conn, *args) 的形式调用
+            *args: 写函数的其他参数
+
+        Returns:
+            Any: 写函数的返回值
+
+        Raises:
+            RuntimeError: 当写函数执行失败时抛出
+        """
+        return await self._submit_write(func, args, False)
+
+    async def save_message(self, data: Dict[str, Any]) -> None:
+        """保存消息数据到数据库
+
+        Args:
+            data: 包含消息数据的字典
+
+        Raises:
+            ValueError: 当输入数据无效时抛出
+            RuntimeError: 当保存消息失败时抛出
+        """
+        await self.execute(INSERT_MESSAGE_SQL, message_to_row(data, self.codec))
+
+    async def save_messages(self, batch: List[Dict[str, Any]]) -> None:
+        """在单个事务中批量保存消息数据
+
+        Args:
+            batch: 消息数据字典列表
+
+        Raises:
+            ValueError: 当输入数据无效时抛出
+            RuntimeError: 当保存消息失败时抛出
+        """
+        if batch:
+            await self.executemany(INSERT_MESSAGE_SQL, [message_to_row(data, self.codec) for data in batch])
+
+    # 读操作
+
+    def _reader_conn(self) -> sqlite3.Connection:
+        """获取当前只读线程的连接，不存在时创建
+
+        Returns:
+            sqlite3.Connection: 只读连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA query_only = ON')
+            self.codec.install(conn)
+            self._local.conn = conn
+            with self._lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    def _read(self, sql: str, params: Sequence[Any]) -> List[sqlite3.Row]:
+        """在只读线程中执行查询
+
+        Args:
+            sql: SQL语句
+            params: 参数
+
+        Returns:
+            List[sqlite3.Row]: 查询结果
+        """
+        return self._reader_conn().execute(sql, params).fetchall()
+
+    async def fetch_all(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        """执行只读查询并返回所有结果
+
+        Args:
+            sql: SQL语句
+            params: 参数
+
+        Returns:
+            List[sqlite3.Row]: 查询结果
+
+        Raises:
+            RuntimeError: 当查询失败时抛出
+        """
+        if self._reader_pool is None:
+            self.start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._reader_pool, self._read, sql, tuple(params)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"数据库查询失败: {str(e)}")
+            raise RuntimeError("数据库查询失败") from e
+
+    async def count_messages(self, chat_id: Optional[int] = None) -> int:
+        """统计消息数量
+
+        Args:
+            chat_id: 聊天ID，为None时统计全部消息
+
+        Returns:
+            int: 消息数量
+        """
+        if chat_id is None:
+            rows = await self.fetch_all(COUNT_MESSAGES_SQL)
+        else:
+            rows = await self.fetch_all(COUNT_CHAT_MESSAGES_SQL, (chat_id,))
+        return rows[0][0]
+
+    async def recent_messages(self, chat_id: int, limit: int = 20) -> List[sqlite3.Row]:
+        """获取聊天最近的消息
+
+        Args:
+            chat_id: 聊天ID
+            limit: 返回数量上限，默认为20
+
+        Returns:
+            List[sqlite3.Row]: 按时间倒序的消息
+        """
+        return await self.fetch_all(RECENT_MESSAGES_SQL, (chat_id, limit))
+
+    async def search_messages(self, keyword: str, limit: int = 20) -> List[sqlite3.Row]:
+        """按关键词搜索消息
+
+        Args:
+            keyword: 关键词
+            limit: 返回数量上限，默认为20
+
+        Returns:
+            List[sqlite3.Row]: 按时间倒序的匹配消息
+        """
+        return await self.fetch_all(SEARCH_MESSAGES_SQL, (f"%{keyword}%", limit))
+
+# 创建全局异步数据库实例
+adb = AsyncDatabase(
+    **config_manager.async_db_settings,
+    max_pending_writes=config_manager.memory_settings['db_write_queue'],
+    compress=config_manager.compression_settings['enabled'],
+    compression_level=config_manager.compression_settings['level']
+)
@@ -0,0 +1,237 @@
+"""聊天事件执行器模块
+
+该模块位于 events.NewMessage 与 MessageHandler 之间，按 chat_id 建立有序队列：
+同一聊天内的消息严格按顺序处理，不同聊天在全局工作者上限内并行处理
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Set, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+class ChatExecutor:
+    """按聊天分组、跨聊天并行的事件执行器
+
+    每个聊天同一时刻最多只被一个工作者处理，工作者每处理一条消息后
+    将该聊天放回就绪队列末尾，避免单个高频聊天饿死其他聊天。
+
+    Attributes:
+        handler (Callable[[Any], Awaitable[None]]): 实际处理事件的协程函数
+        max_workers (int): 全局并发工作者上限
+        queue_size (int): 单个聊天的队列容量
+        overflow_policy (str): 队列已满时的策略 ('drop_oldest'、'drop_newest' 或 'block')
+        lag_report_interval (int): 延迟报告间隔（秒），0 表示不报告
+        max_pending (int): 所有聊天待处理事件总数上限，0 表示不限制
+        drain_timeout (float): 停止时等待队列处理完毕的最长时间（秒）
+        dropped (int): 因队列溢出或停止而丢弃的事件数
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        max_workers: int = 8,
+        queue_size: int = 100,
+        overflow_policy: str = 'drop_oldest',
+        lag_report_interval: int = 60,
+        max_pending: int = 0,
+        drain_timeout: float = 10.0
+    ) -> None:
+        """初始化执行器
+
+        Args:
+            handler: 实际处理事件的协程函数
+            max_workers: 全局并发工作者上限，默认为8
+            queue_size: 单个聊天的队列容量，默认为100
+            overflow_policy: 队列已满时的策略，默认为'drop_oldest'
+            lag_report_interval: 延迟报告间隔（秒），默认为60
+            max_pending: 所有聊天待处理事件总数上限，默认为0（不限制）
+            drain_timeout: 停止时等待队列处理完毕的最长时间（秒），默认为10.0
+
+        Raises:
+            ValueError: 当溢出策略无效时抛出
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"无效的溢出策略: {overflow_policy}")
+
+        self.handler = handler
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.lag_report_interval = lag_report_interval
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self.dropped = 0
+        self._pending = 0
+        self._active = 0
+        self._closing = False
+        self._queues: Dict[int, Deque[Tuple[float, Any]]] = {}
+        self._scheduled: Set[int] = set()
+        self._ready: "asyncio.Queue[int]" = asyncio.Queue()
+        self._space = asyncio.Condition()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        """所有聊天中等待处理的事件总数"""
+        return self._pending
+
+    def _full(self, chat_id: int) -> bool:
+        """判断指定聊天的队列或全局待处理总数是否已达上限
+
+        Args:
+            chat_id: 聊天ID
+
+        Returns:
+            bool: 是否已满
+        """
+        if self.max_pending and self._pending >= self.max_pending:
+            return True
+        return len(self._queues.get(chat_id, ())) >= self.queue_size
+
+    async def submit(self, event: Any) -> None:
+        """提交新消息事件（注册为Telethon事件处理器）
+
+        Args:
+            event: 新消息事件对象
+        """
+        chat_id = event.chat_id
+        if self._closing:
+            # 停止过程中到达的事件直接丢弃，不逐条记录日志
+            self.dropped += 1
+            return
+        queue = self._queues.get(chat_id)
+
+        if self._full(chat_id):
+            if self.overflow_policy == 'drop_newest' or (
+                self.overflow_policy == 'drop_oldest' and not queue
+            ):
+                self._record_drop(chat_id)
+                return
+            if self.overflow_policy == 'drop_oldest':
+                queue.popleft()
+                self._pending -= 1
+                self._record_drop(chat_id)
+            else:
+                async with self._space:
+                    await self._space.wait_for(lambda: self._closing or not self._full(chat_id))
+                if self._closing:
+                    self.dropped += 1
+                    return
+
+        queue = self._queues.setdefault(chat_id, deque())
+        queue.append((time.monotonic(), event))
+        self._pending += 1
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._ready.put_nowait(chat_id)
+
+    def _record_drop(self, chat_id: int) -> None:
+        """记录一次溢出丢弃
+
+        Args:
+            chat_id: 发生溢出的聊天ID
+        """
+        self.dropped += 1
+        logger.warning(f"聊天 {chat_id} 队列已满，丢弃一条消息 (累计 {self.dropped})")
+
+    def lag(self) -> Dict[int, float]:
+        """获取每个聊天当前的处理延迟
+
+        Returns:
+            Dict[int, float]: 聊天ID到最早未处理事件等待时长（秒）的映射
+        """
+        now = time.monotonic()
+        return {
+            chat_id: now - queue[0][0]
+            for chat_id, queue in self._queues.items()
+            if queue
+        }
+
+    async def start(self) -> None:
+        """启动工作者与延迟报告任务"""
+        self._closing = False
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.max_workers)
+        ]
+        if self.lag_report_interval > 0:
+            self._tasks.append(asyncio.create_task(self._report_lag()))
+        logger.info(f"聊天执行器已启动 {self.max_workers} 个工作者")
+
+    async def stop(self) -> None:
+        """停止接收新事件，在 drain_timeout 内处理完已排队的事件后停止所有工作者
+
+        超时仍未处理的事件将被丢弃。
+        """
+        self._closing = True
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._drain(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"等待执行器队列处理完毕超时（{self.drain_timeout}s）")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        dropped, self._pending = self._pending, 0
+        self._queues.clear()
+        self._scheduled.clear()
+        self.dropped += dropped
+        async with self._space:
+            self._space.notify_all()
+        logger.info(f"聊天执行器已停止，丢弃 {dropped} 条未处理事件")
+
+    async def _drain(self) -> None:
+        """等待所有已排队与正在处理的事件完成"""
+        while self._pending or self._active:
+            await asyncio.sleep(0.05)
+
+    async def _worker(self, index: int) -> None:
+        """工作者：每次领取一个聊天并处理其最早的一条事件
+
+        Args:
+            index: 工作者编号
+        """
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues.get(chat_id)
+            if not queue:
+                self._scheduled.discard(chat_id)
+                self._queues.pop(chat_id, None)
+                continue
+
+            _, event = queue.popleft()
+            self._pending -= 1
+            if self.overflow_policy == 'block':
+                async with self._space:
+                    self._space.notify_all()
+
+            self._active += 1
+            try:
+                await self.handler(event)
+            except Exception as e:
+                logger.error(f"执行器工作者 {index} 处理聊天 {chat_id} 出错: {str(e)}")
+            finally:
+                self._active -= 1
+
+            if queue:
+                self._ready.put_nowait(chat_id)
+            else:
+                self._scheduled.discard(chat_id)
+                self._queues.pop(chat_id, None)
+
+    async def _report_lag(self) -> None:
+        """定期报告延迟最高的聊天"""
+        while True:
+            await asyncio.sleep(self.lag_report_interval)
+            lags = self.lag()
+            if not lags:
+                continue
+            worst = sorted(lags.items(), key=lambda item: item[1], reverse=True)[:5]
+            summary = ', '.join(f"{chat_id}: {lag:.2f}s" for chat_id, lag in worst)
+            logger.info(f"待处理事件 {self.pending} 条，延迟最高的聊天: {summary}")
@@ -0,0 +1,277 @@
+"""聊天预过滤模块
+
+该模块在Telethon分发事件之前按聊天ID过滤新消息：
+1. 黑名单模式丢弃 blocked_chat_ids 中的聊天，白名单模式只保留 allowed_chat_ids 中的聊天
+2. 过滤集合预先计算为 frozenset，配置文件修改后自动重建
+3. 可选地将被屏蔽的聊天静音或归档，减少其未读与通知
+被丢弃的事件不会进入准入控制、执行器与消息处理器
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
+from telethon import TelegramClient, events
+from telethon.tl.functions.account import UpdateNotifySettingsRequest
+from telethon.tl.types import InputNotifyPeer, InputPeerNotifySettings
+from core.config_manager import config_manager
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+FILTER_MODES = ('blacklist', 'whitelist')
+
+# 静音到期时间：Telegram 约定的“永久”
+MUTE_FOREVER = 2 ** 31 - 1
+
+# 归档文件夹ID
+ARCHIVE_FOLDER_ID = 1
+
+class ChatFilter:
+    """按聊天ID预过滤新消息事件
+
+    Attributes:
+        mode (str): 过滤模式 ('blacklist' 或 'whitelist')
+        chat_ids (FrozenSet[int]): 黑名单或白名单中的聊天ID
+        mute_blocked (bool): 是否静音黑名单中的聊天
+        archive_blocked (bool): 是否归档黑名单中的聊天
+        reload_interval (float): 检查配置文件修改的间隔（秒）
+        report_interval (float): 输出过滤统计的间隔（秒）
+        accepted (int): 已放行的事件数
+        discarded (int): 分发前丢弃的事件数
+    """
+
+    def __init__(
+        self,
+        mode: str = 'blacklist',
+        blocked_chat_ids: Iterable[int] = (),
+        allowed_chat_ids: Iterable[int] = (),
+        mute_blocked: bool = False,
+        archive_blocked: bool = False,
+        reload_interval: float = 5.0,
+        report_interval: float = 60.0
+    ) -> None:
+        """初始化聊天过滤器
+
+        Args:
+            mode: 过滤模式，默认为'blacklist'
+            blocked_chat_ids: 黑名单模式下丢弃的聊天ID
+            allowed_chat_ids: 白名单模式下保留的聊天ID
+            mute_blocked: 是否静音黑名单中的聊天，默认为False
+            archive_blocked: 是否归档黑名单中的聊天，默认为False
+            reload_interval: 检查配置文件修改的间隔（秒），默认为5.0
+            report_interval: 输出过滤统计的间隔（秒），默认为60.0
+        """
+        self.reload_interval = reload_interval
+        self.report_interval = report_interval
+        self.accepted = 0
+        self.discarded = 0
+        self.client: Optional[TelegramClient] = None
+        self._silenced: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._silence_task: Optional[asyncio.Task] = None
+        self._config_mtime = self._stat_config()
+        self.rebuild(mode, blocked_chat_ids, allowed_chat_ids, mute_blocked, archive_blocked)
+
+    def rebuild(
+        self,
+        mode: str,
+        blocked_chat_ids: Iterable[int],
+        allowed_chat_ids: Iterable[int],
+        mute_blocked: bool,
+        archive_blocked: bool
+    ) -> None:
+        """重新计算过滤集合
+
+        Args:
+            mode: 过滤模式
+            blocked_chat_ids: 黑名单模式下丢弃的聊天ID
+            allowed_chat_ids: 白名单模式下保留的聊天ID
+            mute_blocked: 是否静音黑名单中的聊天
+            archive_blocked: 是否归档黑名单中的聊天
+
+        Raises:
+            ValueError: 当过滤模式无效时抛出
+        """
+        if mode not in FILTER_MODES:
+            raise ValueError(f"无效的聊天过滤模式: {mode}")
+        chat_ids = frozenset(blocked_chat_ids if mode == 'blacklist' else allowed_chat_ids)
+        # 模式与集合合并为一个元组整体替换，accepts 只需一次属性读取
+        self._rule = (mode == 'blacklist', chat_ids)
+        self.mode = mode
+        self.chat_ids = chat_ids
+        self.mute_blocked = mute_blocked
+        self.archive_blocked = archive_blocked
+        if mode == 'whitelist' and not chat_ids:
+            logger.warning("白名单模式下 allowed_chat_ids 为空，所有消息都将被丢弃")
+        logger.info(f"聊天过滤已更新: {mode}，{len(chat_ids)} 个聊天")
+
+    def accepts(self, chat_id: Optional[int]) -> bool:
+        """判断事件是否放行，并更新计数
+
+        Args:
+            chat_id: 聊天ID
+
+        Returns:
+            bool: 放行返回True，丢弃返回False
+        """
+        blacklist, chat_ids = self._rule
+        if (chat_id in chat_ids) == blacklist:
+            self.discarded += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """获取过滤统计
+
+        Returns:
+            Dict[str, Any]: 模式、聊天数、放行数与丢弃数
+        """
+        return {
+            'mode': self.mode,
+            'chats': len(self.chat_ids),
+            'accepted': self.accepted,
+            'discarded': self.discarded
+        }
+
+    @staticmethod
+    def _stat_config() -> Optional[float]:
+        """获取配置文件的修改时间
+
+        Returns:
+            Optional[float]: 修改时间，文件不存在时返回None
+        """
+        try:
+            return os.stat(config_manager.config_path).st_mtime
+        except OSError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """配置文件被修改时重新加载配置并重建过滤集合
+
+        Returns:
+            bool: 是否重建了过滤集合
+        """
+        mtime = self._stat_config()
+        if mtime is None or mtime == self._config_mtime:
+            return False
+        self._config_mtime = mtime
+        try:
+            config_manager.reload()
+            self.rebuild(**self._filter_args(config_manager.chat_filter_settings))
+        except Exception as e:
+            logger.error(f"重建聊天过滤失败，继续使用原过滤规则: {str(e)}")
+            return False
+        self._schedule_silence()
+        return True
+
+    @staticmethod
+    def _filter_args(settings: Dict[str, Any]) -> Dict[str, Any]:
+        """从配置中取出 rebuild 所需的参数
+
+        Args:
+            settings: chat_filter_settings 配置字典
+
+        Returns:
+            Dict[str, Any]: rebuild 的关键字参数
+        """
+        keys = ('mode', 'blocked_chat_ids', 'allowed_chat_ids', 'mute_blocked', 'archive_blocked')
+        return {key: settings[key] for key in keys}
+
+    def start(self, client: TelegramClient) -> None:
+        """启动配置监视任务，并按配置静音或归档被屏蔽的聊天
+
+        Args:
+            client: Telegram客户端
+        """
+        self.client = client
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        self._schedule_silence()
+
+    async def stop(self) -> None:
+        """停止配置监视与静音任务并输出最终统计"""
+        tasks = [task for task in (self._task, self._silence_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._silence_task = None
+        logger.info(f"聊天过滤统计: 放行 {self.accepted} 条，分发前丢弃 {self.discarded} 条")
+
+    async def _watch(self) -> None:
+        """定期检查配置文件修改并输出过滤统计"""
+        loop = asyncio.get_running_loop()
+        next_report = loop.time() + self.report_interval
+        reported = self.discarded
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload_if_changed()
+            if loop.time() >= next_report:
+                next_report = loop.time() + self.report_interval
+                if self.discarded != reported:
+                    reported = self.discarded
+                    logger.info(f"聊天过滤统计: 放行 {self.accepted} 条，分发前丢弃 {self.discarded} 条")
+
+    def _schedule_silence(self) -> None:
+        """在后台静音或归档新加入黑名单的聊天（同一时间只运行一个任务）"""
+        if self.client is None or self.mode != 'blacklist':
+            return
+        if not (self.mute_blocked or self.archive_blocked):
+            return
+        if self._silence_task is None or self._silence_task.done():
+            self._silence_task = asyncio.get_running_loop().create_task(self._silence())
+
+    async def _silence(self) -> None:
+        """逐个静音或归档尚未处理的屏蔽聊天，单个聊天失败不影响其他聊天"""
+        attempted: Set[int] = set()
+        while True:
+            # 运行期间黑名单可能被重建，每轮重新计算待处理的聊天
+            pending = self.chat_ids - self._silenced - attempted
+            if self.mode != 'blacklist' or not pending:
+                break
+            for chat_id in pending:
+                attempted.add(chat_id)
+                await self._silence_chat(chat_id)
+        if self._silenced:
+            logger.info(f"已静音/归档 {len(self._silenced)} 个屏蔽聊天")
+
+    async def _silence_chat(self, chat_id: int) -> None:
+        """静音或归档单个聊天
+
+        Args:
+            chat_id: 聊天ID
+        """
+        try:
+            if self.mute_blocked:
+                peer = await self.client.get_input_entity(chat_id)
+                await self.client(UpdateNotifySettingsRequest(
+                    peer=InputNotifyPeer(peer),
+                    settings=InputPeerNotifySettings(mute_until=MUTE_FOREVER)
+                ))
+            if self.archive_blocked:
+                await self.client.edit_folder(chat_id, ARCHIVE_FOLDER_ID)
+            self._silenced.add(chat_id)
+        except Exception as e:
+            logger.warning(f"静音/归档屏蔽聊天 {chat_id} 失败: {str(e)}")
+
+class FilteredNewMessage(events.NewMessage):
+    """在 Telethon 分发前经 ChatFilter 过滤的新消息事件"""
+
+    def __init__(self, chat_filter: ChatFilter, **kwargs: Any) -> None:
+        """初始化事件构造器
+
+        Args:
+            chat_filter: 聊天过滤器
+            **kwargs: 传给 events.NewMessage 的其他参数
+        """
+        super().__init__(**kwargs)
+        self.chat_filter = chat_filter
+
+    def filter(self, event):
+        if not self.chat_filter.accepts(event.chat_id):
+            return None
+        return super().filter(event)
+
+# 创建全局聊天过滤器实例
+chat_filter = ChatFilter(**config_manager.chat_filter_settings)
@@ -0,0 +1,253 @@
+"""消息文本压缩模块
+
+该模块使用按部署训练的 zstd 字典压缩 messages 表的 message 列：
+1. 字典由已有消息抽样训练，按版本保存在 compression_dicts 表中
+2. 每行的 dict_version 列记录压缩所用的字典版本，为NULL表示未压缩的明文
+3. 读取时通过注册到连接上的 message_text(message, dict_version) SQL函数透明解压
+zstandard 为可选依赖，未安装时只写入明文
+"""
+
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不压缩
+    zstandard = None
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 短于该字节数的消息压缩收益很小，直接保存明文
+MIN_COMPRESS_SIZE = 16
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """创建字典表并为 messages 表补充 dict_version 列
+
+    Args:
+        conn: 数据库连接（messages 表需已存在）
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS compression_dicts (
+        version INTEGER PRIMARY KEY,
+        dictionary BLOB NOT NULL,
+        sample_rows INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    if 'dict_version' not in columns:
+        conn.execute('ALTER TABLE messages ADD COLUMN dict_version INTEGER')
+        logger.info("messages 表已添加 dict_version 列")
+
+class MessageCodec:
+    """基于zstd字典的消息文本编解码器
+
+    压缩器与解压器按线程缓存，可同时用于写线程与只读线程池。
+    写入始终使用加载时最新的字典版本；读取遇到未加载的版本时从数据库按需加载，
+    因此运行中的进程可以读取迁移工具新训练的字典压缩的行。
+
+    Attributes:
+        db_path (str): 数据库文件路径
+        enabled (bool): 写入时是否压缩
+        level (int): zstd 压缩级别
+        version (Optional[int]): 写入使用的字典版本，没有可用字典时为None
+    """
+
+    def __init__(self, db_path: str, enabled: bool = False, level: int = 3) -> None:
+        """初始化编解码器并加载最新的字典
+
+        Args:
+            db_path: 数据库文件路径
+            enabled: 写入时是否压缩，默认为False
+            level: zstd 压缩级别，默认为3
+        """
+        if enabled and zstandard is None:
+            logger.warning("未安装 zstandard，消息将以明文保存")
+            enabled = False
+        self.db_path = db_path
+        self.enabled = enabled
+        self.level = level
+        self.version: Optional[int] = None
+        self._dicts: Dict[int, Any] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if zstandard is not None:
+            self.refresh()
+
+    def refresh(self) -> Optional[int]:
+        """重新读取最新的字典版本作为写入版本
+
+        Returns:
+            Optional[int]: 最新的字典版本，没有字典时为None
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute('SELECT MAX(version) FROM compression_dicts').fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            # 数据库或字典表尚未创建
+            row = None
+        self.version = row[0] if row else None
+        if self.version is not None:
+            self._dictionary(self.version)
+            if self.enabled:
+                logger.info(f"消息压缩已启用，字典版本 {self.version}")
+        elif self.enabled:
+            logger.warning("尚未训练压缩字典，消息将以明文保存，请运行 scripts/compress_messages.py --train")
+        return self.version
+
+    def _dictionary(self, version: int) -> Any:
+        """获取指定版本的字典，未加载时从数据库读取
+
+        Args:
+            version: 字典版本
+
+        Returns:
+            zstandard.ZstdCompressionDict: 字典对象
+
+        Raises:
+            RuntimeError: 当zstandard未安装或字典不存在时抛出
+        """
+        dictionary = self._dicts.get(version)
+        if dictionary is not None:
+            return dictionary
+        if zstandard is None:
+            raise RuntimeError("读取压缩消息需要安装 zstandard")
+        with self._lock:
+            if version not in self._dicts:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    row = conn.execute(
+                        'SELECT dictionary FROM compression_dicts WHERE version = ?', (version,)
+                    ).fetchone()
+                finally:
+                    conn.close()
+                if row is None:
+                    raise RuntimeError(f"压缩字典版本不存在: {version}")
+                self._dicts[version] = zstandard.ZstdCompressionDict(row[0])
+        return self._dicts[version]
+
+    def _compressor(self, version: int) -> Any:
+        """获取当前线程指定版本的压缩器
+
+        Args:
+            version: 字典版本
+
+        Returns:
+            zstandard.ZstdCompressor: 压缩器
+        """
+        compressors = self._local.__dict__.setdefault('compressors', {})
+        compressor = compressors.get(version)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=self._dictionary(version),
+                write_dict_id=False,
+                write_checksum=False
+            )
+            compressors[version] = compressor
+        return compressor
+
+    def _decompressor(self, version: int) -> Any:
+        """获取当前线程指定版本的解压器
+
+        Args:
+            version: 字典版本
+
+        Returns:
+            zstandard.ZstdDecompressor: 解压器
+        """
+        decompressors = self._local.__dict__.setdefault('decompressors', {})
+        decompressor = decompressors.get(version)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary(version))
+            decompressors[version] = decompressor
+        return decompressor
+
+    def encode(self, text: Any) -> Tuple[Any, Optional[int]]:
+        """压缩消息文本
+
+        Args:
+            text: 消息文本
+
+        Returns:
+            Tuple[Any, Optional[int]]: (存储值, 字典版本)；未启用、没有字典或压缩无收益时返回 (原文, None)
+        """
+        if not self.enabled or self.version is None or not isinstance(text, str):
+            return text, None
+        data = text.encode('utf-8')
+        if len(data) < MIN_COMPRESS_SIZE:
+            return text, None
+        compressed = self._compressor(self.version).compress(data)
+        if len(compressed) >= len(data):
+            return text, None
+        return compressed, self.version
+
+    def decode(self, value: Any, version: Optional[int]) -> Any:
+        """还原消息文本
+
+        Args:
+            value: 存储值
+            version: 字典版本，为None时表示明文
+
+        Returns:
+            Any: 消息文本
+        """
+        if version is None or value is None:
+            return value
+        return self._decompressor(version).decompress(value).decode('utf-8')
+
+    def install(self, conn: sqlite3.Connection) -> None:
+        """在连接上注册 message_text(message, dict_version) SQL函数
+
+        Args:
+            conn: 数据库连接
+        """
+        conn.create_function('message_text', 2, self.decode, deterministic=True)
+
+    def train(self, conn: sqlite3.Connection, sample_size: int, dict_size: int) -> int:
+        """从明文消息中抽样训练新版本字典并设为写入版本
+
+        Args:
+            conn: 数据库连接
+            sample_size: 抽样行数
+            dict_size: 字典大小（字节）
+
+        Returns:
+            int: 新字典的版本
+
+        Raises:
+            RuntimeError: 当zstandard未安装、样本不足或训练失败时抛出
+        """
+        if zstandard is None:
+            raise RuntimeError("训练压缩字典需要安装 zstandard")
+        samples = [
+            row[0].encode('utf-8') for row in conn.execute('''
+            SELECT message FROM messages
+            WHERE dict_version IS NULL AND typeof(message) = 'text' AND length(message) > 0
+            ORDER BY RANDOM() LIMIT ?
+            ''', (sample_size,))
+        ]
+        if len(samples) < 8:
+            raise RuntimeError(f"可用于训练的明文消息过少: {len(samples)}")
+        try:
+            dictionary = zstandard.train_dictionary(dict_size, samples, level=self.level)
+        except zstandard.ZstdError as e:
+            raise RuntimeError(f"训练压缩字典失败: {e}") from e
+
+        row = conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM compression_dicts').fetchone()
+        version = row[0]
+        conn.execute(
+            'INSERT INTO compression_dicts (version, dictionary, sample_rows) VALUES (?, ?, ?)',
+            (version, dictionary.as_bytes(), len(samples))
+        )
+        conn.commit()
+        self._dicts[version] = dictionary
+        self.version = version
+        logger.info(f"已训练压缩字典版本 {version}: {len(samples)} 条样本，{len(dictionary.as_bytes())} 字节")
+        return version
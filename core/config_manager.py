@@ -121,6 +121,45 @@ class ConfigManager:
             self.logger.error(f"无效的聊天ID格式: {self.get('blocked_chat_ids')}")
             raise ValueError("无效的聊天ID格式") from e
 
+    @property
+    def chat_filter_settings(self) -> Dict[str, Any]:
+        """获取聊天预过滤配置（黑名单取自 blocked_chat_ids）
+        
+        Returns:
+            Dict[str, Any]: 包含 mode、blocked_chat_ids、allowed_chat_ids、mute_blocked、
+                archive_blocked、reload_interval 与 report_interval 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'mode': 'blacklist',
+            'blocked_chat_ids': self.blocked_chat_ids,
+            'allowed_chat_ids': [],
+            'mute_blocked': False,
+            'archive_blocked': False,
+            'reload_interval': 5.0,
+            'report_interval': 60.0
+        }
+        try:
+            for key, value in (self.get('chat_filter') or {}).items():
+                if key == 'mode':
+                    settings[key] = str(value)
+                elif key == 'allowed_chat_ids':
+                    settings[key] = [int(chat_id) for chat_id in value]
+                elif key in ('mute_blocked', 'archive_blocked'):
+                    settings[key] = bool(value)
+                elif key in ('reload_interval', 'report_interval'):
+                    settings[key] = float(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的聊天过滤配置: {self.get('chat_filter')}")
+            raise ValueError("无效的聊天过滤配置") from e
+        if settings['mode'] not in ('blacklist', 'whitelist'):
+            raise ValueError(f"无效的聊天过滤模式: {settings['mode']}")
+        if settings['reload_interval'] <= 0 or settings['report_interval'] <= 0:
+            raise ValueError("聊天过滤的检查与统计间隔必须为正数")
+        return settings
+
     @property
     def target_channel(self) -> str:
         """获取主转发目标频道
@@ -137,6 +176,323 @@ class ConfigManager:
             raise ValueError("未配置目标频道")
         return str(target)
     
+    @property
+    def outbox_settings(self) -> Dict[str, int]:
+        """获取发件箱调度配置
+        
+        Returns:
+            Dict[str, int]: 包含 workers、max_attempts、max_ready、retention_hours 与
+                prune_interval 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings = {
+            'workers': 4,
+            'max_attempts': 3,
+            'max_ready': 1000,
+            'retention_hours': 24,
+            'prune_interval': 600
+        }
+        try:
+            for key, value in (self.get('outbox') or {}).items():
+                if key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的发件箱配置: {self.get('outbox')}")
+            raise ValueError("无效的发件箱配置") from e
+        if settings['max_ready'] < 0 or any(
+            settings[key] <= 0 for key in ('workers', 'max_attempts', 'retention_hours', 'prune_interval')
+        ):
+            raise ValueError("发件箱配置必须为正整数（max_ready 为0表示不限制）")
+        return settings
+
+    @property
+    def executor_settings(self) -> Dict[str, Any]:
+        """获取聊天执行器配置
+        
+        Returns:
+            Dict[str, Any]: 包含 max_workers、queue_size、max_pending、overflow_policy、
+                lag_report_interval 与 drain_timeout 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'max_workers': 8,
+            'queue_size': 100,
+            'max_pending': 5000,
+            'overflow_policy': 'drop_oldest',
+            'lag_report_interval': 60,
+            'drain_timeout': 10.0
+        }
+        try:
+            for key, value in (self.get('executor') or {}).items():
+                if key == 'overflow_policy':
+                    settings[key] = str(value)
+                elif key == 'drain_timeout':
+                    settings[key] = float(value)
+                elif key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的执行器配置: {self.get('executor')}")
+            raise ValueError("无效的执行器配置") from e
+        if settings['max_workers'] <= 0 or settings['queue_size'] <= 0:
+            raise ValueError("执行器工作者数量与队列容量必须为正整数")
+        if settings['max_pending'] < 0 or settings['drain_timeout'] < 0:
+            raise ValueError("执行器待处理总量上限与停止等待时间不能为负数")
+        if settings['overflow_policy'] not in ('drop_oldest', 'drop_newest', 'block'):
+            raise ValueError(f"无效的溢出策略: {settings['overflow_policy']}")
+        return settings
+
+    @property
+    def admission_settings(self) -> Dict[str, Any]:
+        """获取准入控制配置（含 chat_priorities 中的聊天优先级分层）
+        
+        Returns:
+            Dict[str, Any]: 准入控制器的构造参数
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'interval': 1.0,
+            'depth_thresholds': [200, 500, 1000, 2000],
+            'lag_thresholds': [0.2, 0.5, 1.0, 2.0],
+            'log_sample_rate': 100,
+            'max_deferred': 10000
+        }
+        try:
+            for key, value in (self.get('admission') or {}).items():
+                if key == 'interval':
+                    settings[key] = float(value)
+                elif key == 'depth_thresholds':
+                    settings[key] = [int(v) for v in value]
+                elif key == 'lag_thresholds':
+                    settings[key] = [float(v) for v in value]
+                elif key in settings:
+                    settings[key] = int(value)
+            priorities = self.get('chat_priorities') or {}
+            settings['low_priority_chats'] = [int(v) for v in priorities.get('low', [])]
+            settings['high_priority_chats'] = [int(v) for v in priorities.get('high', [])]
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的准入控制配置: {self.get('admission')}")
+            raise ValueError("无效的准入控制配置") from e
+        if settings['interval'] <= 0:
+            raise ValueError("准入控制检测周期必须为正数")
+        return settings
+
+    @property
+    def profiler_settings(self) -> Dict[str, Any]:
+        """获取性能诊断配置
+        
+        Returns:
+            Dict[str, Any]: 包含 profile_on_start、duration、sample_interval、output_dir、
+                watchdog_interval 与 watchdog_threshold 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'profile_on_start': False,
+            'duration': 30.0,
+            'sample_interval': 0.005,
+            'output_dir': 'data/profiles',
+            'watchdog_interval': 0.1,
+            'watchdog_threshold': 0.5
+        }
+        try:
+            for key, value in (self.get('profiler') or {}).items():
+                if key == 'profile_on_start':
+                    settings[key] = bool(value)
+                elif key == 'output_dir':
+                    settings[key] = str(value)
+                elif key in settings:
+                    settings[key] = float(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的性能诊断配置: {self.get('profiler')}")
+            raise ValueError("无效的性能诊断配置") from e
+        if any(settings[key] <= 0 for key in ('duration', 'sample_interval', 'watchdog_interval', 'watchdog_threshold')):
+            raise ValueError("性能诊断的时长与间隔必须为正数")
+        return settings
+
+    @property
+    def session_flush_interval(self) -> float:
+        """获取会话文件定期写出间隔
+        
+        Returns:
+            float: 写出间隔（秒）
+            
+        Raises:
+            ValueError: 当间隔无效时抛出
+        """
+        try:
+            interval = float(self.get('session_flush_interval', 60))
+        except (TypeError, ValueError) as e:
+            self.logger.error(f"无效的会话写出间隔: {self.get('session_flush_interval')}")
+            raise ValueError("无效的会话写出间隔") from e
+        if interval <= 0:
+            raise ValueError("会话写出间隔必须为正数")
+        return interval
+
+    @property
+    def seen_token_settings(self) -> Dict[str, int]:
+        """获取已发送令牌索引配置
+        
+        Returns:
+            Dict[str, int]: 包含 memory_size 与 max_rows 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings = {'memory_size': 10000, 'max_rows': 200000}
+        try:
+            for key, value in (self.get('seen_tokens') or {}).items():
+                if key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的令牌索引配置: {self.get('seen_tokens')}")
+            raise ValueError("无效的令牌索引配置") from e
+        if any(value <= 0 for value in settings.values()):
+            raise ValueError("令牌索引配置必须为正整数")
+        return settings
+
+    @property
+    def async_db_settings(self) -> Dict[str, int]:
+        """获取异步数据库配置
+        
+        Returns:
+            Dict[str, int]: 包含 readers 与 batch_size 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings = {'readers': 4, 'batch_size': 256}
+        try:
+            for key, value in (self.get('database') or {}).items():
+                if key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的数据库配置: {self.get('database')}")
+            raise ValueError("无效的数据库配置") from e
+        if any(value <= 0 for value in settings.values()):
+            raise ValueError("数据库配置必须为正整数")
+        return settings
+
+    @property
+    def spool_settings(self) -> Dict[str, Any]:
+        """获取消息写入缓冲区配置
+        
+        Returns:
+            Dict[str, Any]: 包含 enabled、directory、segment_size、max_segments、batch_records、
+                compact_interval、sync_interval 与 report_interval 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'enabled': True,
+            'directory': 'data/spool',
+            'segment_size': 8 * 1024 * 1024,
+            'max_segments': 16,
+            'batch_records': 5000,
+            'compact_interval': 0.5,
+            'sync_interval': 1.0,
+            'report_interval': 60.0
+        }
+        try:
+            for key, value in (self.get('spool') or {}).items():
+                if key == 'enabled':
+                    settings[key] = bool(value)
+                elif key == 'directory':
+                    settings[key] = str(value)
+                elif key in ('compact_interval', 'sync_interval', 'report_interval'):
+                    settings[key] = float(value)
+                elif key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的消息缓冲区配置: {self.get('spool')}")
+            raise ValueError("无效的消息缓冲区配置") from e
+        if settings['segment_size'] < 64 * 1024:
+            raise ValueError("消息缓冲区段大小不能小于64KB")
+        numbers = ('max_segments', 'batch_records', 'compact_interval', 'sync_interval', 'report_interval')
+        if any(settings[key] <= 0 for key in numbers):
+            raise ValueError("消息缓冲区配置必须为正数")
+        return settings
+
+    @property
+    def compression_settings(self) -> Dict[str, Any]:
+        """获取消息文本压缩配置
+        
+        Returns:
+            Dict[str, Any]: 包含 enabled、level、sample_size、dict_size 与 chunk_size 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'enabled': False,
+            'level': 3,
+            'sample_size': 10000,
+            'dict_size': 112640,
+            'chunk_size': 1000
+        }
+        try:
+            for key, value in (self.get('compression') or {}).items():
+                if key == 'enabled':
+                    settings[key] = bool(value)
+                elif key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的压缩配置: {self.get('compression')}")
+            raise ValueError("无效的压缩配置") from e
+        if not 1 <= settings['level'] <= 22:
+            raise ValueError("zstd 压缩级别必须在1到22之间")
+        if any(settings[key] <= 0 for key in ('sample_size', 'dict_size', 'chunk_size')):
+            raise ValueError("压缩抽样数、字典大小与分块大小必须为正整数")
+        return settings
+
+    @property
+    def memory_settings(self) -> Dict[str, Any]:
+        """获取内存预算配置
+        
+        Returns:
+            Dict[str, Any]: 包含 enabled、snapshot_interval、top_n、frames、rss_budget_mb、
+                session_max_entities、entity_cache_limit 与 db_write_queue 的配置字典
+            
+        Raises:
+            ValueError: 当配置值无效时抛出
+        """
+        settings: Dict[str, Any] = {
+            'enabled': False,
+            'snapshot_interval': 600.0,
+            'top_n': 10,
+            'frames': 1,
+            'rss_budget_mb': 512.0,
+            'session_max_entities': 50000,
+            'entity_cache_limit': 5000,
+            'db_write_queue': 10000
+        }
+        try:
+            for key, value in (self.get('memory') or {}).items():
+                if key == 'enabled':
+                    settings[key] = bool(value)
+                elif key in ('snapshot_interval', 'rss_budget_mb'):
+                    settings[key] = float(value)
+                elif key in settings:
+                    settings[key] = int(value)
+        except (AttributeError, TypeError, ValueError) as e:
+            self.logger.error(f"无效的内存预算配置: {self.get('memory')}")
+            raise ValueError("无效的内存预算配置") from e
+        if settings['snapshot_interval'] <= 0 or settings['top_n'] <= 0 or settings['frames'] <= 0:
+            raise ValueError("内存快照间隔、报告数量与调用栈深度必须为正数")
+        if any(
+            settings[key] < 0
+            for key in ('rss_budget_mb', 'session_max_entities', 'entity_cache_limit', 'db_write_queue')
+        ):
+            raise ValueError("内存预算与缓存上限不能为负数")
+        return settings
+
     @property
     def patterns(self) -> List[Dict[str, Any]]:
         """获取消息匹配模式
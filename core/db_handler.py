@@ -6,32 +6,105 @@
 import sqlite3
 import os
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from contextlib import contextmanager
+from core.config_manager import config_manager
+from core.compression import MessageCodec, ensure_schema
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+INSERT_MESSAGE_SQL = '''
+INSERT INTO messages (
+    username, first_name, last_name, user_id,
+    chat_type, chat_title, chat_id, message,
+    date, is_bot, dict_version
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 查询消息时使用的列，message 列经 message_text 函数解压为明文
+MESSAGE_COLUMNS = '''
+id, username, first_name, last_name, user_id, chat_type, chat_title, chat_id,
+message_text(message, dict_version) AS message, date, is_bot, created_at
+'''
+RECENT_MESSAGES_SQL = f'''
+SELECT {MESSAGE_COLUMNS} FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?
+'''
+SEARCH_MESSAGES_SQL = f'''
+SELECT {MESSAGE_COLUMNS} FROM messages
+WHERE message_text(message, dict_version) LIKE ? ORDER BY id DESC LIMIT ?
+'''
+
+def message_to_row(data: Dict[str, Any], codec: Optional[MessageCodec] = None) -> Tuple[Any, ...]:
+    """校验消息数据并转换为插入参数
+    
+    Args:
+        data: 包含消息数据的字典
+        codec: 消息文本编解码器，为None时保存明文
+        
+    Returns:
+        Tuple[Any, ...]: 按 INSERT_MESSAGE_SQL 列顺序排列的插入参数
+        
+    Raises:
+        ValueError: 当输入数据无效时抛出
+    """
+    if not data or not isinstance(data, dict):
+        raise ValueError("无效的消息数据")
+        
+    required_fields = ['user_id', 'chat_id', 'date']
+    if not all(field in data for field in required_fields):
+        raise ValueError(f"消息数据缺少必要字段: {required_fields}")
+        
+    message = data.get('message', '否')
+    message, dict_version = codec.encode(message) if codec else (message, None)
+    return (
+        data.get('username', '否'),
+        data.get('first_name', '否'),
+        data.get('last_name', '否'),
+        data['user_id'],
+        data.get('chat_type', '否'),
+        data.get('chat_title', '否'),
+        data['chat_id'],
+        message,
+        data['date'],
+        1 if data.get('is_bot') else 0,
+        dict_version
+    )
+
 class DatabaseHandler:
     """数据库处理器类
     
     Attributes:
         db_path (str): 数据库文件路径
         conn (Optional[sqlite3.Connection]): 数据库连接对象
+        codec (Optional[MessageCodec]): 消息文本编解码器
     """
     
-    def __init__(self, db_path: str = 'data/messages.db') -> None:
+    def __init__(
+        self,
+        db_path: str = 'data/messages.db',
+        compress: bool = False,
+        compression_level: int = 3
+    ) -> None:
         """初始化数据库连接
         
         Args:
             db_path: 数据库文件路径，默认为'data/messages.db'
+            compress: 是否压缩新写入的消息文本，默认为False
+            compression_level: zstd 压缩级别，默认为3
         """
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
-        self._initialize_database()
+        self.codec: Optional[MessageCodec] = None
+        self._initialize_database(compress, compression_level)
 
-    def _initialize_database(self) -> None:
-        """初始化数据库"""
+    def _initialize_database(self, compress: bool, compression_level: int) -> None:
+        """初始化数据库
+        
+        Args:
+            compress: 是否压缩新写入的消息文本
+            compression_level: zstd 压缩级别
+        """
         try:
             # 确保data目录存在
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
@@ -40,6 +113,8 @@ class DatabaseHandler:
             self.conn = sqlite3.connect(self.db_path)
             self.conn.row_factory = sqlite3.Row
             self._create_tables()
+            self.codec = MessageCodec(self.db_path, compress, compression_level)
+            self.codec.install(self.conn)
             logger.info(f"数据库已初始化，路径: {self.db_path}")
         except Exception as e:
             logger.error(f"数据库初始化失败: {str(e)}")
@@ -69,6 +144,12 @@ class DatabaseHandler:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
                 ''')
+                cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_chat_id
+                ON messages (chat_id)
+                ''')
+                ensure_schema(self.conn)
+                self.conn.commit()
             logger.info("数据表已创建/验证")
         except Exception as e:
             logger.error(f"创建数据表失败: {str(e)}")
@@ -108,36 +189,9 @@ class DatabaseHandler:
             RuntimeError: 当保存消息失败时抛出
         """
         try:
-            if not data or not isinstance(data, dict):
-                raise ValueError("无效的消息数据")
-                
-            required_fields = ['user_id', 'chat_id', 'date']
-            if not all(field in data for field in required_fields):
-                raise ValueError(f"消息数据缺少必要字段: {required_fields}")
-                
+            values = message_to_row(data, self.codec)
             with self._get_cursor() as cursor:
-                sql = '''
-                INSERT INTO messages (
-                    username, first_name, last_name, user_id,
-                    chat_type, chat_title, chat_id, message,
-                    date, is_bot
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                '''
-                
-                values = (
-                    data.get('username', '否'),
-                    data.get('first_name', '否'),
-                    data.get('last_name', '否'),
-                    data['user_id'],
-                    data.get('chat_type', '否'),
-                    data.get('chat_title', '否'),
-                    data['chat_id'],
-                    data.get('message', '否'),
-                    data['date'],
-                    1 if data.get('is_bot') else 0
-                )
-                
-                cursor.execute(sql, values)
+                cursor.execute(INSERT_MESSAGE_SQL, values)
                 self.conn.commit()
                 logger.info(f"消息已保存: user_id={data['user_id']}")
         except ValueError as e:
@@ -147,6 +201,59 @@ class DatabaseHandler:
             logger.error(f"保存消息失败: {str(e)}")
             raise RuntimeError("保存消息失败") from e
 
+    def save_messages(self, batch: List[Dict[str, Any]]) -> None:
+        """在单个事务中批量保存消息数据
+        
+        Args:
+            batch: 消息数据字典列表
+            
+        Raises:
+            ValueError: 当输入数据无效时抛出
+            RuntimeError: 当保存消息失败时抛出
+        """
+        if not batch:
+            return
+        try:
+            rows = [message_to_row(data, self.codec) for data in batch]
+            with self._get_cursor() as cursor:
+                cursor.executemany(INSERT_MESSAGE_SQL, rows)
+                self.conn.commit()
+                logger.info(f"已批量保存 {len(rows)} 条消息")
+        except ValueError as e:
+            logger.error(f"无效的消息数据: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"批量保存消息失败: {str(e)}")
+            raise RuntimeError("批量保存消息失败") from e
+
+    def recent_messages(self, chat_id: int, limit: int = 20) -> List[sqlite3.Row]:
+        """获取聊天最近的消息（消息文本已解压）
+        
+        Args:
+            chat_id: 聊天ID
+            limit: 返回数量上限，默认为20
+            
+        Returns:
+            List[sqlite3.Row]: 按时间倒序的消息
+        """
+        with self._get_cursor() as cursor:
+            cursor.execute(RECENT_MESSAGES_SQL, (chat_id, limit))
+            return cursor.fetchall()
+
+    def search_messages(self, keyword: str, limit: int = 20) -> List[sqlite3.Row]:
+        """按关键词搜索消息（在解压后的文本上匹配）
+        
+        Args:
+            keyword: 关键词
+            limit: 返回数量上限，默认为20
+            
+        Returns:
+            List[sqlite3.Row]: 按时间倒序的匹配消息
+        """
+        with self._get_cursor() as cursor:
+            cursor.execute(SEARCH_MESSAGES_SQL, (f"%{keyword}%", limit))
+            return cursor.fetchall()
+
     def close(self) -> None:
         """关闭数据库连接"""
         if self.conn:
@@ -155,4 +262,8 @@ class DatabaseHandler:
             logger.info("数据库连接已关闭")
 
 # 创建全局数据库处理器实例
-db = DatabaseHandler()
+_compression = config_manager.compression_settings
+db = DatabaseHandler(
+    compress=_compression['enabled'],
+    compression_level=_compression['level']
+)
@@ -0,0 +1,187 @@
+"""内存预算与泄漏检测模块
+
+该模块周期性地采集 tracemalloc 快照并与上一次比较，报告内存增长最多的代码位置；
+同时通过任务工厂按创建来源统计尚未完成的 asyncio 任务，并在常驻内存超出预算时告警
+"""
+
+import os
+import asyncio
+import logging
+import tracemalloc
+from collections import Counter
+from typing import Any, Counter as CounterType, List, Optional, Tuple
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+def current_rss_mb() -> float:
+    """获取当前进程的常驻内存
+
+    Returns:
+        float: 常驻内存（MB），无法获取当前值时返回峰值
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        import resource
+        # Linux 上 ru_maxrss 单位为KB，macOS 上为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if peak < 1 << 32 else peak / (1024 * 1024)
+
+def _task_origin(coro: Any) -> str:
+    """获取协程的创建来源名称
+
+    Args:
+        coro: 协程对象
+
+    Returns:
+        str: 模块名与限定名，如 core.outbox.Outbox._worker
+    """
+    code = getattr(coro, 'cr_code', None) or getattr(coro, 'gi_code', None)
+    module = getattr(getattr(coro, 'cr_frame', None), 'f_globals', {}).get('__name__', '?')
+    name = getattr(coro, '__qualname__', None) or (code.co_name if code else type(coro).__name__)
+    return f"{module}.{name}"
+
+class MemoryMonitor:
+    """内存监控器
+
+    Attributes:
+        interval (float): 快照间隔（秒）
+        top_n (int): 每次报告的增长位置数量
+        frames (int): tracemalloc 记录的调用栈深度
+        rss_budget_mb (float): 常驻内存预算（MB），0 表示不检查
+        tasks_by_origin (Counter[str]): 按来源统计的未完成任务数
+    """
+
+    def __init__(
+        self,
+        interval: float = 600.0,
+        top_n: int = 10,
+        frames: int = 1,
+        rss_budget_mb: float = 0.0
+    ) -> None:
+        """初始化内存监控器
+
+        Args:
+            interval: 快照间隔（秒），默认为600.0
+            top_n: 每次报告的增长位置数量，默认为10
+            frames: tracemalloc 记录的调用栈深度，默认为1
+            rss_budget_mb: 常驻内存预算（MB），默认为0（不检查）
+        """
+        self.interval = interval
+        self.top_n = top_n
+        self.frames = frames
+        self.rss_budget_mb = rss_budget_mb
+        self.tasks_by_origin: CounterType[str] = Counter()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._previous_factory: Any = None
+
+    def install_task_factory(self, loop: asyncio.AbstractEventLoop) -> None:
+        """安装按来源统计任务的任务工厂
+
+        Args:
+            loop: 事件循环
+        """
+        self._previous_factory = loop.get_task_factory()
+
+        def factory(loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> asyncio.Future:
+            if self._previous_factory is not None:
+                task = self._previous_factory(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            origin = _task_origin(coro)
+            self.tasks_by_origin[origin] += 1
+            task.add_done_callback(lambda _: self._task_done(origin))
+            return task
+
+        loop.set_task_factory(factory)
+
+    def _task_done(self, origin: str) -> None:
+        """任务完成时减少来源计数
+
+        Args:
+            origin: 任务来源
+        """
+        self.tasks_by_origin[origin] -= 1
+        if self.tasks_by_origin[origin] <= 0:
+            del self.tasks_by_origin[origin]
+
+    def start(self) -> None:
+        """启动 tracemalloc、任务统计与定期快照任务"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        loop = asyncio.get_running_loop()
+        self.install_task_factory(loop)
+        self._snapshot = self._take_snapshot()
+        self._task = loop.create_task(self._run())
+        logger.info(f"内存监控已启动，快照间隔 {self.interval}s，当前常驻内存 {current_rss_mb():.1f}MB")
+
+    async def stop(self) -> None:
+        """停止定期快照并恢复原任务工厂"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        asyncio.get_running_loop().set_task_factory(self._previous_factory)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._snapshot = None
+        logger.info("内存监控已停止")
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        """采集过滤掉 tracemalloc 自身开销的快照
+
+        Returns:
+            tracemalloc.Snapshot: 内存快照
+        """
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+
+    def growth(self) -> List[Tuple[str, int, int]]:
+        """采集新快照并与上一次比较
+
+        Returns:
+            List[Tuple[str, int, int]]: (代码位置, 增长字节数, 增长分配块数)，按增长量降序
+        """
+        snapshot = self._take_snapshot()
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return []
+        stats = snapshot.compare_to(previous, 'lineno')
+        return [
+            (str(stat.traceback), stat.size_diff, stat.count_diff)
+            for stat in stats[:self.top_n]
+            if stat.size_diff > 0
+        ]
+
+    def report(self) -> None:
+        """输出一次内存报告"""
+        rss = current_rss_mb()
+        lines = [f"常驻内存 {rss:.1f}MB，tracemalloc 追踪 {tracemalloc.get_traced_memory()[0] / 1024 / 1024:.1f}MB"]
+        for location, size_diff, count_diff in self.growth():
+            lines.append(f"  +{size_diff / 1024:.1f}KB ({count_diff:+d} 块) {location}")
+        pending = sum(self.tasks_by_origin.values())
+        lines.append(f"未完成任务 {pending} 个:")
+        for origin, count in self.tasks_by_origin.most_common(self.top_n):
+            lines.append(f"  {count:6d} {origin}")
+        if self.rss_budget_mb and rss > self.rss_budget_mb:
+            lines[0] += f"，超出预算 {self.rss_budget_mb:.0f}MB"
+            logger.warning("内存报告:\n" + '\n'.join(lines))
+        else:
+            logger.info("内存报告:\n" + '\n'.join(lines))
+
+    async def _run(self) -> None:
+        """定期输出内存报告"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.report()
+            except Exception as e:
+                logger.error(f"生成内存报告失败: {str(e)}", exc_info=True)
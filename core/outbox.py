@@ -0,0 +1,518 @@
+"""发件箱模块
+
+该模块负责持久化所有待发送的转发与机器人消息，并由异步调度工作者领取发送，
+保证重启或崩溃后未完成的发送可以重放且不会重复。
+所有读写都经由 adb 的专用写线程执行，不在事件循环中直接访问数据库；
+已完成或已失败的记录超过保留时长后由后台任务分批删除。
+同一 (来源聊天, 目标) 的记录按ID顺序逐条发送，重试等待期间后续记录不会越过它
+"""
+
+import asyncio
+import logging
+import sqlite3
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from telethon import TelegramClient
+from telethon.errors import ChatForwardsRestrictedError
+from core.config_manager import config_manager
+from core.async_db import adb
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单个删除事务最多删除的记录数，避免长时间占用写线程
+PRUNE_BATCH_SIZE = 5000
+
+# 发件箱行: (id, source_chat_id, message_id, destination, kind, payload, attempts)
+OutboxRow = Tuple[int, int, int, str, str, str, int]
+
+# 发送通道: (source_chat_id, destination)，同一通道内的记录按顺序发送
+Lane = Tuple[int, str]
+
+# 记录最终失败时调用的监听器
+FailureListener = Callable[[OutboxRow], Awaitable[None]]
+
+CREATE_OUTBOX_SQL = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    destination TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'forward',
+    payload TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (source_chat_id, message_id, destination, payload)
+)
+'''
+CREATE_OUTBOX_INDEX_SQL = '''
+CREATE INDEX IF NOT EXISTS idx_outbox_status
+ON outbox (status, id)
+'''
+INSERT_OUTBOX_SQL = '''
+INSERT OR IGNORE INTO outbox (
+    source_chat_id, message_id, destination, kind, payload, status
+) VALUES (?, ?, ?, ?, ?, ?)
+'''
+SELECT_PENDING_SQL = '''
+SELECT id, source_chat_id, message_id, destination, kind, payload, attempts
+FROM outbox WHERE status = 'pending' ORDER BY id LIMIT ?
+'''
+RELEASE_DEFERRED_SQL = '''
+UPDATE outbox SET status = 'pending', updated_at = CURRENT_TIMESTAMP
+WHERE status = 'deferred'
+'''
+PRUNE_SQL = '''
+DELETE FROM outbox WHERE id IN (
+    SELECT id FROM outbox
+    WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)
+    LIMIT ?
+)
+'''
+MARK_SQL = '''
+UPDATE outbox
+SET status = ?, attempts = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+WHERE id = ?
+'''
+
+def _insert_rows(conn: sqlite3.Connection, values: List[Tuple[Any, ...]]) -> List[Tuple[int, str]]:
+    """写入发件箱记录（在写线程中执行）
+
+    Args:
+        conn: 写连接
+        values: INSERT_OUTBOX_SQL 的参数列表
+
+    Returns:
+        List[Tuple[int, str]]: 新写入记录的 (values下标, 记录ID) 列表，已存在的记录不返回
+    """
+    inserted = []
+    for index, params in enumerate(values):
+        cursor = conn.execute(INSERT_OUTBOX_SQL, params)
+        if cursor.rowcount == 1:
+            inserted.append((index, cursor.lastrowid))
+    return inserted
+
+def _select_pending(conn: sqlite3.Connection, limit: int) -> List[OutboxRow]:
+    """读取待发送记录（在写线程中执行，与状态更新串行，不会读到已完成记录的旧状态）
+
+    Args:
+        conn: 写连接
+        limit: 最多读取的记录数，-1 表示不限制
+
+    Returns:
+        List[OutboxRow]: 按ID排序的待发送记录
+    """
+    return [tuple(row) for row in conn.execute(SELECT_PENDING_SQL, (limit,))]
+
+def _delete_finished(conn: sqlite3.Connection, age: str, limit: int) -> int:
+    """删除一批超过保留时长的已完成或已失败记录（在写线程中执行）
+
+    Args:
+        conn: 写连接
+        age: SQLite datetime 修饰符，如 '-24 hours'
+        limit: 最多删除的记录数
+
+    Returns:
+        int: 删除的记录数
+    """
+    return conn.execute(PRUNE_SQL, (age, limit)).rowcount
+
+def _release_deferred(conn: sqlite3.Connection) -> int:
+    """将延后的记录转为待发送（在写线程中执行）
+
+    Args:
+        conn: 写连接
+
+    Returns:
+        int: 释放的记录数
+    """
+    return conn.execute(RELEASE_DEFERRED_SQL).rowcount
+
+class Outbox:
+    """SQLite持久化发件箱
+
+    每条待发送记录以 (source_chat_id, message_id, destination, payload) 唯一，
+    重复入队会被忽略，从而保证发送幂等。已完成的记录在保留时长内继续参与去重。
+
+    记录按 (source_chat_id, destination) 分到发送通道，每个通道同一时刻只由一个工作者处理，
+    通道队首的记录发送完成（或最终失败）后才发送下一条；不同通道在工作者数量内并行。
+
+    Attributes:
+        workers (int): 调度工作者数量
+        max_attempts (int): 单条记录最大尝试次数
+        max_ready (int): 内存中排队记录数上限，0 表示不限制
+        retention_hours (int): 已完成或已失败记录的保留时长（小时）
+        prune_interval (int): 清理过期记录的间隔（秒）
+        client (Optional[TelegramClient]): 用于发送的Telegram客户端
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_attempts: int = 3,
+        max_ready: int = 0,
+        retention_hours: int = 24,
+        prune_interval: int = 600
+    ) -> None:
+        """初始化发件箱（数据表在 start 时创建）
+
+        Args:
+            workers: 调度工作者数量，默认为4
+            max_attempts: 单条记录最大尝试次数，默认为3
+            max_ready: 内存中排队记录数上限，超出的记录只保留在数据库中，
+                待队列消化过半后再分批载入，默认为0（不限制）
+            retention_hours: 已完成或已失败记录的保留时长（小时），默认为24
+            prune_interval: 清理过期记录的间隔（秒），默认为600
+        """
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.max_ready = max_ready
+        self.retention_hours = retention_hours
+        self.prune_interval = prune_interval
+        self.client: Optional[TelegramClient] = None
+        self._ready: "asyncio.Queue[Lane]" = asyncio.Queue()
+        self._lanes: Dict[Lane, Deque[OutboxRow]] = {}
+        self._scheduled: Set[Lane] = set()
+        self._retries: Set[asyncio.TimerHandle] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._queued: Set[int] = set()
+        self._spilled = False
+        self._loading = False
+        self._load_lock = asyncio.Lock()
+        self._failure_listeners: List[FailureListener] = []
+
+    def add_failure_listener(self, listener: FailureListener) -> None:
+        """注册记录最终失败（达到最大尝试次数）时调用的监听器
+
+        Args:
+            listener: 以失败记录为参数的协程函数
+        """
+        self._failure_listeners.append(listener)
+
+    async def _notify_failed(self, row: OutboxRow) -> None:
+        """通知所有失败监听器，单个监听器出错不影响其他监听器
+
+        Args:
+            row: 最终失败的记录
+        """
+        for listener in self._failure_listeners:
+            try:
+                await listener(row)
+            except Exception as e:
+                logger.error(f"处理发送失败的记录 {row[0]} 时出错: {str(e)}", exc_info=True)
+
+    async def enqueue(self, items: List[Dict[str, Any]]) -> int:
+        """批量记录待发送项并交给调度工作者
+
+        Args:
+            items: 待发送项列表，每项包含 source_chat_id、message_id、destination，
+                可选 kind ('forward' 或 'text')、payload 与 deferred；
+                deferred 为真时仅记录，待 release_deferred 调用后再发送
+
+        Returns:
+            int: 实际新入队的数量（已存在的记录会被忽略）
+
+        Raises:
+            RuntimeError: 当写入发件箱失败时抛出
+        """
+        if not items:
+            return 0
+
+        values = [
+            (
+                int(item.get('source_chat_id') or 0),
+                int(item.get('message_id') or 0),
+                str(item['destination']),
+                item.get('kind', 'forward'),
+                item.get('payload', ''),
+                'deferred' if item.get('deferred') else 'pending'
+            )
+            for item in items
+        ]
+        try:
+            inserted = await adb.call(_insert_rows, values)
+        except Exception as e:
+            logger.error(f"写入发件箱失败: {str(e)}")
+            raise RuntimeError("写入发件箱失败") from e
+
+        for index, row_id in inserted:
+            *row, status = values[index]
+            if status == 'pending':
+                self._submit((row_id, *row, 0), direct=True)
+        if len(inserted) < len(items):
+            logger.info(f"忽略 {len(items) - len(inserted)} 条重复的发送记录")
+        return len(inserted)
+
+    async def release_deferred(self) -> int:
+        """将延后的记录转为待发送并放入调度队列
+
+        Returns:
+            int: 释放的记录数
+        """
+        released = await adb.call(_release_deferred)
+        if released:
+            await self._load_pending()
+            logger.info(f"已释放 {released} 条延后的发送")
+        return released
+
+    async def _load_pending(self) -> int:
+        """将数据库中未完成的记录按ID顺序重新放入调度队列
+
+        载入期间新入队的记录先留在数据库中，由下一轮载入按顺序取回，
+        避免较新的记录越过尚未载入的较早记录。
+
+        Returns:
+            int: 重新放入队列的记录数
+        """
+        loaded = 0
+        async with self._load_lock:
+            while True:
+                self._spilled = False
+                self._loading = True
+                try:
+                    limit = len(self._queued) + self.max_ready if self.max_ready else -1
+                    rows = await adb.call(_select_pending, limit)
+                finally:
+                    self._loading = False
+                loaded += sum(self._submit(row) for row in rows)
+                if not self._spilled or (self.max_ready and len(self._queued) >= self.max_ready):
+                    return loaded
+
+    @property
+    def pending(self) -> int:
+        """内存中排队或正在发送的记录数"""
+        return len(self._queued)
+
+    def _submit(self, row: OutboxRow, direct: bool = False) -> bool:
+        """将记录放入所属通道，已在队列中的记录不会重复放入
+
+        Args:
+            row: 发件箱记录
+            direct: 是否为刚入队的记录；数据库中还有未载入的记录时，
+                刚入队的记录留在数据库中等待按顺序载入
+
+        Returns:
+            bool: 是否新放入队列（已达 max_ready 上限时记录留在数据库中，返回False）
+        """
+        if row[0] in self._queued:
+            return False
+        if (
+            (self.max_ready and len(self._queued) >= self.max_ready)
+            or (direct and (self._spilled or self._loading))
+        ):
+            self._spilled = True
+            return False
+        self._queued.add(row[0])
+        lane = (row[1], row[3])
+        rows = self._lanes.setdefault(lane, deque())
+        if rows and row[0] < rows[-1][0]:
+            # 较早的记录晚于较新的记录载入（如释放延后记录），按ID插入；队首可能正在发送，不参与排序
+            position = len(rows)
+            while position > 1 and rows[position - 1][0] > row[0]:
+                position -= 1
+            rows.insert(position, row)
+        else:
+            rows.append(row)
+        if lane not in self._scheduled:
+            self._scheduled.add(lane)
+            self._ready.put_nowait(lane)
+        return True
+
+    async def prune(self) -> int:
+        """分批删除超过保留时长的已完成或已失败记录
+
+        Returns:
+            int: 删除的记录数
+        """
+        age = f"-{self.retention_hours} hours"
+        total = 0
+        while True:
+            deleted = await adb.call(_delete_finished, age, PRUNE_BATCH_SIZE)
+            total += deleted
+            if deleted < PRUNE_BATCH_SIZE:
+                break
+        if total:
+            logger.info(f"发件箱已清理 {total} 条超过 {self.retention_hours} 小时的记录")
+        return total
+
+    async def _prune_loop(self) -> None:
+        """后台任务：定期清理过期记录"""
+        while True:
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error(f"清理发件箱失败: {str(e)}")
+            await asyncio.sleep(self.prune_interval)
+
+    async def _mark(self, row_id: int, status: str, attempts: int, error: Optional[str] = None) -> None:
+        """更新记录状态（由写线程与其他写请求合并提交）
+
+        Args:
+            row_id: 记录ID
+            status: 新状态 ('pending'、'deferred'、'done' 或 'failed')
+            attempts: 已尝试次数
+            error: 最近一次错误信息
+        """
+        try:
+            await adb.execute(MARK_SQL, (status, attempts, error, row_id))
+        except Exception as e:
+            # 状态未能记录时记录保持原状态，下次启动时重放
+            logger.error(f"更新发件箱记录 {row_id} 状态失败: {str(e)}")
+
+    async def start(self, client: TelegramClient) -> None:
+        """启动调度工作者，并重放上次未完成的发送
+
+        Args:
+            client: 用于发送的Telegram客户端
+        """
+        self.client = client
+        await adb.execute_group([
+            (CREATE_OUTBOX_SQL, (), False),
+            (CREATE_OUTBOX_INDEX_SQL, (), False)
+        ])
+        recovered = await self._load_pending()
+        if recovered:
+            logger.info(f"从发件箱恢复 {recovered} 条未完成的发送")
+        await self.release_deferred()
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._prune_loop()))
+        logger.info(f"发件箱已启动 {self.workers} 个调度工作者")
+
+    async def stop(self) -> None:
+        """停止调度工作者，未完成的记录保留在数据库中等待下次重放"""
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("发件箱调度工作者已停止")
+
+    async def _worker(self, index: int) -> None:
+        """调度工作者：每次领取一个通道并发送其队首记录
+
+        Args:
+            index: 工作者编号
+        """
+        while True:
+            lane = await self._ready.get()
+            rows = self._lanes.get(lane)
+            if not rows:
+                self._scheduled.discard(lane)
+                self._lanes.pop(lane, None)
+                continue
+            try:
+                retry = await self._dispatch(rows[0])
+            except Exception as e:
+                # 记录仍为待发送状态，下次启动时重放
+                logger.error(f"发件箱工作者 {index} 出错: {str(e)}", exc_info=True)
+                retry = None
+            if retry is not None:
+                # 重试记录留在队首，等待期间该通道的后续记录不会被发送
+                rows[0] = retry
+                self._schedule_retry(lane, self._retry_delay(retry[6]))
+                continue
+            self._queued.discard(rows.popleft()[0])
+            if rows:
+                self._ready.put_nowait(lane)
+            else:
+                self._scheduled.discard(lane)
+                self._lanes.pop(lane, None)
+            if self._spilled and len(self._queued) <= self.max_ready // 2:
+                try:
+                    await self._load_pending()
+                except Exception as e:
+                    logger.error(f"载入发件箱记录失败: {str(e)}")
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> float:
+        """计算重试等待时间（指数退避，最长10秒）
+
+        Args:
+            attempts: 已尝试次数
+
+        Returns:
+            float: 等待时间（秒）
+        """
+        return min(2 ** attempts, 10)
+
+    def _schedule_retry(self, lane: Lane, delay: float) -> None:
+        """在等待时间后将通道放回就绪队列
+
+        Args:
+            lane: 发送通道
+            delay: 等待时间（秒）
+        """
+        def wake() -> None:
+            self._retries.discard(handle)
+            self._ready.put_nowait(lane)
+
+        handle = asyncio.get_running_loop().call_later(delay, wake)
+        self._retries.add(handle)
+
+    async def _dispatch(self, row: OutboxRow) -> Optional[OutboxRow]:
+        """发送单条记录并记录结果
+
+        Args:
+            row: 发件箱记录
+
+        Returns:
+            Optional[OutboxRow]: 需要重试时返回更新了尝试次数的记录，发送完成或最终失败时返回None
+        """
+        row_id, _, _, destination, _, _, attempts = row
+        try:
+            await self._deliver(row)
+        except Exception as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                await self._mark(row_id, 'failed', attempts, str(e))
+                logger.error(f"发送到 {destination} 失败: {str(e)}", exc_info=True)
+                await self._notify_failed(row)
+                return None
+            await self._mark(row_id, 'pending', attempts, str(e))
+            logger.warning(f"发送失败，{self._retry_delay(attempts)}秒后重试...")
+            return (*row[:6], attempts)
+        await self._mark(row_id, 'done', attempts + 1)
+        logger.info(f"消息已成功发送到: {destination}")
+        return None
+
+    async def _deliver(self, row: OutboxRow) -> None:
+        """执行实际的发送
+
+        Args:
+            row: 发件箱记录
+
+        Raises:
+            ConnectionError: 当客户端未启动时抛出
+        """
+        if not self.client:
+            raise ConnectionError("Telegram客户端未初始化")
+
+        _, source_chat_id, message_id, destination, kind, payload, _ = row
+        if kind == 'text':
+            await self.client.send_message(destination, payload)
+            return
+
+        try:
+            await self.client.forward_messages(destination, message_id, from_peer=source_chat_id)
+        except ChatForwardsRestrictedError:
+            logger.info(f"此群组不允许转发，直接提取消息将发送到: {destination}")
+            message = await self.client.get_messages(source_chat_id, ids=message_id)
+            if message is None:
+                raise ValueError(f"原消息已不存在: {source_chat_id}/{message_id}")
+            await self.client.send_message(
+                destination,
+                message.message,
+                file=message.media,
+                link_preview=False
+            )
+            logger.info(f"已发送消息副本到: {destination}")
+
+# 创建全局发件箱实例
+outbox = Outbox(**config_manager.outbox_settings)
@@ -0,0 +1,217 @@
+"""性能诊断模块
+
+该模块提供两类诊断工具：
+1. LoopWatchdog: 常驻的事件循环延迟看门狗，发现回调阻塞超过阈值时记录事件循环线程的调用栈
+2. Profiler: 按需启动的限时性能分析，同时输出 cProfile 的 pstats 文件与采样得到的折叠栈文件
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import cProfile
+import logging
+import threading
+import traceback
+from collections import Counter
+from typing import Counter as CounterType, Optional
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+class LoopWatchdog:
+    """事件循环延迟看门狗
+
+    事件循环内的心跳协程定期记录时间戳，独立线程检查心跳是否超时；
+    一旦超时即抓取事件循环线程当前的调用栈，定位阻塞事件循环的同步调用。
+
+    Attributes:
+        interval (float): 心跳间隔（秒）
+        threshold (float): 判定为阻塞的时长（秒）
+        lag (float): 最近一次测得的调度延迟（秒）
+        max_lag (float): 运行以来的最大调度延迟（秒）
+        stalls (int): 检测到的阻塞次数
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.5) -> None:
+        """初始化看门狗
+
+        Args:
+            interval: 心跳间隔（秒），默认为0.1
+            threshold: 判定为阻塞的时长（秒），默认为0.5
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """在当前事件循环中启动心跳与看门狗线程"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        logger.info(f"事件循环看门狗已启动，阻塞阈值 {self.threshold}s")
+
+    async def stop(self) -> None:
+        """停止心跳与看门狗线程"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+        logger.info(f"事件循环看门狗已停止，最大延迟 {self.max_lag:.3f}s，阻塞 {self.stalls} 次")
+
+    async def _heartbeat(self) -> None:
+        """心跳协程：记录时间戳并测量调度延迟"""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag = max(0.0, now - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        """看门狗线程：心跳超时时记录事件循环线程的调用栈，每次阻塞只记录一次"""
+        reported_beat = None
+        while not self._stopped.wait(self.interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else '（无法获取调用栈）'
+            logger.warning(f"事件循环已阻塞 {blocked:.3f}s，当前调用栈:\n{stack}")
+
+class Profiler:
+    """按需启动的限时性能分析器
+
+    分析期间在事件循环线程启用 cProfile，同时由采样线程周期性记录事件循环线程的调用栈，
+    结束后输出 .pstats 与 .collapsed（可直接用于火焰图工具）两个文件。
+
+    Attributes:
+        duration (float): 单次分析时长（秒）
+        sample_interval (float): 调用栈采样间隔（秒）
+        output_dir (str): 分析结果输出目录
+    """
+
+    def __init__(
+        self,
+        duration: float = 30.0,
+        sample_interval: float = 0.005,
+        output_dir: str = 'data/profiles'
+    ) -> None:
+        """初始化性能分析器
+
+        Args:
+            duration: 单次分析时长（秒），默认为30.0
+            sample_interval: 调用栈采样间隔（秒），默认为0.005
+            output_dir: 分析结果输出目录，默认为'data/profiles'
+        """
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.output_dir = output_dir
+        self._profile: Optional[cProfile.Profile] = None
+        self._samples: CounterType[str] = Counter()
+        self._sampling = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop_thread_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        """是否正在进行分析"""
+        return self._profile is not None
+
+    def install_signal_handler(self, signum: Optional[int] = None) -> bool:
+        """注册触发分析的信号处理器（默认为 SIGUSR1）
+
+        Args:
+            signum: 信号编号，默认为 SIGUSR1
+
+        Returns:
+            bool: 是否注册成功（不支持信号的平台上返回False）
+        """
+        if signum is None:
+            signum = getattr(signal, 'SIGUSR1', None)
+        if signum is None:
+            logger.warning("当前平台不支持 SIGUSR1，无法通过信号触发性能分析")
+            return False
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, self.start)
+        except (NotImplementedError, RuntimeError) as e:
+            logger.warning(f"注册性能分析信号处理器失败: {str(e)}")
+            return False
+        logger.info(f"发送信号 {signum} 可启动 {self.duration}s 的性能分析")
+        return True
+
+    def start(self) -> None:
+        """启动一次限时分析，必须在事件循环线程中调用"""
+        if self.running:
+            logger.warning("性能分析正在进行中，忽略本次请求")
+            return
+
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._samples = Counter()
+        self._sampling.set()
+        self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self._timer = loop.call_later(self.duration, self.finish)
+        logger.info(f"性能分析已启动，持续 {self.duration}s")
+
+    def finish(self) -> None:
+        """结束分析并写出结果文件（提前调用时取消定时结束）"""
+        if not self._profile:
+            return
+        self._profile.disable()
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        # 等待采样线程退出后再读取采样结果，避免遍历时计数器仍在被修改
+        self._sampling.clear()
+        if self._sampler:
+            self._sampler.join()
+            self._sampler = None
+        profile, self._profile = self._profile, None
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(self.output_dir, time.strftime('profile-%Y%m%d-%H%M%S'))
+            profile.dump_stats(f"{prefix}.pstats")
+            with open(f"{prefix}.collapsed", 'w', encoding='utf-8') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"性能分析已完成，结果已写入: {prefix}.pstats / {prefix}.collapsed")
+        except Exception as e:
+            logger.error(f"写入性能分析结果失败: {str(e)}", exc_info=True)
+
+    def _sample(self) -> None:
+        """采样线程：周期性记录事件循环线程的调用栈"""
+        while self._sampling.is_set():
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self._samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.sample_interval)
@@ -0,0 +1,423 @@
+"""会话存储模块
+
+该模块提供写合并的Telethon会话后端：实体与更新状态保存在内存中，
+按固定间隔及关闭时批量写入磁盘。定期写出只在事件循环中复制数据，
+SQLite写入与 fsync 在线程池中执行。磁盘文件沿用Telethon SQLiteSession的格式，
+可与原有 my_bot_session.session 互换使用
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import datetime
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from telethon import utils
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession
+from telethon.sessions.memory import _SentFileType
+from telethon.tl import types
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 写出的会话文件版本（与当前Telethon SQLiteSession的 CURRENT_VERSION 一致，互相打开时无需升级）
+SESSION_VERSION = 8
+
+# 实体行: (id, hash, username, phone, name, date)
+EntityRow = Tuple[int, int, Optional[str], Optional[int], Optional[str], int]
+
+# 会话快照: (sessions行, 实体行, sent_files行, update_state行)
+Snapshot = Tuple[Tuple[Any, ...], List[EntityRow], List[Tuple[Any, ...]], List[Tuple[Any, ...]]]
+
+class BufferedSession(MemorySession):
+    """写合并的会话后端
+
+    认证信息（数据中心、auth_key、takeout_id）变化时立即落盘，
+    实体与更新状态只标记为脏数据，由 autoflush 定期或 close 时统一写出。
+    每次写出先写入临时文件并 fsync，再原子替换正式文件，崩溃时不会留下损坏的会话。
+
+    Attributes:
+        filename (str): 会话文件路径
+        flush_interval (float): 定期写出间隔（秒）
+        max_entities (int): 内存中保留的实体数上限，超出时淘汰最久未使用的实体，0 表示不限制
+        flushes (int): 已写出磁盘的次数
+    """
+
+    def __init__(
+        self,
+        session_id: str = 'my_bot_session',
+        flush_interval: float = 60.0,
+        max_entities: int = 0
+    ) -> None:
+        """初始化会话并从已有会话文件加载
+
+        Args:
+            session_id: 会话名称或文件路径，默认为'my_bot_session'
+            flush_interval: 定期写出间隔（秒），默认为60.0
+            max_entities: 内存中保留的实体数上限，默认为0（不限制）
+        """
+        super().__init__()
+        self.filename = session_id if session_id.endswith('.session') else f"{session_id}.session"
+        self.flush_interval = flush_interval
+        self.max_entities = max_entities
+        self.flushes = 0
+        self._entity_rows: Dict[int, EntityRow] = {}
+        self._ids_by_username: Dict[str, int] = {}
+        self._ids_by_phone: Dict[int, int] = {}
+        self._ids_by_name: Dict[str, int] = {}
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+        self._snapshot_seq = 0
+        self._written_seq = 0
+        if os.path.exists(self.filename):
+            self._load()
+
+    def _load(self) -> None:
+        """从会话文件读取全部数据到内存
+
+        Raises:
+            RuntimeError: 当会话文件无法读取时抛出
+        """
+        started = time.perf_counter()
+        try:
+            conn = sqlite3.connect(f"file:{self.filename}?mode=ro", uri=True)
+            try:
+                row = conn.execute(
+                    'select dc_id, server_address, port, auth_key, takeout_id from sessions'
+                ).fetchone()
+                if row:
+                    self._dc_id, self._server_address, self._port, key, self._takeout_id = row
+                    self._auth_key = AuthKey(data=key) if key else None
+                for entity in conn.execute(
+                    'select id, hash, username, phone, name, date from entities order by date'
+                ):
+                    self._index_entity(tuple(entity))
+                for file_row in conn.execute(
+                    'select md5_digest, file_size, type, id, hash from sent_files'
+                ):
+                    md5_digest, file_size, file_type, file_id, file_hash = file_row
+                    self._files[(md5_digest, file_size, _SentFileType(file_type))] = (file_id, file_hash)
+                for entity_id, pts, qts, date, seq in conn.execute(
+                    'select id, pts, qts, date, seq from update_state'
+                ):
+                    self._update_states[entity_id] = types.updates.State(
+                        pts=pts,
+                        qts=qts,
+                        date=datetime.datetime.fromtimestamp(date, tz=datetime.timezone.utc),
+                        seq=seq,
+                        unread_count=0
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"读取会话文件失败: {self.filename}: {str(e)}")
+            raise RuntimeError("读取会话文件失败") from e
+        logger.info(
+            f"会话已加载: {len(self._entity_rows)} 个实体，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    def _index_entity(self, row: EntityRow) -> bool:
+        """写入或更新实体行及其索引，超出 max_entities 时淘汰最久未使用的实体
+
+        Args:
+            row: 实体行
+
+        Returns:
+            bool: 实体数据是否发生变化
+        """
+        entity_id, _, username, phone, name, _ = row
+        previous = self._entity_rows.pop(entity_id, None)
+        if previous is not None and previous[:5] == row[:5]:
+            # 未变化的实体也重新插入到末尾，使字典顺序保持为最近使用顺序
+            self._entity_rows[entity_id] = previous
+            return False
+        if previous is not None:
+            self._unindex_entity(previous)
+        self._entity_rows[entity_id] = row
+        if username:
+            self._ids_by_username[username] = entity_id
+        if phone:
+            self._ids_by_phone[phone] = entity_id
+        if name:
+            self._ids_by_name[name] = entity_id
+        while self.max_entities and len(self._entity_rows) > self.max_entities:
+            oldest = next(iter(self._entity_rows))
+            self._unindex_entity(self._entity_rows.pop(oldest))
+        return True
+
+    def _unindex_entity(self, row: EntityRow) -> None:
+        """从用户名、电话与名称索引中移除实体行
+
+        Args:
+            row: 已从实体表移除的实体行
+        """
+        entity_id, _, username, phone, name, _ = row
+        for index, key in (
+            (self._ids_by_username, username),
+            (self._ids_by_phone, phone),
+            (self._ids_by_name, name)
+        ):
+            if key and index.get(key) == entity_id:
+                del index[key]
+
+    # 认证信息：变化时立即写出
+
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self._dirty = True
+        self.flush()
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self._dirty = True
+        self.flush()
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self._dirty = True
+        self.flush()
+
+    # 实体、更新状态与文件缓存：只标记脏数据
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty = True
+
+    def process_entities(self, tlo):
+        now = int(time.time())
+        for row in self._entities_to_rows(tlo):
+            if self._index_entity((*row, now)):
+                self._dirty = True
+
+    def cache_file(self, md5_digest, file_size, instance):
+        super().cache_file(md5_digest, file_size, instance)
+        self._dirty = True
+
+    def get_entity_rows_by_phone(self, phone):
+        return self._row_for(self._ids_by_phone.get(phone))
+
+    def get_entity_rows_by_username(self, username):
+        return self._row_for(self._ids_by_username.get(username))
+
+    def get_entity_rows_by_name(self, name):
+        return self._row_for(self._ids_by_name.get(name))
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            return self._row_for(id)
+        for candidate in (
+            types.PeerUser(id), types.PeerChat(id), types.PeerChannel(id)
+        ):
+            row = self._row_for(utils.get_peer_id(candidate))
+            if row:
+                return row
+        return None
+
+    def _row_for(self, entity_id: Optional[int]) -> Optional[Tuple[int, int]]:
+        """根据实体ID返回 (id, hash)，并将命中的实体移到最近使用的位置
+
+        Args:
+            entity_id: 实体ID
+
+        Returns:
+            Optional[Tuple[int, int]]: 找到时返回 (id, hash)，否则返回None
+        """
+        row = self._entity_rows.pop(entity_id, None) if entity_id is not None else None
+        if row is None:
+            return None
+        self._entity_rows[entity_id] = row
+        return (row[0], row[1])
+
+    # 写出
+
+    def save(self):
+        """Telethon定期调用：已启动定期写出时交由后台任务处理，否则立即写出"""
+        if self._dirty and self._task is None:
+            self.flush()
+
+    def flush(self) -> None:
+        """将内存中的会话数据原子写入磁盘（同步执行），无变化时不写
+
+        Raises:
+            RuntimeError: 当写出失败时抛出
+        """
+        if not self._dirty:
+            return
+        seq, snapshot = self._snapshot()
+        try:
+            self._write_snapshot(seq, snapshot)
+        except RuntimeError:
+            self._dirty = True
+            raise
+
+    async def flush_async(self) -> None:
+        """在事件循环中复制会话数据，在线程池中写入磁盘，无变化时不写
+
+        Raises:
+            RuntimeError: 当写出失败时抛出
+        """
+        if not self._dirty:
+            return
+        seq, snapshot = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, seq, snapshot)
+        except RuntimeError:
+            self._dirty = True
+            raise
+
+    def _snapshot(self) -> Tuple[int, Snapshot]:
+        """复制当前会话数据并清除脏标记
+
+        Returns:
+            Tuple[int, Snapshot]: (快照序号, 快照)
+        """
+        self._dirty = False
+        self._snapshot_seq += 1
+        session_row = (
+            self._dc_id,
+            self._server_address,
+            self._port,
+            self._auth_key.key if self._auth_key else b'',
+            self._takeout_id,
+            # 与 SQLiteSession 默认行为一致，不在磁盘上保存临时密钥
+            b''
+        )
+        files = [
+            (md5_digest, file_size, file_type.value, file_id, file_hash)
+            for (md5_digest, file_size, file_type), (file_id, file_hash) in self._files.items()
+        ]
+        states = [
+            (entity_id, state.pts, state.qts, int(state.date.timestamp()), state.seq)
+            for entity_id, state in self._update_states.items()
+        ]
+        return self._snapshot_seq, (session_row, list(self._entity_rows.values()), files, states)
+
+    def _write_snapshot(self, seq: int, snapshot: Snapshot) -> bool:
+        """将快照原子写入会话文件（可在线程池中执行）
+
+        写出串行进行；比已写出的快照更旧的快照会被跳过，不会覆盖较新的认证信息。
+
+        Args:
+            seq: 快照序号
+            snapshot: 快照
+
+        Returns:
+            bool: 是否写出
+
+        Raises:
+            RuntimeError: 当写出失败时抛出
+        """
+        with self._write_lock:
+            if seq <= self._written_seq:
+                return False
+            tmp_path = f"{self.filename}.tmp"
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                conn = sqlite3.connect(tmp_path)
+                try:
+                    conn.execute('pragma journal_mode = off')
+                    conn.execute('pragma synchronous = off')
+                    self._write_tables(conn, snapshot)
+                    conn.commit()
+                finally:
+                    conn.close()
+                with open(tmp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.filename)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"写出会话文件失败: {str(e)}")
+                raise RuntimeError("写出会话文件失败") from e
+            self._written_seq = seq
+            self.flushes += 1
+        logger.debug(f"会话已写出: {len(snapshot[1])} 个实体")
+        return True
+
+    @staticmethod
+    def _write_tables(conn: sqlite3.Connection, snapshot: Snapshot) -> None:
+        """按SQLiteSession的表结构写入快照
+
+        Args:
+            conn: 临时会话文件的数据库连接
+            snapshot: 会话快照
+        """
+        session_row, entities, files, states = snapshot
+        conn.executescript('''
+        create table version (version integer primary key);
+        create table sessions (
+            dc_id integer primary key,
+            server_address text,
+            port integer,
+            auth_key blob,
+            takeout_id integer,
+            tmp_auth_key blob
+        );
+        create table entities (
+            id integer primary key,
+            hash integer not null,
+            username text,
+            phone integer,
+            name text,
+            date integer
+        );
+        create table sent_files (
+            md5_digest blob,
+            file_size integer,
+            type integer,
+            id integer,
+            hash integer,
+            primary key(md5_digest, file_size, type)
+        );
+        create table update_state (
+            id integer primary key,
+            pts integer,
+            qts integer,
+            date integer,
+            seq integer
+        );
+        ''')
+        conn.execute('insert into version values (?)', (SESSION_VERSION,))
+        conn.execute('insert into sessions values (?,?,?,?,?,?)', session_row)
+        conn.executemany('insert into entities values (?,?,?,?,?,?)', entities)
+        conn.executemany('insert into sent_files values (?,?,?,?,?)', files)
+        conn.executemany('insert into update_state values (?,?,?,?,?)', states)
+
+    async def autoflush(self) -> None:
+        """后台任务：按间隔写出脏数据"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logger.error(f"定期写出会话失败: {str(e)}")
+
+    def start_autoflush(self) -> None:
+        """在当前事件循环中启动定期写出任务"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.autoflush())
+            logger.info(f"会话定期写出已启动，间隔 {self.flush_interval}s")
+
+    def close(self):
+        """停止定期写出，等待进行中的写出完成后写出剩余数据"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        with self._write_lock:
+            pass
+        self.flush()
+
+    def clone(self, to_instance=None):
+        """为CDN等临时连接创建纯内存会话，避免覆盖主会话文件"""
+        return to_instance or MemorySession()
+
+    def delete(self):
+        """删除会话文件"""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,513 @@
+"""消息写入缓冲区（spool）模块
+
+该模块在SQLite之前放置一个只追加的内存映射缓冲区，消息先写入缓冲区再由后台批量导入数据库：
+1. 缓冲区由若干固定大小的段文件组成，通过 mmap 写入，追加单条消息不产生系统调用
+2. 每条记录为 [u32 长度][u32 CRC][负载]，CRC 以段代号为初值，回收后的旧记录不会被误读
+3. 后台压缩任务按大事务将记录导入 messages 表，并在同一事务中记录已导入位置（spool_applied 表），
+   因此崩溃后重放不会重复导入；导入完成的段被回收复用
+4. 段代号单调递增，回收段时在同一事务中记录下一个段代号（spool_meta 表），
+   重启后不会复用旧代号，复用段中残留的旧记录无法通过校验
+5. 启动时重放所有尚未导入的段
+数据库变慢或被锁时消息留在缓冲区中等待重试，不会丢失
+"""
+
+import os
+import json
+import mmap
+import zlib
+import struct
+import asyncio
+import logging
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from core.config_manager import config_manager
+from core.async_db import adb
+from core.db_handler import INSERT_MESSAGE_SQL, message_to_row
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 段文件头: 魔数、格式版本、段代号（0 表示空闲）
+SEGMENT_MAGIC = b'TGSP'
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sIQ')
+
+# 记录头: 负载长度、CRC
+RECORD_HEADER = struct.Struct('<II')
+
+CREATE_APPLIED_SQL = '''
+CREATE TABLE IF NOT EXISTS spool_applied (
+    generation INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL
+)
+'''
+UPSERT_APPLIED_SQL = '''
+INSERT INTO spool_applied (generation, offset) VALUES (?, ?)
+ON CONFLICT (generation) DO UPDATE SET offset = excluded.offset
+'''
+CREATE_META_SQL = '''
+CREATE TABLE IF NOT EXISTS spool_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+)
+'''
+SELECT_NEXT_GENERATION_SQL = "SELECT value FROM spool_meta WHERE key = 'next_generation'"
+UPSERT_NEXT_GENERATION_SQL = '''
+INSERT INTO spool_meta (key, value) VALUES ('next_generation', ?)
+ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)
+'''
+
+def encode_record(data: Dict[str, Any]) -> bytes:
+    """将消息数据编码为记录负载
+
+    Args:
+        data: 消息数据字典
+
+    Returns:
+        bytes: 按 INSERT_MESSAGE_SQL 列顺序排列的明文行（JSON数组）
+
+    Raises:
+        ValueError: 当输入数据无效时抛出
+    """
+    row = list(message_to_row(data)[:-1])
+    date = row[8]
+    if isinstance(date, datetime.datetime):
+        # 与 sqlite3 默认的 datetime 适配器保存的格式一致
+        row[8] = date.isoformat(' ')
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class Segment:
+    """内存映射的段文件
+
+    Attributes:
+        path (str): 段文件路径
+        size (int): 段文件大小（字节）
+        generation (int): 段代号，0 表示空闲
+        write_pos (int): 下一条记录的写入位置
+        applied (int): 已导入数据库的位置
+        sealed (bool): 是否已写满（不再追加）
+        records (int): 已写入但尚未导入的记录数
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        """打开段文件，不存在时按指定大小创建
+
+        Args:
+            path: 段文件路径
+            size: 新建时的文件大小（字节）
+        """
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.truncate(size)
+        self._file = open(path, 'r+b')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.mm = mmap.mmap(self._file.fileno(), self.size)
+        magic, version, generation = SEGMENT_HEADER.unpack_from(self.mm, 0)
+        valid = magic == SEGMENT_MAGIC and version == SEGMENT_VERSION
+        self.generation = generation if valid else 0
+        self.write_pos = self.applied = SEGMENT_HEADER.size
+        self.sealed = False
+        self.records = 0
+
+    def reset(self, generation: int) -> None:
+        """以新的段代号开始写入
+
+        Args:
+            generation: 段代号，0 表示将段标记为空闲
+        """
+        SEGMENT_HEADER.pack_into(self.mm, 0, SEGMENT_MAGIC, SEGMENT_VERSION, generation)
+        self.generation = generation
+        self.write_pos = self.applied = SEGMENT_HEADER.size
+        self.sealed = False
+        self.records = 0
+
+    def append(self, payload: bytes) -> bool:
+        """追加一条记录（先写负载再写记录头，读取方不会看到不完整的记录）
+
+        Args:
+            payload: 记录负载
+
+        Returns:
+            bool: 剩余空间不足时返回False
+        """
+        start = self.write_pos
+        end = start + RECORD_HEADER.size + len(payload)
+        if end > self.size:
+            return False
+        self.mm[start + RECORD_HEADER.size:end] = payload
+        RECORD_HEADER.pack_into(
+            self.mm, start, len(payload), zlib.crc32(payload, self.generation & 0xFFFFFFFF)
+        )
+        self.write_pos = end
+        self.records += 1
+        return True
+
+    def scan(self, start: int, end: int, limit: int) -> Tuple[List[bytes], int]:
+        """读取 [start, end) 范围内的完整记录，遇到空白或校验失败的记录时停止
+
+        Args:
+            start: 起始位置
+            end: 结束位置
+            limit: 最多读取的记录数
+
+        Returns:
+            Tuple[List[bytes], int]: (记录负载列表, 最后一条记录之后的位置)
+        """
+        payloads: List[bytes] = []
+        pos = start
+        seed = self.generation & 0xFFFFFFFF
+        while len(payloads) < limit and pos + RECORD_HEADER.size <= end:
+            length, crc = RECORD_HEADER.unpack_from(self.mm, pos)
+            body = pos + RECORD_HEADER.size
+            if length == 0 or body + length > end:
+                break
+            payload = self.mm[body:body + length]
+            if zlib.crc32(payload, seed) != crc:
+                break
+            payloads.append(payload)
+            pos = body + length
+        return payloads, pos
+
+    def close(self) -> None:
+        """将映射写回磁盘并关闭文件"""
+        self.mm.flush()
+        self.mm.close()
+        self._file.close()
+
+class Spool:
+    """只追加的内存映射消息缓冲区
+
+    Attributes:
+        enabled (bool): 是否启用，未启用时 append 始终返回False
+        directory (str): 段文件目录
+        segment_size (int): 新建段文件的大小（字节）
+        max_segments (int): 段文件数量上限，全部写满时 append 返回False
+        batch_records (int): 单个导入事务最多包含的记录数
+        compact_interval (float): 后台导入间隔（秒）
+        sync_interval (float): 将映射写回磁盘的间隔（秒）
+        report_interval (float): 输出吞吐与积压统计的间隔（秒）
+        written (int): 已写入的记录数
+        applied (int): 已导入数据库的记录数
+        rejected (int): 因缓冲区已满而未写入的记录数
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        directory: str = 'data/spool',
+        segment_size: int = 8 * 1024 * 1024,
+        max_segments: int = 16,
+        batch_records: int = 5000,
+        compact_interval: float = 0.5,
+        sync_interval: float = 1.0,
+        report_interval: float = 60.0
+    ) -> None:
+        """初始化缓冲区（段文件在 start 时打开）
+
+        Args:
+            enabled: 是否启用，默认为True
+            directory: 段文件目录，默认为'data/spool'
+            segment_size: 新建段文件的大小（字节），默认为8MB
+            max_segments: 段文件数量上限，默认为16
+            batch_records: 单个导入事务最多包含的记录数，默认为5000
+            compact_interval: 后台导入间隔（秒），默认为0.5
+            sync_interval: 将映射写回磁盘的间隔（秒），默认为1.0
+            report_interval: 输出吞吐与积压统计的间隔（秒），默认为60.0
+        """
+        self.enabled = enabled
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.batch_records = batch_records
+        self.compact_interval = compact_interval
+        self.sync_interval = sync_interval
+        self.report_interval = report_interval
+        self.written = 0
+        self.applied = 0
+        self.rejected = 0
+        self._segments: List[Segment] = []
+        self._active: Optional[Segment] = None
+        self._next_generation = 1
+        self._dirty = False
+        self._full = False
+        self._opened = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        """缓冲区是否已打开"""
+        return self._opened
+
+    def _in_use(self) -> List[Segment]:
+        """按段代号排序的非空闲段
+
+        Returns:
+            List[Segment]: 非空闲段列表
+        """
+        return sorted(
+            (segment for segment in self._segments if segment.generation),
+            key=lambda segment: segment.generation
+        )
+
+    def backlog(self) -> Tuple[int, int]:
+        """获取尚未导入数据库的积压量
+
+        Returns:
+            Tuple[int, int]: (记录数, 字节数)
+        """
+        segments = self._in_use()
+        return (
+            sum(segment.records for segment in segments),
+            sum(segment.write_pos - segment.applied for segment in segments)
+        )
+
+    # 写入
+
+    def append(self, data: Dict[str, Any]) -> bool:
+        """将消息写入缓冲区
+
+        Args:
+            data: 消息数据字典
+
+        Returns:
+            bool: 缓冲区未启动或已满时返回False，调用方应直接写入数据库
+
+        Raises:
+            ValueError: 当输入数据无效时抛出
+        """
+        payload = encode_record(data)
+        if self._active is None or not self._active.append(payload):
+            if not self._rotate() or not self._active.append(payload):
+                self.rejected += 1
+                return False
+        self._full = False
+        self.written += 1
+        self._dirty = True
+        return True
+
+    def _rotate(self) -> bool:
+        """封存当前段并切换到空闲段，必要时新建段文件
+
+        Returns:
+            bool: 是否切换成功
+        """
+        if not self.started:
+            return False
+        if self._active is not None:
+            self._active.sealed = True
+            self._active = None
+        segment = next((segment for segment in self._segments if not segment.generation), None)
+        if segment is None:
+            if len(self._segments) >= self.max_segments:
+                if not self._full:
+                    self._full = True
+                    logger.warning(f"消息缓冲区已满（{self.max_segments} 个段），消息将直接写入数据库")
+                return False
+            path = os.path.join(self.directory, f"segment-{len(self._segments):03d}.spool")
+            segment = Segment(path, self.segment_size)
+            self._segments.append(segment)
+        segment.reset(self._next_generation)
+        self._next_generation += 1
+        self._active = segment
+        return True
+
+    # 导入
+
+    def _read_batch(self, segment: Segment, end: int) -> Tuple[List[Tuple[Any, ...]], int]:
+        """读取一批记录并转换为插入参数（在线程池中执行）
+
+        Args:
+            segment: 段
+            end: 读取的结束位置
+
+        Returns:
+            Tuple[List[Tuple[Any, ...]], int]: (插入参数列表, 读取结束的位置)
+        """
+        payloads, pos = segment.scan(segment.applied, end, self.batch_records)
+        codec = adb.codec
+        rows = []
+        for payload in payloads:
+            row = json.loads(payload)
+            message, dict_version = codec.encode(row[7])
+            rows.append((*row[:7], message, row[8], row[9], dict_version))
+        return rows, pos
+
+    async def _compact(self) -> int:
+        """将所有段中尚未导入的记录导入数据库，并回收导入完成的已封存段
+
+        Returns:
+            int: 本次导入的记录数
+
+        Raises:
+            RuntimeError: 当写入数据库失败时抛出（记录保留在缓冲区中）
+        """
+        loop = asyncio.get_running_loop()
+        total = 0
+        for segment in self._in_use():
+            while segment.applied < segment.write_pos:
+                end = segment.write_pos
+                rows, pos = await loop.run_in_executor(None, self._read_batch, segment, end)
+                if pos == segment.applied:
+                    logger.error(
+                        f"段 {segment.path} 在位置 {pos} 处记录损坏，丢弃其后 {segment.write_pos - pos} 字节"
+                    )
+                    if self._active is segment:
+                        self._active = None
+                    segment.sealed = True
+                    segment.write_pos = pos
+                    segment.records = 0
+                    break
+                await adb.execute_group([
+                    (INSERT_MESSAGE_SQL, rows, True),
+                    (UPSERT_APPLIED_SQL, (segment.generation, pos), False)
+                ])
+                segment.applied = pos
+                segment.records -= len(rows)
+                self.applied += len(rows)
+                total += len(rows)
+            if segment.sealed and segment.applied >= segment.write_pos:
+                await self._recycle(segment)
+        return total
+
+    async def _recycle(self, segment: Segment) -> None:
+        """将导入完成的段标记为空闲
+
+        段代号只保存在段文件头中，因此删除其导入位置的同一事务中记录下一个段代号，
+        使该代号在重启后也不会被复用。
+
+        Args:
+            segment: 段
+        """
+        generation = segment.generation
+        segment.reset(0)
+        segment.mm.flush(0, mmap.PAGESIZE)
+        await adb.execute_group([
+            ('DELETE FROM spool_applied WHERE generation = ?', (generation,), False),
+            (UPSERT_NEXT_GENERATION_SQL, (self._next_generation,), False)
+        ])
+
+    async def _sync(self) -> None:
+        """将所有非空闲段的映射写回磁盘"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        loop = asyncio.get_running_loop()
+        for segment in self._in_use():
+            await loop.run_in_executor(None, segment.mm.flush)
+
+    async def _run(self) -> None:
+        """后台任务：定期导入、写回磁盘并输出统计"""
+        loop = asyncio.get_running_loop()
+        next_sync = loop.time() + self.sync_interval
+        next_report = loop.time() + self.report_interval
+        last_written, last_applied, last_time = self.written, self.applied, loop.time()
+        while True:
+            try:
+                if await self._compact() < self.batch_records:
+                    await asyncio.sleep(self.compact_interval)
+            except Exception as e:
+                logger.error(f"消息缓冲区导入失败，稍后重试: {str(e)}")
+                await asyncio.sleep(self.compact_interval)
+
+            now = loop.time()
+            if now >= next_sync:
+                next_sync = now + self.sync_interval
+                await self._sync()
+            if now >= next_report:
+                next_report = now + self.report_interval
+                elapsed = now - last_time
+                records, size = self.backlog()
+                logger.info(
+                    f"消息缓冲区: 写入 {(self.written - last_written) / elapsed:.0f} 条/秒，"
+                    f"导入 {(self.applied - last_applied) / elapsed:.0f} 条/秒，"
+                    f"积压 {records} 条 ({size / 1024:.1f}KB)，"
+                    f"使用 {len(self._in_use())}/{self.max_segments} 个段"
+                )
+                last_written, last_applied, last_time = self.written, self.applied, now
+
+    async def start(self) -> None:
+        """打开段文件，重放上次未导入的记录并启动后台导入
+
+        读取导入位置失败时本次不启用缓冲区（消息直接写入数据库，段文件留待下次启动重放）；
+        重放失败时记录错误，由后台导入任务继续重试。
+        """
+        if not self.enabled:
+            logger.info("消息缓冲区未启用，消息将直接写入数据库")
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            await adb.execute_group([
+                (CREATE_APPLIED_SQL, (), False),
+                (CREATE_META_SQL, (), False)
+            ])
+            applied_offsets = dict(
+                tuple(row) for row in await adb.fetch_all('SELECT generation, offset FROM spool_applied')
+            )
+            meta = await adb.fetch_all(SELECT_NEXT_GENERATION_SQL)
+        except Exception as e:
+            logger.error(f"读取消息缓冲区导入位置失败，本次运行消息将直接写入数据库: {str(e)}")
+            return
+
+        loop = asyncio.get_running_loop()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.spool'):
+                continue
+            segment = Segment(os.path.join(self.directory, name), self.segment_size)
+            self._segments.append(segment)
+            if not segment.generation:
+                continue
+            segment.applied = applied_offsets.get(segment.generation, SEGMENT_HEADER.size)
+            payloads, segment.write_pos = await loop.run_in_executor(
+                None, segment.scan, segment.applied, segment.size, segment.size
+            )
+            segment.records = len(payloads)
+            segment.sealed = True
+
+        # 下一个段代号大于段文件头、导入位置表中出现过的代号，且不小于已记录的值
+        used = [segment.generation for segment in self._segments] + list(applied_offsets)
+        self._next_generation = max([1, *(generation + 1 for generation in used), *(row[0] for row in meta)])
+        self._opened = True
+        pending, _ = self.backlog()
+        try:
+            if pending:
+                logger.info(f"正在重放消息缓冲区中未导入的 {pending} 条消息...")
+                replayed = await self._compact()
+                logger.info(f"已重放 {replayed} 条消息")
+            else:
+                for segment in self._in_use():
+                    await self._recycle(segment)
+        except Exception as e:
+            records, _ = self.backlog()
+            logger.error(f"重放消息缓冲区失败，剩余 {records} 条消息将由后台任务重试: {str(e)}")
+
+        self._task = loop.create_task(self._run())
+        logger.info(
+            f"消息缓冲区已启动: {self.directory}，段大小 {self.segment_size // 1024}KB，"
+            f"最多 {self.max_segments} 个段"
+        )
+
+    async def stop(self) -> None:
+        """停止后台任务，导入剩余记录后关闭段文件（导入失败的记录在下次启动时重放）"""
+        if not self.started:
+            return
+        self._opened = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._active is not None:
+            self._active.sealed = True
+            self._active = None
+        try:
+            await self._compact()
+        except Exception as e:
+            records, _ = self.backlog()
+            logger.error(f"关闭前导入消息缓冲区失败，{records} 条消息将在下次启动时重放: {str(e)}")
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        logger.info(f"消息缓冲区已关闭: 共写入 {self.written} 条，导入 {self.applied} 条")
+
+# 创建全局消息缓冲区实例
+spool = Spool(**config_manager.spool_settings)
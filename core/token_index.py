@@ -0,0 +1,200 @@
+"""已发送令牌索引模块
+
+该模块记录已投递给各机器人的提取令牌（如 showfilesbot 代码），
+使用SQLite表持久化并在前端维护内存LRU缓存，避免重复发送。
+令牌在写入发件箱时记录，发件箱记录最终失败时撤销，未送达的令牌不会被永久跳过。
+数据库读写经由 adb 执行，不在事件循环中直接访问数据库
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+from core.config_manager import config_manager
+from core.async_db import adb
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 单次查询的最大参数数量（低于旧版SQLite的999个变量上限）
+QUERY_CHUNK_SIZE = 500
+
+CREATE_SEEN_TOKENS_SQL = '''
+CREATE TABLE IF NOT EXISTS seen_tokens (
+    bot TEXT NOT NULL,
+    token TEXT NOT NULL,
+    seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (bot, token)
+) WITHOUT ROWID
+'''
+CREATE_SEEN_TOKENS_INDEX_SQL = '''
+CREATE INDEX IF NOT EXISTS idx_seen_tokens_seen_at
+ON seen_tokens (seen_at)
+'''
+
+class SeenTokenIndex:
+    """有界的已发送令牌索引
+
+    Attributes:
+        memory_size (int): 内存LRU缓存容量
+        max_rows (int): 数据表保留的最大令牌数，超出时淘汰最早记录
+    """
+
+    def __init__(
+        self,
+        memory_size: int = 10000,
+        max_rows: int = 200000
+    ) -> None:
+        """初始化令牌索引（数据表在 start 时创建）
+
+        Args:
+            memory_size: 内存LRU缓存容量，默认为10000
+            max_rows: 数据表保留的最大令牌数，默认为200000
+        """
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self._lru: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._inserts_since_prune = 0
+
+    async def start(self) -> None:
+        """创建令牌数据表
+
+        Raises:
+            RuntimeError: 当创建表失败时抛出
+        """
+        await adb.execute_group([
+            (CREATE_SEEN_TOKENS_SQL, (), False),
+            (CREATE_SEEN_TOKENS_INDEX_SQL, (), False)
+        ])
+        logger.info("令牌索引数据表已创建/验证")
+
+    def _remember(self, bot: str, token: str) -> None:
+        """将令牌放入LRU缓存
+
+        Args:
+            bot: 目标机器人
+            token: 令牌
+        """
+        key = (bot, token)
+        self._lru[key] = None
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def forget(self, bot: str, tokens: Iterable[str]) -> None:
+        """从LRU缓存中移除令牌，用于撤销 filter_new 预占但未能发送的令牌
+
+        Args:
+            bot: 目标机器人
+            tokens: 令牌
+        """
+        for token in tokens:
+            self._lru.pop((bot, token), None)
+
+    async def filter_new(self, bot: str, tokens: Iterable[str]) -> List[str]:
+        """过滤出尚未发送给指定机器人的令牌（保持原顺序并去除重复）
+
+        返回的令牌会立即放入LRU缓存，使并发处理的其他消息不会再次取得同一令牌；
+        发送失败时应调用 forget 撤销。
+
+        Args:
+            bot: 目标机器人
+            tokens: 候选令牌
+
+        Returns:
+            List[str]: 未发送过的令牌
+        """
+        candidates = [token for token in dict.fromkeys(tokens) if not self._touch(bot, token)]
+        if not candidates:
+            return []
+
+        seen = set()
+        for start in range(0, len(candidates), QUERY_CHUNK_SIZE):
+            chunk = candidates[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = await adb.fetch_all(
+                f'SELECT token FROM seen_tokens WHERE bot = ? AND token IN ({placeholders})',
+                (bot, *chunk)
+            )
+            seen.update(row[0] for row in rows)
+
+        new_tokens = []
+        for token in candidates:
+            # 查询期间其他消息可能已预占同一令牌
+            if token not in seen and not self._touch(bot, token):
+                new_tokens.append(token)
+            self._remember(bot, token)
+        return new_tokens
+
+    def _touch(self, bot: str, token: str) -> bool:
+        """检查令牌是否在LRU缓存中，存在时移到末尾
+
+        Args:
+            bot: 目标机器人
+            token: 令牌
+
+        Returns:
+            bool: 是否在缓存中
+        """
+        key = (bot, token)
+        if key not in self._lru:
+            return False
+        self._lru.move_to_end(key)
+        return True
+
+    async def mark_seen(self, bot: str, tokens: List[str]) -> None:
+        """记录已发送的令牌，并按需淘汰最早的记录
+
+        Args:
+            bot: 目标机器人
+            tokens: 已发送的令牌
+
+        Raises:
+            RuntimeError: 当写入失败时抛出
+        """
+        if not tokens:
+            return
+        await adb.executemany(
+            'INSERT OR IGNORE INTO seen_tokens (bot, token) VALUES (?, ?)',
+            [(bot, token) for token in tokens]
+        )
+        for token in tokens:
+            self._remember(bot, token)
+
+        self._inserts_since_prune += len(tokens)
+        if self._inserts_since_prune >= max(1, self.max_rows // 10):
+            await self._prune()
+
+    async def unmark_seen(self, bot: str, tokens: List[str]) -> None:
+        """撤销已记录的令牌（发送最终失败时调用），使之后的消息可以再次发送
+
+        Args:
+            bot: 目标机器人
+            tokens: 未能送达的令牌
+
+        Raises:
+            RuntimeError: 当写入失败时抛出
+        """
+        if not tokens:
+            return
+        self.forget(bot, tokens)
+        await adb.executemany(
+            'DELETE FROM seen_tokens WHERE bot = ? AND token = ?',
+            [(bot, token) for token in tokens]
+        )
+
+    async def _prune(self) -> None:
+        """淘汰超出 max_rows 的最早记录"""
+        self._inserts_since_prune = 0
+        rows = await adb.fetch_all('SELECT COUNT(*) FROM seen_tokens')
+        excess = rows[0][0] - self.max_rows
+        if excess <= 0:
+            return
+        await adb.execute('''
+        DELETE FROM seen_tokens WHERE (bot, token) IN (
+            SELECT bot, token FROM seen_tokens ORDER BY seen_at LIMIT ?
+        )
+        ''', (excess,))
+        logger.info(f"令牌索引已淘汰 {excess} 条最早记录")
+
+# 创建全局令牌索引实例
+seen_tokens = SeenTokenIndex(**config_manager.seen_token_settings)
@@ -0,0 +1,211 @@
+"""消息路由模块
+
+该模块将 patterns.json 中的规则编译为按 chat_id 索引的路由表，
+处理消息时只需 O(1) 查找出与该聊天相关的规则，再执行正则匹配。
+规则的 deliver 字段决定命中后的投递方式：
+- 'forward'（默认）：将整条消息转发给机器人
+- 'tokens'：提取所有匹配的令牌，去重后合并为文本消息发送给机器人
+"""
+
+import re
+import logging
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageMediaDice
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+DELIVER_MODES = ('tokens', 'forward')
+
+def media_kind(message: Any) -> str:
+    """获取消息的媒体类型
+
+    Args:
+        message: Telegram消息对象
+
+    Returns:
+        str: 'text'、'photo'、'video'、'document'、'dice' 或其他媒体类型的小写名称
+    """
+    media = getattr(message, 'media', None)
+    if not media:
+        return 'text'
+    if isinstance(media, MessageMediaPhoto):
+        return 'photo'
+    if isinstance(media, MessageMediaDocument):
+        mime_type = getattr(media.document, 'mime_type', '') or ''
+        return 'video' if mime_type.startswith('video') else 'document'
+    if isinstance(media, MessageMediaDice):
+        return 'dice'
+    return type(media).__name__.replace('MessageMedia', '').lower()
+
+def _to_set(item: Dict[str, Any], key: str, cast: type) -> Optional[FrozenSet[Any]]:
+    """读取规则中的作用域字段
+
+    Args:
+        item: 规则配置
+        key: 作用域字段名
+        cast: 元素类型
+
+    Returns:
+        Optional[FrozenSet[Any]]: 作用域集合，未配置时返回None（表示不限制）
+    """
+    value = item.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        value = [value]
+    return frozenset(cast(v) for v in value)
+
+class RoutingIndex:
+    """按 chat_id 索引的规则路由表
+
+    未配置 chat_ids 的规则进入通配桶；每个具体 chat_id 的规则集在编译时
+    与通配桶合并（保持原配置顺序），因此查找只需一次字典访问。
+
+    Attributes:
+        rules (List[Dict[str, Any]]): 编译后的全部规则
+    """
+
+    def __init__(self, pattern_config: List[Dict[str, Any]]) -> None:
+        """编译规则并建立路由表
+
+        Args:
+            pattern_config: patterns.json 中的规则列表
+
+        Raises:
+            ValueError: 当规则配置无效时抛出
+        """
+        self.rules: List[Dict[str, Any]] = []
+        chat_rules: Dict[int, List[Dict[str, Any]]] = {}
+
+        for item in pattern_config:
+            if not isinstance(item, dict) or 'pattern' not in item or 'bot' not in item:
+                raise ValueError("无效的模式配置格式")
+            deliver = item.get('deliver', 'forward')
+            if deliver not in DELIVER_MODES:
+                raise ValueError(f"无效的投递方式: {deliver}")
+            try:
+                rule = {
+                    "pattern": re.compile(item['pattern']),
+                    "bot": item['bot'],
+                    "deliver": deliver,
+                    "chat_ids": _to_set(item, 'chat_ids', int),
+                    "user_ids": _to_set(item, 'user_ids', int),
+                    "chat_type": _to_set(item, 'chat_type', str),
+                    "media": _to_set(item, 'media', str)
+                }
+            except (TypeError, ValueError, re.error) as e:
+                raise ValueError(f"无效的规则配置: {item}") from e
+            rule["order"] = len(self.rules)
+            self.rules.append(rule)
+            for chat_id in rule["chat_ids"] or ():
+                chat_rules.setdefault(chat_id, []).append(rule)
+
+        self._wildcard: Tuple[Dict[str, Any], ...] = tuple(
+            rule for rule in self.rules if rule["chat_ids"] is None
+        )
+        self._by_chat: Dict[int, Tuple[Dict[str, Any], ...]] = {
+            chat_id: tuple(sorted(rules + list(self._wildcard), key=lambda r: r["order"]))
+            for chat_id, rules in chat_rules.items()
+        }
+        logger.info(
+            f"路由表已编译: {len(self.rules)} 条规则，"
+            f"{len(self._by_chat)} 个聊天专属规则集，{len(self._wildcard)} 条通配规则"
+        )
+
+    def lookup(self, chat_id: Optional[int]) -> Tuple[Dict[str, Any], ...]:
+        """查找适用于指定聊天的规则
+
+        Args:
+            chat_id: 聊天ID
+
+        Returns:
+            Tuple[Dict[str, Any], ...]: 适用的规则（按配置顺序）
+        """
+        return self._by_chat.get(chat_id, self._wildcard)
+
+    def _scoped(
+        self,
+        chat_id: Optional[int],
+        user_id: Optional[int],
+        chat_type: Optional[str],
+        media: str
+    ) -> Iterator[Dict[str, Any]]:
+        """按 chat_id 取出规则集，再用发送者、聊天类型、媒体类型过滤
+
+        Args:
+            chat_id: 聊天ID
+            user_id: 发送者ID
+            chat_type: 聊天类型
+            media: 媒体类型
+
+        Yields:
+            Dict[str, Any]: 作用域内的规则（按配置顺序）
+        """
+        for rule in self.lookup(chat_id):
+            if rule["user_ids"] is not None and user_id not in rule["user_ids"]:
+                continue
+            if rule["chat_type"] is not None and chat_type not in rule["chat_type"]:
+                continue
+            if rule["media"] is not None and media not in rule["media"]:
+                continue
+            yield rule
+
+    def match(
+        self,
+        chat_id: Optional[int],
+        text: str,
+        user_id: Optional[int] = None,
+        chat_type: Optional[str] = None,
+        media: str = 'text',
+        deliver: Optional[str] = None
+    ) -> List[str]:
+        """返回消息命中的所有目标机器人
+
+        先按 chat_id 取出规则集，再用发送者、聊天类型、媒体类型过滤，最后才执行正则。
+
+        Args:
+            chat_id: 聊天ID
+            text: 消息文本
+            user_id: 发送者ID
+            chat_type: 聊天类型 ('channel'、'supergroup'、'group' 或 'private')
+            media: 媒体类型，见 media_kind
+            deliver: 只返回该投递方式的规则，为None时不限制
+
+        Returns:
+            List[str]: 命中规则对应的机器人列表（按配置顺序）
+        """
+        return [
+            rule["bot"]
+            for rule in self._scoped(chat_id, user_id, chat_type, media)
+            if (deliver is None or rule["deliver"] == deliver) and rule["pattern"].search(text)
+        ]
+
+    def extract(
+        self,
+        chat_id: Optional[int],
+        text: str,
+        user_id: Optional[int] = None,
+        chat_type: Optional[str] = None,
+        media: str = 'text'
+    ) -> Dict[str, List[str]]:
+        """提取 deliver 为 'tokens' 的规则匹配到的令牌
+
+        Args:
+            chat_id: 聊天ID
+            text: 消息文本
+            user_id: 发送者ID
+            chat_type: 聊天类型
+            media: 媒体类型
+
+        Returns:
+            Dict[str, List[str]]: 机器人到令牌列表（按出现顺序，可能重复）的映射
+        """
+        tokens: Dict[str, List[str]] = {}
+        for rule in self._scoped(chat_id, user_id, chat_type, media):
+            if rule["deliver"] != 'tokens':
+                continue
+            found = [m.group(0) for m in rule["pattern"].finditer(text)]
+            if found:
+                tokens.setdefault(rule["bot"], []).extend(found)
+        return tokens
@@ -1,17 +1,22 @@
 """字符串处理模块
 
-该模块负责处理消息文本，根据配置的模式匹配并转发消息到指定机器人
+该模块负责处理消息文本，按路由表提取匹配的令牌并发送到指定机器人
 """
 
-import re
 import logging
-from typing import Optional, List, Tuple
+from typing import Optional, List, Union
 from telethon import TelegramClient
 from core.config_manager import config_manager
+from core.outbox import OutboxRow, outbox
+from core.token_index import seen_tokens
+from handlers.routing import RoutingIndex
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# Telegram 单条文本消息的最大长度
+MAX_MESSAGE_LENGTH = 4096
+
 class TelegramSender:
     """Telegram 客户端单例类
     
@@ -40,84 +45,153 @@ class TelegramSender:
         """
         return cls._instance
 
-def load_patterns_from_config() -> List[Tuple[re.Pattern, str]]:
-    """从配置加载消息模式
+# 未指定路由表时使用的默认路由表，首次使用时按配置编译一次
+_default_routing: Optional[RoutingIndex] = None
+
+def default_routing() -> RoutingIndex:
+    """获取按 patterns.json 编译的默认路由表
     
     Returns:
-        包含模式-机器人对列表
+        RoutingIndex: 默认路由表
         
     Raises:
-        ValueError: 当配置无效时抛出
+        ValueError: 当规则配置无效时抛出
     """
-    try:
-        patterns = []
-        pattern_config = config_manager.patterns
-        if not pattern_config:
-            raise ValueError("未找到消息模式配置")
-            
-        for item in pattern_config:
-            if not isinstance(item, dict) or 'pattern' not in item or 'bot' not in item:
-                raise ValueError("无效的模式配置格式")
-                
-            pattern = re.compile(item['pattern'])
-            bot = item['bot']
-            patterns.append((pattern, bot))
-            
-        logger.info(f"成功加载 {len(patterns)} 个消息模式")
-        return patterns
-    except Exception as e:
-        logger.error(f"加载消息模式失败: {str(e)}")
-        raise ValueError("加载消息模式失败") from e
+    global _default_routing
+    if _default_routing is None:
+        _default_routing = RoutingIndex(config_manager.patterns)
+    return _default_routing
+
+def pack_tokens(tokens: List[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """将令牌按换行拼接为尽量少的消息，每条消息不超过长度上限
+    
+    Args:
+        tokens: 要发送的令牌列表
+        limit: 单条消息的最大长度
+        
+    Returns:
+        拼接后的消息列表
+    """
+    messages: List[str] = []
+    current: List[str] = []
+    length = 0
+    for token in tokens:
+        added = len(token) + (1 if current else 0)
+        if current and length + added > limit:
+            messages.append('\n'.join(current))
+            current, length = [], 0
+            added = len(token)
+        current.append(token)
+        length += added
+    if current:
+        messages.append('\n'.join(current))
+    return messages
 
-def str_handler(text: str) -> None:
-    """处理消息文本
+async def str_handler(
+    text: str,
+    source_chat_id: int = 0,
+    message_id: int = 0,
+    routing: Optional[RoutingIndex] = None,
+    user_id: Optional[int] = None,
+    chat_type: Optional[str] = None,
+    media: str = 'text'
+) -> int:
+    """提取消息文本中的令牌，将每个机器人的新令牌合并后发送
+    
+    只处理 deliver 为 'tokens' 的规则，并沿用路由表的聊天、发送者、聊天类型与媒体类型作用域。
+    已发送过的令牌会被跳过，同一机器人的所有新令牌按长度上限合并为尽量少的消息。
     
     Args:
         text: 要处理的文本内容
+        source_chat_id: 来源聊天ID，用于规则作用域与发送去重
+        message_id: 来源消息ID，用于发送去重
+        routing: 路由表，为None时使用默认路由表
+        user_id: 发送者ID
+        chat_type: 聊天类型
+        media: 媒体类型，见 media_kind
+        
+    Returns:
+        int: 写入发件箱的消息数
         
     Raises:
         RuntimeError: 当处理过程中发生错误时抛出
     """
     try:
         if not text:
-            logger.warning("收到空消息文本")
-            return
+            return 0
             
-        logger.info(f"开始处理消息: {text[:50]}...")
-        patterns = load_patterns_from_config()
+        tokens_by_bot = (routing or default_routing()).extract(
+            source_chat_id, text, user_id=user_id, chat_type=chat_type, media=media
+        )
         
-        for pattern, bot in patterns:
-            matches = pattern.findall(text)
-            if matches:
-                logger.info(f"找到 {len(matches)} 个匹配项")
-                for match in matches:
-                    send_to_someone(match, bot)
+        sent = 0
+        for bot, tokens in tokens_by_bot.items():
+            new_tokens = await seen_tokens.filter_new(bot, tokens)
+            if not new_tokens:
+                logger.info(f"{bot} 的 {len(tokens)} 个匹配项均已发送过，跳过")
+                continue
+            chunks = pack_tokens(new_tokens)
+            try:
+                await send_to_someone(chunks, bot, source_chat_id, message_id)
+            except Exception:
+                seen_tokens.forget(bot, new_tokens)
+                raise
+            sent += len(chunks)
+            try:
+                await seen_tokens.mark_seen(bot, new_tokens)
+            except Exception as e:
+                # 消息已写入发件箱，记录失败只影响重启后的去重
+                logger.warning(f"记录 {bot} 的已发送令牌失败: {str(e)}")
+        return sent
     except Exception as e:
         logger.error(f"处理消息时出错: {str(e)}")
         raise RuntimeError("消息处理失败") from e
 
-def send_to_someone(text: str, bot: str) -> None:
-    """发送消息到指定机器人
+async def release_failed_tokens(row: OutboxRow) -> None:
+    """发件箱监听器：文本记录最终发送失败时撤销其中的令牌，之后的消息可以再次发送
     
     Args:
-        text: 要发送的消息内容
+        row: 最终失败的发件箱记录
+    """
+    _, _, _, bot, kind, payload, _ = row
+    if kind != 'text' or not payload:
+        return
+    tokens = payload.split('\n')
+    await seen_tokens.unmark_seen(bot, tokens)
+    logger.warning(f"发送到 {bot} 的 {len(tokens)} 个令牌未能送达，已撤销发送记录")
+
+async def send_to_someone(
+    texts: Union[str, List[str]],
+    bot: str,
+    source_chat_id: int = 0,
+    message_id: int = 0
+) -> None:
+    """将发送到指定机器人的消息写入发件箱
+    
+    Args:
+        texts: 要发送的消息内容，多条消息按顺序写入同一批次
         bot: 目标机器人用户名
+        source_chat_id: 来源聊天ID，用于发送去重
+        message_id: 来源消息ID，用于发送去重
         
     Raises:
-        ConnectionError: 当客户端未连接时抛出
-        RuntimeError: 当发送消息失败时抛出
+        RuntimeError: 当写入发件箱失败时抛出
     """
+    if isinstance(texts, str):
+        texts = [texts]
     try:
-        client = TelegramSender.get_client()
-        if not client or not client.is_connected():
-            raise ConnectionError("Telegram客户端未初始化或未连接")
-            
-        logger.info(f"正在发送消息到 {bot}: {text[:50]}...")
-        client.loop.create_task(client.send_message(bot, text))
-        logger.info("消息发送任务已创建")
-    except ConnectionError as e:
-        logger.error(f"连接错误: {str(e)}")
-        raise
+        logger.info(f"正在发送 {len(texts)} 条消息到 {bot}: {texts[0][:50] if texts else ''}...")
+        await outbox.enqueue([
+            {
+                'source_chat_id': source_chat_id,
+                'message_id': message_id,
+                'destination': bot,
+                'kind': 'text',
+                'payload': text
+            }
+            for text in texts
+        ])
+        logger.info("消息已写入发件箱")
     except Exception as e:
         logger.error(f"发送消息失败: {str(e)}")
         raise RuntimeError("消息发送失败") from e
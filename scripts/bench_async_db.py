@@ -0,0 +1,155 @@
+"""异步数据库基准测试
+
+比较三种情况下的消息写入吞吐：
+1. 同步 DatabaseHandler 逐条提交（原有写入方式）
+2. AsyncDatabase 单独写入
+3. AsyncDatabase 写入的同时持续执行统计/搜索等只读查询
+
+用法: python -m scripts.bench_async_db [--messages N] [--producers N] [--readers N] [--read-interval S]
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import datetime
+from typing import Any, Dict, List
+from core.db_handler import DatabaseHandler
+from core.async_db import AsyncDatabase
+
+def make_message(index: int) -> Dict[str, Any]:
+    """生成测试消息
+
+    Args:
+        index: 消息序号
+
+    Returns:
+        Dict[str, Any]: 消息数据字典
+    """
+    return {
+        'username': f'user{index % 50}',
+        'first_name': '测试',
+        'user_id': 1000 + index % 50,
+        'chat_type': 'supergroup',
+        'chat_title': f'chat{index % 20}',
+        'chat_id': -1000 - index % 20,
+        'message': f'showfilesbot{index:024d} 这是一条用于基准测试的消息',
+        'date': datetime.datetime.now(datetime.timezone.utc),
+        'is_bot': False
+    }
+
+def bench_sync(db_path: str, messages: List[Dict[str, Any]]) -> float:
+    """同步逐条写入
+
+    Args:
+        db_path: 数据库文件路径
+        messages: 测试消息
+
+    Returns:
+        float: 每秒写入消息数
+    """
+    db = DatabaseHandler(db_path)
+    started = time.perf_counter()
+    for data in messages:
+        db.save_message(data)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return len(messages) / elapsed
+
+async def bench_async(
+    db_path: str,
+    messages: List[Dict[str, Any]],
+    producers: int,
+    readers: int,
+    read_interval: float = 0.0
+) -> Dict[str, float]:
+    """异步写入，可选同时执行只读查询
+
+    Args:
+        db_path: 数据库文件路径
+        messages: 测试消息
+        producers: 并发写入协程数量
+        readers: 并发查询协程数量，为0时只测写入
+        read_interval: 每个查询协程两次查询之间的间隔（秒），为0时不间断查询
+
+    Returns:
+        Dict[str, float]: 写入吞吐、查询吞吐与最大事件循环延迟
+    """
+    DatabaseHandler(db_path).close()
+    adb = AsyncDatabase(db_path, readers=max(1, readers))
+    adb.start()
+    done = asyncio.Event()
+    queries = 0
+    max_lag = 0.0
+
+    async def produce(offset: int) -> None:
+        for data in messages[offset::producers]:
+            await adb.save_message(data)
+
+    async def read(index: int) -> None:
+        nonlocal queries
+        while not done.is_set():
+            if index % 3 == 0:
+                await adb.count_messages()
+            elif index % 3 == 1:
+                await adb.search_messages('0000123', limit=10)
+            else:
+                await adb.recent_messages(-1000 - index % 20, limit=20)
+            queries += 1
+            if read_interval:
+                await asyncio.sleep(read_interval)
+
+    async def probe() -> None:
+        nonlocal max_lag
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            started = loop.time()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, loop.time() - started - 0.01)
+
+    reader_tasks = [asyncio.create_task(read(i)) for i in range(readers)]
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(produce(i) for i in range(producers)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*reader_tasks, probe_task)
+    adb.close()
+    return {
+        'writes_per_second': len(messages) / elapsed,
+        'queries_per_second': queries / elapsed,
+        'max_loop_lag_ms': max_lag * 1000
+    }
+
+def main() -> None:
+    """运行基准测试并输出结果"""
+    parser = argparse.ArgumentParser(description='异步数据库基准测试')
+    parser.add_argument('--messages', type=int, default=20000, help='写入消息数')
+    parser.add_argument('--producers', type=int, default=50, help='并发写入协程数')
+    parser.add_argument('--readers', type=int, default=4, help='并发查询协程数')
+    parser.add_argument('--read-interval', type=float, default=0.01, help='每个查询协程的查询间隔（秒），0表示不间断')
+    parser.add_argument('--sync-messages', type=int, default=2000, help='同步基线写入消息数')
+    args = parser.parse_args()
+
+    messages = [make_message(i) for i in range(args.messages)]
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_rate = bench_sync(os.path.join(tmp, 'sync', 'messages.db'), messages[:args.sync_messages])
+        alone = asyncio.run(bench_async(
+            os.path.join(tmp, 'alone', 'messages.db'), messages, args.producers, 0
+        ))
+        mixed = asyncio.run(bench_async(
+            os.path.join(tmp, 'mixed', 'messages.db'), messages, args.producers,
+            args.readers, args.read_interval
+        ))
+
+    print(f"同步逐条写入:          {sync_rate:10.0f} 条/秒")
+    print(f"异步写入:              {alone['writes_per_second']:10.0f} 条/秒，"
+          f"最大事件循环延迟 {alone['max_loop_lag_ms']:.1f}ms")
+    print(f"异步写入 + {args.readers} 个查询:   {mixed['writes_per_second']:10.0f} 条/秒，"
+          f"查询 {mixed['queries_per_second']:.0f} 次/秒，"
+          f"最大事件循环延迟 {mixed['max_loop_lag_ms']:.1f}ms")
+    print(f"有查询时的写入吞吐占比: {mixed['writes_per_second'] / alone['writes_per_second']:10.2%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""消息文本压缩基准测试
+
+以已有数据库中的消息为样本（循环重复到指定条数），分别写入明文与压缩两个临时数据库，比较：
+1. message 列与数据库文件的大小
+2. 批量写入吞吐
+3. 全表解压读取与按聊天查询最近消息的耗时
+
+用法: python -m scripts.bench_compression [--source PATH] [--messages N] [--level N]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import datetime
+from typing import Any, Dict, List
+from core.config_manager import config_manager
+from core.compression import MessageCodec
+from core.db_handler import DatabaseHandler
+
+# 与消息处理链路中的批量写入大小一致
+BATCH_SIZE = 256
+
+def load_messages(source: str, count: int) -> List[Dict[str, Any]]:
+    """从已有数据库读取消息文本并循环扩充为测试消息
+
+    Args:
+        source: 样本数据库路径
+        count: 测试消息数量
+
+    Returns:
+        List[Dict[str, Any]]: 消息数据字典列表
+
+    Raises:
+        RuntimeError: 当样本数据库中没有消息时抛出
+    """
+    # 只读打开，不为样本库补充列或写入任何数据
+    conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+        if 'dict_version' in columns:
+            MessageCodec(source).install(conn)
+            sql = 'SELECT message_text(message, dict_version) FROM messages WHERE message IS NOT NULL'
+        else:
+            sql = 'SELECT message FROM messages WHERE message IS NOT NULL'
+        texts = [row[0] for row in conn.execute(sql)]
+    finally:
+        conn.close()
+    if not texts:
+        raise RuntimeError(f"样本数据库中没有消息: {source}")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            'username': f'user{index % 50}',
+            'user_id': 1000 + index % 50,
+            'chat_type': 'supergroup',
+            'chat_title': f'chat{index % 20}',
+            'chat_id': -1000 - index % 20,
+            'message': texts[index % len(texts)],
+            'date': now
+        }
+        for index in range(count)
+    ]
+
+def bench_insert(handler: DatabaseHandler, messages: List[Dict[str, Any]]) -> float:
+    """分批写入消息
+
+    Args:
+        handler: 数据库处理器
+        messages: 测试消息
+
+    Returns:
+        float: 每秒写入消息数
+    """
+    started = time.perf_counter()
+    for start in range(0, len(messages), BATCH_SIZE):
+        handler.save_messages(messages[start:start + BATCH_SIZE])
+    return len(messages) / (time.perf_counter() - started)
+
+def bench_read(handler: DatabaseHandler) -> Dict[str, float]:
+    """测量全表解压读取与按聊天查询的耗时
+
+    Args:
+        handler: 数据库处理器
+
+    Returns:
+        Dict[str, float]: 全表读取吞吐（行/秒）与单次最近消息查询耗时（毫秒）
+    """
+    started = time.perf_counter()
+    rows = handler.conn.execute('SELECT message_text(message, dict_version) FROM messages').fetchall()
+    scan = len(rows) / (time.perf_counter() - started)
+
+    queries = 200
+    started = time.perf_counter()
+    for index in range(queries):
+        handler.recent_messages(-1000 - index % 20, limit=50)
+    recent = (time.perf_counter() - started) / queries * 1000
+    return {'rows_per_second': scan, 'recent_ms': recent}
+
+def column_size(handler: DatabaseHandler) -> int:
+    """统计 message 列占用的字节数
+
+    Args:
+        handler: 数据库处理器
+
+    Returns:
+        int: 字节数
+    """
+    return handler.conn.execute('SELECT SUM(LENGTH(CAST(message AS BLOB))) FROM messages').fetchone()[0]
+
+def main() -> None:
+    """运行基准测试并输出结果"""
+    settings = config_manager.compression_settings
+    parser = argparse.ArgumentParser(description='消息文本压缩基准测试')
+    parser.add_argument('--source', default='data/messages.db', help='样本数据库路径')
+    parser.add_argument('--messages', type=int, default=20000, help='测试消息数')
+    parser.add_argument('--level', type=int, default=settings['level'], help='zstd 压缩级别')
+    parser.add_argument('--sample-size', type=int, default=settings['sample_size'], help='训练抽样行数')
+    parser.add_argument('--dict-size', type=int, default=settings['dict_size'], help='字典大小（字节）')
+    args = parser.parse_args()
+
+    messages = load_messages(args.source, args.messages)
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, 'plain', 'messages.db')
+        packed_path = os.path.join(tmp, 'packed', 'messages.db')
+        plain = DatabaseHandler(plain_path)
+        packed = DatabaseHandler(packed_path, compress=True, compression_level=args.level)
+        try:
+            plain_insert = bench_insert(plain, messages)
+
+            # 在明文库上训练字典，再复制到压缩库，模拟迁移后的部署
+            started = time.perf_counter()
+            version = plain.codec.train(plain.conn, args.sample_size, args.dict_size)
+            train_ms = (time.perf_counter() - started) * 1000
+            dictionary = plain.conn.execute(
+                'SELECT dictionary, sample_rows FROM compression_dicts WHERE version = ?', (version,)
+            ).fetchone()
+            packed.conn.execute(
+                'INSERT INTO compression_dicts (version, dictionary, sample_rows) VALUES (?, ?, ?)',
+                (version, *dictionary)
+            )
+            packed.conn.commit()
+            packed.codec.refresh()
+
+            packed_insert = bench_insert(packed, messages)
+            plain_read = bench_read(plain)
+            packed_read = bench_read(packed)
+            plain_column, packed_column = column_size(plain), column_size(packed)
+            compressed_rows = packed.conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE dict_version IS NOT NULL'
+            ).fetchone()[0]
+            dict_bytes = len(dictionary[0])
+        finally:
+            plain.close()
+            packed.close()
+        plain_file, packed_file = os.path.getsize(plain_path), os.path.getsize(packed_path)
+
+    print(f"字典: {dict_bytes} 字节，训练耗时 {train_ms:.0f}ms；{compressed_rows}/{len(messages)} 行被压缩")
+    print(f"message 列:   明文 {plain_column / 1024:10.1f}KB  压缩 {packed_column / 1024:10.1f}KB  "
+          f"({packed_column / plain_column:.1%})")
+    print(f"数据库文件:   明文 {plain_file / 1024:10.1f}KB  压缩 {packed_file / 1024:10.1f}KB  "
+          f"({packed_file / plain_file:.1%})")
+    print(f"批量写入:     明文 {plain_insert:10.0f}条/秒 压缩 {packed_insert:10.0f}条/秒")
+    print(f"全表读取:     明文 {plain_read['rows_per_second']:10.0f}行/秒 压缩 {packed_read['rows_per_second']:10.0f}行/秒")
+    print(f"最近50条查询: 明文 {plain_read['recent_ms']:10.2f}ms   压缩 {packed_read['recent_ms']:10.2f}ms")
+
+if __name__ == '__main__':
+    main()
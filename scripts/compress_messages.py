@@ -0,0 +1,128 @@
+"""消息文本压缩迁移工具
+
+按块压缩已有数据库中的明文消息（每块一个事务，可在机器人运行时执行，中断后重新运行会从未完成的行继续）：
+1. 没有压缩字典或指定 --train 时，先从明文消息中抽样训练新版本字典
+2. 将 dict_version 为NULL的行用最新字典压缩；指定 --recompress 时同时用最新字典重新压缩旧版本的行
+3. 指定 --decompress 时将所有压缩行还原为明文（回滚用）
+SQLite 不会自动缩小数据库文件，指定 --vacuum 可在迁移后回收空间
+
+用法: python -m scripts.compress_messages [--db PATH] [--train] [--recompress] [--decompress] [--vacuum]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Any, List, Tuple
+from core.config_manager import config_manager
+from core.db_handler import DatabaseHandler
+
+logger = logging.getLogger('compress_messages')
+
+def stored_size(value: Any) -> int:
+    """计算存储值占用的字节数
+
+    Args:
+        value: message 列的值（明文或压缩后的字节串）
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return 0
+
+def migrate(handler: DatabaseHandler, decompress: bool, recompress: bool, chunk_size: int) -> Tuple[int, int, int]:
+    """按块转换消息行
+
+    Args:
+        handler: 数据库处理器
+        decompress: 是否还原为明文
+        recompress: 是否用最新字典重新压缩旧版本的行
+        chunk_size: 每个事务处理的行数
+
+    Returns:
+        Tuple[int, int, int]: (更新的行数, 转换前字节数, 转换后字节数)
+    """
+    codec = handler.codec
+    if decompress:
+        condition = 'dict_version IS NOT NULL'
+        params: Tuple[Any, ...] = ()
+    elif recompress:
+        condition = '(dict_version IS NULL OR dict_version != ?)'
+        params = (codec.version,)
+    else:
+        condition = 'dict_version IS NULL'
+        params = ()
+
+    conn = handler.conn
+    last_id = 0
+    updated = before = after = 0
+    started = time.perf_counter()
+    while True:
+        rows = conn.execute(
+            f'SELECT id, message, dict_version FROM messages WHERE id > ? AND {condition} ORDER BY id LIMIT ?',
+            (last_id, *params, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+        changes: List[Tuple[Any, Any, int]] = []
+        for row_id, value, version in rows:
+            text = codec.decode(value, version)
+            new_value, new_version = (text, None) if decompress else codec.encode(text)
+            before += stored_size(value)
+            after += stored_size(new_value)
+            if new_version != version or new_value != value:
+                changes.append((new_value, new_version, row_id))
+        conn.executemany('UPDATE messages SET message = ?, dict_version = ? WHERE id = ?', changes)
+        conn.commit()
+        updated += len(changes)
+        last_id = rows[-1][0]
+        logger.info(
+            f"已处理到 id={last_id}，更新 {updated} 行，"
+            f"{updated / (time.perf_counter() - started):.0f} 行/秒"
+        )
+    return updated, before, after
+
+def main() -> None:
+    """解析参数并执行迁移"""
+    settings = config_manager.compression_settings
+    parser = argparse.ArgumentParser(description='消息文本压缩迁移工具')
+    parser.add_argument('--db', default='data/messages.db', help='数据库文件路径')
+    parser.add_argument('--train', action='store_true', help='训练新版本字典（没有字典时总会训练）')
+    parser.add_argument('--recompress', action='store_true', help='用最新字典重新压缩旧版本的行')
+    parser.add_argument('--decompress', action='store_true', help='将所有压缩行还原为明文')
+    parser.add_argument('--vacuum', action='store_true', help='迁移后执行VACUUM回收空间')
+    parser.add_argument('--level', type=int, default=settings['level'], help='zstd 压缩级别')
+    parser.add_argument('--sample-size', type=int, default=settings['sample_size'], help='训练抽样行数')
+    parser.add_argument('--dict-size', type=int, default=settings['dict_size'], help='字典大小（字节）')
+    parser.add_argument('--chunk-size', type=int, default=settings['chunk_size'], help='每个事务处理的行数')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler = DatabaseHandler(args.db, compress=not args.decompress, compression_level=args.level)
+    try:
+        if not args.decompress and (args.train or handler.codec.version is None):
+            handler.codec.train(handler.conn, args.sample_size, args.dict_size)
+        file_before = os.path.getsize(args.db)
+        updated, before, after = migrate(handler, args.decompress, args.recompress, args.chunk_size)
+        if args.vacuum:
+            logger.info("正在执行VACUUM...")
+            handler.conn.execute('VACUUM')
+        file_after = os.path.getsize(args.db)
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    finally:
+        handler.close()
+
+    ratio = after / before if before else 1.0
+    print(f"更新行数:     {updated}")
+    print(f"消息列大小:   {before / 1024:.1f}KB -> {after / 1024:.1f}KB ({ratio:.1%})")
+    print(f"数据库文件:   {file_before / 1024:.1f}KB -> {file_after / 1024:.1f}KB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""内存浸泡测试
+
+在临时目录中以假客户端长时间重放消息，经过准入控制、聊天执行器、消息处理器与发件箱的完整链路，
+预热结束后周期性采样常驻内存，增长超过阈值时以退出码1结束。
+同时启用 MemoryMonitor，定期输出 tracemalloc 增长位置与未完成任务统计。
+
+用法: python -m scripts.soak_test [--duration S] [--rate N] [--chats N] [--max-growth-mb MB]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+import tempfile
+import contextlib
+from types import SimpleNamespace
+from typing import Any, List
+
+# 数据库等全局实例在导入时按相对路径创建，必须先切换到临时目录再导入项目模块
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix='soak-')
+os.chdir(WORKDIR)
+
+from core.config_manager import config_manager
+from core.outbox import outbox
+from core.async_db import adb
+from core.spool import spool
+from core.token_index import seen_tokens
+from core.admission import admission
+from core.chat_executor import ChatExecutor
+from core.memory_monitor import MemoryMonitor, current_rss_mb
+from handlers.message_handler import MessageHandler
+
+logger = logging.getLogger('soak_test')
+
+class FakeClient:
+    """只记录调用次数的假Telegram客户端"""
+
+    def __init__(self) -> None:
+        self.forwarded = 0
+        self.sent = 0
+
+    async def forward_messages(self, entity: Any, messages: Any, from_peer: Any = None) -> None:
+        self.forwarded += 1
+
+    async def send_message(self, entity: Any, message: Any = '', **kwargs: Any) -> None:
+        self.sent += 1
+
+    async def get_messages(self, entity: Any, ids: Any = None) -> None:
+        return None
+
+def make_event(index: int, chats: int) -> SimpleNamespace:
+    """生成一条模拟的新消息事件
+
+    Args:
+        index: 消息序号，同时作为消息ID
+        chats: 模拟的聊天数量
+
+    Returns:
+        SimpleNamespace: 具有 NewMessage.Event 所需属性的事件对象
+    """
+    chat_id = -1000 - index % chats
+    text = f'showfilesbot_{index:020d} 浸泡测试消息 {index}'
+    message = SimpleNamespace(
+        out=False,
+        id=index,
+        chat_id=chat_id,
+        media=None,
+        message=text,
+        text=text,
+        raw_text=text,
+        date=datetime.datetime.now(datetime.timezone.utc)
+    )
+    sender = SimpleNamespace(
+        username=f'user{index % 100}',
+        first_name='测试',
+        last_name=None,
+        id=10000 + index % 100,
+        bot=False
+    )
+    return SimpleNamespace(chat_id=chat_id, message=message, sender=sender, chat=None)
+
+async def soak(args: argparse.Namespace) -> int:
+    """重放消息并采样内存
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        int: 进程退出码，内存增长超过阈值时为1
+    """
+    client = FakeClient()
+    handler = MessageHandler(client)
+    executor = ChatExecutor(handler.handle_message, **config_manager.executor_settings)
+    monitor = MemoryMonitor(interval=args.report_interval, rss_budget_mb=args.rss_budget_mb)
+
+    monitor.start()
+    adb.start()
+    await spool.start()
+    await outbox.start(client)
+    await seen_tokens.start()
+    await executor.start()
+    await admission.start(lambda: executor.pending)
+
+    started = time.monotonic()
+    baseline = None
+    samples: List[float] = []
+    next_sample = started + args.warmup
+    index = 0
+    tick = 0.1
+    per_tick = max(1, int(args.rate * tick))
+    try:
+        while time.monotonic() - started < args.duration:
+            for _ in range(per_tick):
+                index += 1
+                event = make_event(index, args.chats)
+                if admission.admit(event.chat_id):
+                    await executor.submit(event)
+            await asyncio.sleep(tick)
+
+            now = time.monotonic()
+            if now >= next_sample:
+                rss = current_rss_mb()
+                if baseline is None:
+                    baseline = rss
+                    logger.warning(f"预热结束，基线常驻内存 {baseline:.1f}MB")
+                samples.append(rss)
+                logger.warning(
+                    f"{now - started:7.0f}s 已重放 {index} 条，常驻内存 {rss:.1f}MB，"
+                    f"执行器待处理 {executor.pending}，发件箱排队 {outbox.pending}，"
+                    f"缓冲区积压 {spool.backlog()[0]}"
+                )
+                next_sample = now + args.sample_interval
+    finally:
+        await executor.stop()
+        await admission.stop()
+        await outbox.stop()
+        await spool.stop()
+        adb.close()
+        await monitor.stop()
+
+    if baseline is None or not samples:
+        logger.error("运行时间短于预热时间，没有可用的内存采样")
+        return 1
+    growth = samples[-1] - baseline
+    logger.warning(
+        f"共重放 {index} 条，转发 {client.forwarded} 次，发送 {client.sent} 次；"
+        f"常驻内存 {baseline:.1f}MB -> {samples[-1]:.1f}MB（峰值 {max(samples):.1f}MB），"
+        f"增长 {growth:.1f}MB，阈值 {args.max_growth_mb:.1f}MB"
+    )
+    return 1 if growth > args.max_growth_mb else 0
+
+def main() -> None:
+    """解析参数并运行浸泡测试"""
+    parser = argparse.ArgumentParser(description='内存浸泡测试')
+    parser.add_argument('--duration', type=float, default=3600, help='运行时长（秒）')
+    parser.add_argument('--rate', type=float, default=200, help='每秒重放的消息数')
+    parser.add_argument('--chats', type=int, default=50, help='模拟的聊天数量')
+    parser.add_argument('--warmup', type=float, default=60, help='预热时长（秒），之后的首次采样作为基线')
+    parser.add_argument('--sample-interval', type=float, default=30, help='内存采样间隔（秒）')
+    parser.add_argument('--report-interval', type=float, default=300, help='tracemalloc 报告间隔（秒）')
+    parser.add_argument('--rss-budget-mb', type=float, default=0, help='常驻内存预算（MB），0 表示不检查')
+    parser.add_argument('--max-growth-mb', type=float, default=20, help='允许的常驻内存增长（MB）')
+    args = parser.parse_args()
+
+    # 消息详情打印与逐条日志会淹没采样结果，只保留警告以上的日志
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger('core.memory_monitor').setLevel(logging.INFO)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        code = asyncio.run(soak(args))
+    print(f"工作目录: {WORKDIR}")
+    sys.exit(code)
+
+if __name__ == '__main__':
+    main()
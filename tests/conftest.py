@@ -0,0 +1,37 @@
+"""测试公共夹具
+
+项目模块在导入时按相对路径创建全局实例（如 data/messages.db），
+必须先切换到临时目录再导入项目模块，避免改动仓库中的数据库
+"""
+
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix='tgbot-tests-'))
+
+from core.async_db import AsyncDatabase
+from core.db_handler import DatabaseHandler
+
+# 使用全局 adb 的模块，测试中替换为指向临时数据库的实例
+ADB_MODULES = ('core.outbox', 'core.token_index', 'core.spool', 'core.admission')
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """指向临时数据库的异步数据库门面
+
+    Yields:
+        AsyncDatabase: 已启动的异步数据库
+    """
+    path = str(tmp_path / 'messages.db')
+    # 由同步处理器创建 messages 表
+    DatabaseHandler(path).close()
+    adb = AsyncDatabase(path, readers=2)
+    for module in ADB_MODULES:
+        monkeypatch.setattr(f'{module}.adb', adb)
+    adb.start()
+    yield adb
+    adb.close()
@@ -0,0 +1,150 @@
+"""准入控制测试：负载等级升降、降级决策、延后持久化与消息缓冲区"""
+
+import asyncio
+import sqlite3
+import datetime
+import logging
+from core.admission import (
+    AdmissionController, LEVEL_NORMAL, LEVEL_QUIET, LEVEL_DEFER_MEDIA, LEVEL_DEFER_MIRROR, LEVEL_SHED
+)
+from core.outbox import CREATE_OUTBOX_SQL
+from core.spool import Spool
+
+def media_message(index, chat_id=-100):
+    return {
+        'user_id': 1,
+        'chat_id': chat_id,
+        'message': f'[图片消息] {index}',
+        'date': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    }
+
+def count_messages(database):
+    conn = sqlite3.connect(database.db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_media_goes_to_spool_instead_of_memory_when_spool_is_available(database, tmp_path, monkeypatch):
+    spool = Spool(directory=str(tmp_path / 'spool'), segment_size=64 * 1024)
+    monkeypatch.setattr('core.admission.spool', spool)
+    controller = AdmissionController()
+    controller.level = LEVEL_DEFER_MEDIA
+
+    async def scenario():
+        await spool.start()
+        for index in range(5):
+            await controller.persist(media_message(index), media_only=True)
+        assert controller._deferred_messages == []
+        assert controller.counters['media_deferred'] == 0
+        assert spool.backlog()[0] + spool.applied == 5
+        await spool.stop()
+
+    asyncio.run(scenario())
+    assert count_messages(database) == 5
+
+def test_failed_flush_requeues_deferred_messages(database, monkeypatch):
+    controller = AdmissionController(max_deferred=100)
+    controller.level = LEVEL_DEFER_MEDIA
+    real_save_messages = database.save_messages
+    failures = []
+
+    async def locked_once(batch):
+        if not failures:
+            failures.append(len(batch))
+            raise RuntimeError('数据库写入失败: database is locked')
+        await real_save_messages(batch)
+
+    monkeypatch.setattr(database, 'save_messages', locked_once)
+
+    async def scenario():
+        for index in range(3):
+            await controller.persist(media_message(index), media_only=True)
+        assert len(controller._deferred_messages) == 3
+        await controller._flush_deferred_messages()
+        assert failures == [3]
+        assert len(controller._deferred_messages) == 3
+        await controller._flush_deferred_messages()
+        assert controller._deferred_messages == []
+
+    asyncio.run(scenario())
+    assert count_messages(database) == 3
+
+def test_level_escalates_at_once_and_steps_down_one_level_per_cycle(database):
+    depth = [2000]
+    controller = AdmissionController(
+        interval=0.01,
+        depth_thresholds=(200, 500, 1000, 2000),
+        lag_thresholds=(100, 200, 300, 400)
+    )
+    levels = []
+    set_level = controller._set_level
+
+    def record(level):
+        levels.append(level)
+        set_level(level)
+
+    controller._set_level = record
+    root_level = logging.getLogger().level
+
+    async def wait_for_level(level):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+        while controller.level != level and loop.time() < deadline:
+            await asyncio.sleep(0.005)
+        assert controller.level == level
+
+    async def scenario():
+        # 回落到延后镜像以下时会释放发件箱中延后的记录
+        await database.execute(CREATE_OUTBOX_SQL)
+        await controller.start(lambda: depth[0])
+        await wait_for_level(LEVEL_SHED)
+        assert logging.getLogger().level == logging.WARNING
+        depth[0] = 0
+        await wait_for_level(LEVEL_NORMAL)
+        await controller.stop()
+
+    asyncio.run(scenario())
+    # stop 时再次切换到正常等级不产生变化
+    assert levels[:-1] == [LEVEL_SHED, LEVEL_DEFER_MIRROR, LEVEL_DEFER_MEDIA, LEVEL_QUIET, LEVEL_NORMAL]
+    assert logging.getLogger().level == root_level
+
+def test_level_for_thresholds():
+    thresholds = [200, 500, 1000, 2000]
+    assert [
+        AdmissionController._level_for(value, thresholds) for value in (0, 199, 200, 999, 1000, 5000)
+    ] == [LEVEL_NORMAL, LEVEL_NORMAL, LEVEL_QUIET, LEVEL_DEFER_MEDIA, LEVEL_DEFER_MIRROR, LEVEL_SHED]
+
+def test_decisions_follow_level_and_chat_priority():
+    controller = AdmissionController(low_priority_chats=[-1], high_priority_chats=[-9])
+    assert controller.verbose and controller.admit(-1) and not controller.defer_mirror(-2)
+
+    controller.level = LEVEL_QUIET
+    assert not controller.verbose
+
+    controller.level = LEVEL_DEFER_MIRROR
+    assert controller.defer_mirror(-2)
+    assert not controller.defer_mirror(-9)
+    assert controller.admit(-1)
+
+    controller.level = LEVEL_SHED
+    assert not controller.admit(-1)
+    assert controller.admit(-2) and controller.admit(-9)
+    assert controller.counters == {
+        'verbose_suppressed': 1, 'media_deferred': 0, 'mirror_deferred': 1, 'shed': 1
+    }
+
+def test_media_deferral_skips_text_and_high_priority_chats(database):
+    controller = AdmissionController(high_priority_chats=[-9])
+    controller.level = LEVEL_DEFER_MEDIA
+
+    async def scenario():
+        await controller.persist(media_message(0), media_only=True)
+        await controller.persist(media_message(1), media_only=False)
+        await controller.persist(media_message(2, chat_id=-9), media_only=True)
+        assert [data['message'] for data in controller._deferred_messages] == ['[图片消息] 0']
+        await controller.stop()
+        assert controller._deferred_messages == []
+
+    asyncio.run(scenario())
+    assert count_messages(database) == 3
@@ -0,0 +1,66 @@
+"""异步数据库测试：有界写队列的背压与顺序、单个写请求失败时的回滚"""
+
+import asyncio
+import sqlite3
+import threading
+import pytest
+from core.async_db import AsyncDatabase
+
+def test_full_write_queue_waits_without_blocking_loop_and_keeps_order(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    adb = AsyncDatabase(path, readers=1, batch_size=1, max_pending_writes=2)
+    release = threading.Event()
+
+    async def scenario():
+        adb.start()
+        await adb.execute('CREATE TABLE t (n INTEGER)')
+        # 写线程被占用期间后续写请求只能排队
+        blocker = asyncio.ensure_future(adb.call(lambda conn: release.wait(5)))
+        await asyncio.sleep(0.05)
+        writes = [asyncio.ensure_future(adb.execute('INSERT INTO t VALUES (?)', (n,))) for n in range(6)]
+        ticks = 0
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert ticks == 10
+        assert adb._writes.qsize() == 2
+        release.set()
+        await asyncio.gather(blocker, *writes)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        adb.close()
+
+    assert adb.write_waits == 4
+    conn = sqlite3.connect(path)
+    try:
+        assert [row[0] for row in conn.execute('SELECT n FROM t ORDER BY rowid')] == list(range(6))
+    finally:
+        conn.close()
+
+def test_failed_executemany_rolls_back_only_its_own_rows(tmp_path):
+    path = str(tmp_path / 'partial.db')
+    adb = AsyncDatabase(path, readers=1)
+
+    async def scenario():
+        adb.start()
+        await adb.execute('CREATE TABLE t (n INTEGER PRIMARY KEY)')
+        # 两个请求落在同一批次：第二个执行到一半时违反主键约束
+        ok = asyncio.ensure_future(adb.execute('INSERT INTO t VALUES (?)', (100,)))
+        partial = asyncio.ensure_future(adb.executemany('INSERT INTO t VALUES (?)', [(1,), (2,), (1,), (3,)]))
+        await ok
+        with pytest.raises(RuntimeError):
+            await partial
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        adb.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert [row[0] for row in conn.execute('SELECT n FROM t ORDER BY n')] == [100]
+    finally:
+        conn.close()
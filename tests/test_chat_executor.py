@@ -0,0 +1,128 @@
+"""聊天执行器测试：聊天内有序、跨聊天并行、溢出策略与停止时排空"""
+
+import asyncio
+import random
+from types import SimpleNamespace
+from core.chat_executor import ChatExecutor
+
+def event(chat_id, seq):
+    return SimpleNamespace(chat_id=chat_id, seq=seq)
+
+def test_each_chat_is_processed_in_order_and_chats_run_in_parallel():
+    processed = {}
+    active = set()
+    overlap = {'chats': 0}
+
+    async def handler(ev):
+        assert ev.chat_id not in active, "同一聊天被两个工作者同时处理"
+        active.add(ev.chat_id)
+        overlap['chats'] = max(overlap['chats'], len(active))
+        await asyncio.sleep(random.random() / 500)
+        active.discard(ev.chat_id)
+        processed.setdefault(ev.chat_id, []).append(ev.seq)
+
+    async def scenario():
+        executor = ChatExecutor(handler, max_workers=4, lag_report_interval=0)
+        await executor.start()
+        for seq in range(50):
+            for chat_id in range(6):
+                await executor.submit(event(chat_id, seq))
+        await executor.stop()
+        return executor
+
+    executor = asyncio.run(scenario())
+    assert executor.dropped == 0
+    assert processed == {chat_id: list(range(50)) for chat_id in range(6)}
+    assert overlap['chats'] > 1
+
+def run_overflow(policy, **kwargs):
+    processed = []
+    release = asyncio.Event()
+
+    async def handler(ev):
+        await release.wait()
+        processed.append(ev.seq)
+
+    async def scenario():
+        executor = ChatExecutor(
+            handler, max_workers=1, queue_size=2, overflow_policy=policy, lag_report_interval=0, **kwargs
+        )
+        await executor.start()
+        # 提交过程中不让出事件循环，工作者尚未取走任何事件
+        for seq in range(5):
+            await executor.submit(event(1, seq))
+        release.set()
+        await executor.stop()
+        return executor
+
+    return asyncio.run(scenario()), processed
+
+def test_drop_oldest_keeps_the_newest_events():
+    executor, processed = run_overflow('drop_oldest')
+    assert processed == [3, 4]
+    assert executor.dropped == 3
+
+def test_drop_newest_keeps_the_oldest_events():
+    executor, processed = run_overflow('drop_newest')
+    assert processed == [0, 1]
+    assert executor.dropped == 3
+
+def test_max_pending_caps_all_chats_together():
+    processed = []
+
+    async def handler(ev):
+        processed.append((ev.chat_id, ev.seq))
+
+    async def scenario():
+        executor = ChatExecutor(
+            handler, max_workers=2, queue_size=10, max_pending=3,
+            overflow_policy='drop_newest', lag_report_interval=0
+        )
+        await executor.start()
+        for chat_id in range(5):
+            await executor.submit(event(chat_id, 0))
+        assert executor.pending == 3
+        await executor.stop()
+        return executor
+
+    executor = asyncio.run(scenario())
+    assert sorted(processed) == [(0, 0), (1, 0), (2, 0)]
+    assert executor.dropped == 2
+
+def test_stop_drains_queued_events():
+    processed = []
+
+    async def handler(ev):
+        await asyncio.sleep(0.001)
+        processed.append(ev.seq)
+
+    async def scenario():
+        executor = ChatExecutor(handler, max_workers=2, lag_report_interval=0)
+        await executor.start()
+        for seq in range(40):
+            await executor.submit(event(seq % 2, seq))
+        await executor.stop()
+        # 停止后提交的事件被丢弃
+        await executor.submit(event(0, 99))
+        return executor
+
+    executor = asyncio.run(scenario())
+    assert sorted(processed) == list(range(40))
+    assert executor.pending == 0
+    assert executor.dropped == 1
+
+def test_stop_gives_up_after_drain_timeout():
+    async def handler(ev):
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        executor = ChatExecutor(handler, max_workers=1, drain_timeout=0.1, lag_report_interval=0)
+        await executor.start()
+        for seq in range(4):
+            await executor.submit(event(1, seq))
+        await executor.stop()
+        return executor
+
+    executor = asyncio.run(scenario())
+    assert executor.pending == 0
+    assert executor.dropped == 3
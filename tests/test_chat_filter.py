@@ -0,0 +1,69 @@
+"""聊天预过滤测试：黑白名单、配置热重载与分发前过滤"""
+
+import os
+import json
+import shutil
+from types import SimpleNamespace
+import pytest
+from core.config_manager import config_manager
+from core.chat_filter import ChatFilter, FilteredNewMessage
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """指向临时配置文件的 config_manager，测试结束后恢复原配置"""
+    path = tmp_path / 'config.json'
+    shutil.copy(config_manager.config_path, path)
+    monkeypatch.setattr(config_manager, 'config_path', path)
+    config_manager.reload()
+    yield path
+    monkeypatch.undo()
+    config_manager.reload()
+
+def write_config(path, **changes):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    config.update(changes)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    # 保证修改时间一定变化
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+def test_blacklist_drops_only_blocked_chats():
+    chat_filter = ChatFilter(mode='blacklist', blocked_chat_ids=[-1, -2])
+    assert [chat_filter.accepts(chat_id) for chat_id in (-1, -2, -3, None)] == [False, False, True, True]
+    assert chat_filter.stats() == {'mode': 'blacklist', 'chats': 2, 'accepted': 2, 'discarded': 2}
+
+def test_whitelist_keeps_only_allowed_chats():
+    chat_filter = ChatFilter(mode='whitelist', blocked_chat_ids=[-1], allowed_chat_ids=[-1, -5])
+    assert [chat_filter.accepts(chat_id) for chat_id in (-1, -5, -2, None)] == [True, True, False, False]
+
+def test_invalid_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ChatFilter(mode='graylist')
+
+def test_reload_if_changed_rebuilds_on_mtime_change(config_file):
+    write_config(config_file, blocked_chat_ids=[-10], chat_filter={'mode': 'blacklist'})
+    config_manager.reload()
+    chat_filter = ChatFilter(**config_manager.chat_filter_settings)
+    assert not chat_filter.accepts(-10)
+    assert chat_filter.reload_if_changed() is False
+
+    write_config(config_file, chat_filter={'mode': 'whitelist', 'allowed_chat_ids': [-20]})
+    assert chat_filter.reload_if_changed() is True
+    assert chat_filter.mode == 'whitelist'
+    assert chat_filter.accepts(-20) and not chat_filter.accepts(-10)
+
+    # 无效配置不会替换当前规则
+    write_config(config_file, chat_filter={'mode': 'graylist'})
+    assert chat_filter.reload_if_changed() is False
+    assert chat_filter.mode == 'whitelist'
+
+def test_filtered_new_message_drops_blocked_chats_before_dispatch():
+    chat_filter = ChatFilter(mode='blacklist', blocked_chat_ids=[-1])
+    builder = FilteredNewMessage(chat_filter)
+    blocked = SimpleNamespace(chat_id=-1, message=SimpleNamespace(out=False))
+    allowed = SimpleNamespace(chat_id=-2, message=SimpleNamespace(out=False))
+    assert builder.filter(blocked) is None
+    assert builder.filter(allowed) is allowed
+    assert (chat_filter.accepted, chat_filter.discarded) == (1, 1)
@@ -0,0 +1,93 @@
+"""消息压缩测试：编解码往返、message_text 透明解压与已有数据库的迁移"""
+
+import asyncio
+import datetime
+import pytest
+from core.async_db import AsyncDatabase
+from core.compression import MessageCodec
+from core.db_handler import DatabaseHandler
+from scripts.compress_messages import migrate
+
+pytest.importorskip('zstandard')
+
+CHAT_ID = -100
+
+def sample_text(index):
+    return f'showfilesbot_{index:020d} 频道更新：第 {index} 集已上传，点击机器人获取文件 #资源 #更新'
+
+def plain_database(path, count=200):
+    """创建只含明文消息的数据库"""
+    handler = DatabaseHandler(path)
+    handler.save_messages([
+        {
+            'user_id': 1,
+            'chat_id': CHAT_ID,
+            'message': sample_text(index),
+            'date': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        }
+        for index in range(count)
+    ])
+    return handler
+
+def stored(handler):
+    return [tuple(row) for row in handler.conn.execute('SELECT message, dict_version FROM messages ORDER BY id')]
+
+def test_encode_decode_round_trip_through_message_text(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    handler = plain_database(path)
+    try:
+        codec = MessageCodec(path, enabled=True)
+        version = codec.train(handler.conn, sample_size=200, dict_size=4096)
+        text = sample_text(12345)
+        value, encoded_version = codec.encode(text)
+        assert isinstance(value, bytes) and encoded_version == version
+        assert len(value) < len(text.encode('utf-8'))
+        assert codec.decode(value, encoded_version) == text
+        # 过短的文本与非字符串保持原样
+        assert codec.encode('hi') == ('hi', None)
+        assert codec.encode(None) == (None, None)
+
+        # 另一个编解码器按需从数据库加载字典，经 message_text 函数透明解压
+        reader = MessageCodec(path)
+        reader.install(handler.conn)
+        row = handler.conn.execute('SELECT message_text(?, ?)', (value, version)).fetchone()
+        assert row[0] == text
+        assert handler.conn.execute("SELECT message_text('明文', NULL)").fetchone()[0] == '明文'
+    finally:
+        handler.close()
+
+def test_migrate_compresses_existing_rows_and_reads_back(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    handler = plain_database(path)
+    handler.close()
+
+    handler = DatabaseHandler(path, compress=True)
+    try:
+        handler.codec.train(handler.conn, sample_size=200, dict_size=4096)
+        updated, before, after = migrate(handler, decompress=False, recompress=False, chunk_size=64)
+        assert updated == 200 and after < before
+        assert all(isinstance(value, bytes) and version for value, version in stored(handler))
+        # 重新运行不会再次处理已压缩的行
+        assert migrate(handler, decompress=False, recompress=False, chunk_size=64)[0] == 0
+    finally:
+        handler.close()
+
+    # 运行中的进程经只读连接读取压缩行
+    adb = AsyncDatabase(path, readers=1)
+
+    async def read_back():
+        adb.start()
+        rows = await adb.recent_messages(CHAT_ID, limit=200)
+        return sorted(row['message'] for row in rows)
+
+    try:
+        assert asyncio.run(read_back()) == sorted(sample_text(index) for index in range(200))
+    finally:
+        adb.close()
+
+    handler = DatabaseHandler(path)
+    try:
+        assert migrate(handler, decompress=True, recompress=False, chunk_size=64)[0] == 200
+        assert stored(handler) == [(sample_text(index), None) for index in range(200)]
+    finally:
+        handler.close()
@@ -0,0 +1,156 @@
+"""发件箱测试：重复入队、崩溃后重放与过期清理"""
+
+import asyncio
+import sqlite3
+from core.outbox import Outbox
+
+class FakeClient:
+    """记录发送调用的假客户端"""
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    async def forward_messages(self, entity, messages, from_peer=None):
+        self.calls.append((entity, from_peer, messages))
+
+    async def send_message(self, entity, message='', **kwargs):
+        self.calls.append((entity, None, message))
+
+def forwards(count, destination='@target'):
+    return [
+        {'source_chat_id': -100, 'message_id': message_id, 'destination': destination}
+        for message_id in range(1, count + 1)
+    ]
+
+async def drain(outbox, timeout=5.0):
+    """等待内存中的记录全部发送完毕"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while outbox.pending and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    assert outbox.pending == 0
+
+def statuses(database):
+    conn = sqlite3.connect(database.db_path)
+    try:
+        return dict(conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+    finally:
+        conn.close()
+
+def test_duplicate_enqueue_is_ignored(database):
+    async def scenario():
+        client = FakeClient()
+        outbox = Outbox(workers=2)
+        await outbox.start(client)
+        try:
+            assert await outbox.enqueue(forwards(3)) == 3
+            assert await outbox.enqueue(forwards(3)) == 0
+            await drain(outbox)
+            # 已发送的记录再次入队也不会重复发送
+            assert await outbox.enqueue(forwards(4)) == 1
+            await drain(outbox)
+        finally:
+            await outbox.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    assert sorted(call[2] for call in client.calls) == [1, 2, 3, 4]
+    assert statuses(database) == {'done': 4}
+
+def test_pending_rows_replay_once_after_restart(database):
+    async def scenario():
+        # 模拟崩溃：记录已写入但工作者从未启动
+        crashed = Outbox()
+        await crashed.start(None)
+        await crashed.stop()
+        assert await crashed.enqueue(forwards(5)) == 5
+
+        client = FakeClient()
+        restarted = Outbox(workers=3)
+        await restarted.start(client)
+        await drain(restarted)
+        await restarted.stop()
+
+        again = Outbox()
+        await again.start(client)
+        await asyncio.sleep(0.05)
+        await again.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    assert sorted(call[2] for call in client.calls) == [1, 2, 3, 4, 5]
+    assert statuses(database) == {'done': 5}
+
+def test_deferred_rows_wait_for_release(database):
+    async def scenario():
+        client = FakeClient()
+        outbox = Outbox()
+        await outbox.start(client)
+        try:
+            items = forwards(2)
+            for item in items:
+                item['deferred'] = True
+            await outbox.enqueue(items)
+            await asyncio.sleep(0.05)
+            assert client.calls == []
+            assert await outbox.release_deferred() == 2
+            await drain(outbox)
+        finally:
+            await outbox.stop()
+        return client
+
+    assert len(asyncio.run(scenario()).calls) == 2
+
+def test_prune_removes_only_expired_finished_rows(database):
+    async def scenario():
+        outbox = Outbox(retention_hours=1)
+        await outbox.start(None)
+        await outbox.stop()
+        await outbox.enqueue(forwards(4))
+        await database.execute(
+            "UPDATE outbox SET status = 'done', updated_at = datetime('now', '-2 hours') WHERE message_id <= 2"
+        )
+        await database.execute("UPDATE outbox SET status = 'failed' WHERE message_id = 3")
+        return await outbox.prune()
+
+    assert asyncio.run(scenario()) == 2
+    assert statuses(database) == {'failed': 1, 'pending': 1}
+
+class FlakyClient(FakeClient):
+    """每个指定的 (来源聊天, 消息ID) 第一次发送失败"""
+
+    def __init__(self, failures) -> None:
+        super().__init__()
+        self.failures = set(failures)
+
+    async def forward_messages(self, entity, messages, from_peer=None):
+        await asyncio.sleep(0.001)
+        if (from_peer, messages) in self.failures:
+            self.failures.discard((from_peer, messages))
+            raise ConnectionError("模拟发送失败")
+        await super().forward_messages(entity, messages, from_peer)
+
+def test_retry_holds_later_rows_of_the_same_lane(database):
+    async def scenario():
+        client = FlakyClient({(-100, 1), (-100, 4)})
+        outbox = Outbox(workers=4)
+        outbox._retry_delay = lambda attempts: 0.05
+        await outbox.start(client)
+        try:
+            await outbox.enqueue(forwards(6))
+            await outbox.enqueue([
+                {'source_chat_id': -200, 'message_id': message_id, 'destination': '@target'}
+                for message_id in range(1, 4)
+            ])
+            await drain(outbox)
+        finally:
+            await outbox.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    chat_100 = [message_id for _, chat, message_id in client.calls if chat == -100]
+    assert chat_100 == [1, 2, 3, 4, 5, 6]
+    # 其他聊天不受重试等待影响，在 -100 的第一条重试完成之前就已发送
+    first_retry = next(i for i, call in enumerate(client.calls) if call[1] == -100)
+    assert [call[2] for call in client.calls[:first_retry]] == [1, 2, 3]
+    assert statuses(database) == {'done': 9}
@@ -0,0 +1,28 @@
+"""性能分析器测试：提前结束时等待采样线程并取消定时结束"""
+
+import os
+import asyncio
+from core.profiler import Profiler
+
+def test_early_finish_joins_sampler_and_cancels_timer(tmp_path):
+    profiler = Profiler(duration=60, sample_interval=0.001, output_dir=str(tmp_path))
+
+    async def scenario():
+        profiler.start()
+        sampler, timer = profiler._sampler, profiler._timer
+        deadline = asyncio.get_running_loop().time() + 0.2
+        while asyncio.get_running_loop().time() < deadline:
+            sum(range(1000))
+            await asyncio.sleep(0)
+        profiler.finish()
+        assert not sampler.is_alive()
+        assert timer.cancelled()
+        assert not profiler.running
+        # 重复调用不会再次写出结果
+        profiler.finish()
+
+    asyncio.run(scenario())
+    files = sorted(os.listdir(tmp_path))
+    assert [name.rsplit('.', 1)[1] for name in files] == ['collapsed', 'pstats']
+    with open(tmp_path / files[0], encoding='utf-8') as f:
+        assert f.read().strip()
@@ -0,0 +1,78 @@
+"""路由表测试：按聊天索引、作用域过滤与聊天类型判断"""
+
+import pytest
+from types import SimpleNamespace
+from telethon.tl.types import (
+    Channel, ChannelForbidden, Chat, ChatForbidden, ChatPhotoEmpty, User,
+    MessageMediaPhoto, MessageMediaDocument, Document, PhotoEmpty
+)
+from handlers.routing import RoutingIndex, media_kind
+from utils.message_tools import chat_type_of, print_text
+
+RULES = [
+    {'pattern': 'code_\\d+', 'bot': '@everywhere'},
+    {'pattern': 'code_\\d+', 'bot': '@only_a', 'chat_ids': [-100]},
+    {'pattern': 'code_\\d+', 'bot': '@only_b', 'chat_ids': -200},
+    {'pattern': 'code_\\d+', 'bot': '@alice', 'user_ids': [42]},
+    {'pattern': 'code_\\d+', 'bot': '@groups', 'chat_type': ['group', 'supergroup']},
+    {'pattern': '.*', 'bot': '@photos', 'media': 'photo'}
+]
+
+@pytest.fixture
+def routing():
+    return RoutingIndex(RULES)
+
+def test_chat_ids_scope_selects_rules_per_chat(routing):
+    assert routing.match(-100, 'code_1') == ['@everywhere', '@only_a']
+    assert routing.match(-200, 'code_1') == ['@everywhere', '@only_b']
+    assert routing.match(-300, 'code_1') == ['@everywhere']
+
+def test_wildcard_rules_keep_config_order_in_chat_buckets(routing):
+    bots = [rule['bot'] for rule in routing.lookup(-100)]
+    assert bots == ['@everywhere', '@only_a', '@alice', '@groups', '@photos']
+
+def test_user_chat_type_and_media_scopes(routing):
+    assert routing.match(-300, 'code_1', user_id=42) == ['@everywhere', '@alice']
+    assert routing.match(-300, 'code_1', chat_type='group') == ['@everywhere', '@groups']
+    assert routing.match(-300, 'code_1', chat_type='private') == ['@everywhere']
+    assert routing.match(-300, '[图片消息]', media='photo') == ['@photos']
+    assert routing.match(-300, 'no match') == []
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RoutingIndex([{'pattern': '('}])
+    with pytest.raises(ValueError):
+        RoutingIndex([{'pattern': '(', 'bot': '@x'}])
+    with pytest.raises(ValueError):
+        RoutingIndex([{'pattern': 'x', 'bot': '@x', 'chat_ids': ['abc']}])
+
+def test_media_kind():
+    assert media_kind(SimpleNamespace(media=None)) == 'text'
+    assert media_kind(SimpleNamespace(media=MessageMediaPhoto(photo=PhotoEmpty(id=1)))) == 'photo'
+    video = Document(
+        id=1, access_hash=0, file_reference=b'', date=None, mime_type='video/mp4',
+        size=1, dc_id=1, attributes=[]
+    )
+    assert media_kind(SimpleNamespace(media=MessageMediaDocument(document=video))) == 'video'
+
+def basic_group():
+    return Chat(id=1, title='group', photo=ChatPhotoEmpty(), participants_count=3, date=None, version=1)
+
+@pytest.mark.parametrize('chat, expected', [
+    (basic_group(), 'group'),
+    (ChatForbidden(id=1, title='gone'), 'group'),
+    (Channel(id=2, title='news', photo=ChatPhotoEmpty(), date=None, broadcast=True), 'channel'),
+    (Channel(id=3, title='chat', photo=ChatPhotoEmpty(), date=None, megagroup=True), 'supergroup'),
+    (ChannelForbidden(id=4, access_hash=0, title='gone', megagroup=True), 'supergroup'),
+    (User(id=5, first_name='user'), 'private'),
+    (None, None)
+])
+def test_chat_type_of(chat, expected):
+    assert chat_type_of(chat) == expected
+
+def test_group_scoped_rule_matches_basic_group_events(routing):
+    message = SimpleNamespace(chat_id=-1, date=None, media=None, text='code_7', raw_text='code_7', message='code_7')
+    event = SimpleNamespace(sender=None, message=message, chat=basic_group())
+    data = print_text(event, verbose=False, persist=False)
+    assert data['chat_type'] == 'group'
+    assert routing.match(-1, data['message'], chat_type=data['chat_type']) == ['@everywhere', '@groups']
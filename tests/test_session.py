@@ -0,0 +1,55 @@
+"""会话存储测试：与 SQLiteSession 的文件兼容性与后台写出"""
+
+import asyncio
+from telethon.crypto import AuthKey
+from telethon.sessions import SQLiteSession
+from telethon.sessions.sqlite import CURRENT_VERSION
+from core.session import BufferedSession, SESSION_VERSION
+
+AUTH_KEY = AuthKey(b'k' * 256)
+
+def make_session(path, entities=100, **kwargs):
+    session = BufferedSession(str(path), **kwargs)
+    session.set_dc(2, '149.154.167.51', 443)
+    session.auth_key = AUTH_KEY
+    for entity_id in range(1, entities + 1):
+        session._index_entity((entity_id, entity_id * 10, f'user{entity_id}', None, f'name{entity_id}', 0))
+    session._dirty = True
+    return session
+
+def test_written_file_opens_in_stock_sqlite_session_without_upgrade(tmp_path):
+    session = make_session(tmp_path / 'bot')
+    asyncio.run(session.flush_async())
+
+    assert SESSION_VERSION == CURRENT_VERSION
+    stock = SQLiteSession(str(tmp_path / 'bot'))
+    try:
+        assert stock._execute('select version from version') == (CURRENT_VERSION,)
+        assert stock.dc_id == 2
+        assert stock.auth_key.key == AUTH_KEY.key
+        assert stock.get_entity_rows_by_username('user7') == (7, 70)
+    finally:
+        stock.close()
+
+def test_reload_round_trip(tmp_path):
+    make_session(tmp_path / 'bot').flush()
+    reloaded = BufferedSession(str(tmp_path / 'bot'))
+    assert reloaded.auth_key.key == AUTH_KEY.key
+    assert reloaded.get_entity_rows_by_name('name42') == (42, 420)
+
+def test_older_snapshot_never_overwrites_newer_one(tmp_path):
+    session = make_session(tmp_path / 'bot')
+    stale = session._snapshot()
+    session.auth_key = AuthKey(b'n' * 256)
+    assert session._write_snapshot(*stale) is False
+    assert BufferedSession(str(tmp_path / 'bot')).auth_key.key == b'n' * 256
+
+def test_entity_limit_evicts_least_recently_used(tmp_path):
+    session = make_session(tmp_path / 'bot', entities=3, max_entities=3)
+    # 未变化的再次出现与按ID查找都算作使用
+    session._index_entity((1, 10, 'user1', None, 'name1', 1))
+    assert session.get_entity_rows_by_id(2) == (2, 20)
+    session._index_entity((4, 40, 'user4', None, 'name4', 0))
+    assert session.get_entity_rows_by_id(3) is None
+    assert session.get_entity_rows_by_username('user3') is None
+    assert [session.get_entity_rows_by_id(i) for i in (1, 2, 4)] == [(1, 10), (2, 20), (4, 40)]
@@ -0,0 +1,91 @@
+"""消息缓冲区测试：段回收后的重放与启动时数据库不可用"""
+
+import asyncio
+import sqlite3
+import datetime
+from core.db_handler import INSERT_MESSAGE_SQL
+from core.spool import Spool
+
+def message(index):
+    return {
+        'user_id': 1,
+        'chat_id': -100,
+        'message': f'spool {index:04d}',
+        'date': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    }
+
+def make_spool(tmp_path):
+    return Spool(directory=str(tmp_path / 'spool'), segment_size=64 * 1024, max_segments=4, compact_interval=0.01)
+
+def count_messages(database):
+    conn = sqlite3.connect(database.db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+    finally:
+        conn.close()
+
+async def wait_applied(spool, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while spool.backlog()[0] and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    assert spool.backlog()[0] == 0
+
+async def crash(spool):
+    """模拟进程被杀：停止后台任务，不导入剩余记录也不回收段"""
+    spool._task.cancel()
+    await asyncio.gather(spool._task, return_exceptions=True)
+    for segment in spool._segments:
+        segment.mm.close()
+        segment._file.close()
+
+def test_restart_crash_restart_replays_each_record_once(database, tmp_path):
+    async def scenario():
+        first = make_spool(tmp_path)
+        await first.start()
+        for index in range(100):
+            assert first.append(message(index))
+        await first.stop()
+
+        # 重启后复用已回收的段，新记录只覆盖旧记录的开头部分
+        second = make_spool(tmp_path)
+        await second.start()
+        for index in range(100, 110):
+            assert second.append(message(index))
+        await wait_applied(second)
+        await crash(second)
+
+        third = make_spool(tmp_path)
+        await third.start()
+        await third.stop()
+
+    asyncio.run(scenario())
+    assert count_messages(database) == 110
+
+def test_replay_failure_at_start_is_retried_in_background(database, tmp_path, monkeypatch):
+    async def scenario():
+        crashed = make_spool(tmp_path)
+        await crashed.start()
+        for index in range(20):
+            assert crashed.append(message(index))
+        await crash(crashed)
+
+        restarted = make_spool(tmp_path)
+        real_execute_group = database.execute_group
+        failures = []
+
+        async def locked_once(statements):
+            if not failures and statements[0][0] == INSERT_MESSAGE_SQL:
+                failures.append(True)
+                raise RuntimeError('数据库写入失败: database is locked')
+            return await real_execute_group(statements)
+
+        monkeypatch.setattr(database, 'execute_group', locked_once)
+        await restarted.start()
+        assert restarted.started and failures
+        await wait_applied(restarted)
+        assert restarted.append(message(20))
+        await restarted.stop()
+
+    asyncio.run(scenario())
+    assert count_messages(database) == 21
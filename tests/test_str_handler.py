@@ -0,0 +1,133 @@
+"""令牌提取测试：路由作用域、跨消息去重与消息处理器接线"""
+
+import asyncio
+import datetime
+from types import SimpleNamespace
+import pytest
+from core.outbox import Outbox
+from core.token_index import SeenTokenIndex
+from handlers.routing import RoutingIndex
+from handlers.message_handler import MessageHandler
+from handlers.str_handler import release_failed_tokens, str_handler
+from tests.test_outbox import FakeClient, drain
+
+RULES = [
+    {'pattern': 'tok_\\d+', 'bot': '@tokens', 'deliver': 'tokens'},
+    {'pattern': 'tok_\\d+', 'bot': '@only_a', 'chat_ids': [-100], 'deliver': 'tokens'},
+    {'pattern': 'tok_\\d+', 'bot': '@mirror'}
+]
+
+@pytest.fixture
+def pipeline(database, monkeypatch):
+    """替换为使用临时数据库的发件箱与令牌索引"""
+    outbox = Outbox(workers=2)
+    tokens = SeenTokenIndex(memory_size=100, max_rows=1000)
+    for module in ('handlers.str_handler', 'handlers.message_handler'):
+        monkeypatch.setattr(f'{module}.outbox', outbox)
+    monkeypatch.setattr('handlers.str_handler.seen_tokens', tokens)
+    return outbox, tokens
+
+def test_extract_follows_scopes_and_deliver_mode():
+    routing = RoutingIndex(RULES)
+    text = 'tok_1 tok_2 tok_1'
+    assert routing.extract(-100, text) == {
+        '@tokens': ['tok_1', 'tok_2', 'tok_1'],
+        '@only_a': ['tok_1', 'tok_2', 'tok_1']
+    }
+    assert routing.extract(-200, text) == {'@tokens': ['tok_1', 'tok_2', 'tok_1']}
+    assert routing.match(-200, text, deliver='forward') == ['@mirror']
+    # 未写 deliver 的旧规则仍然转发整条消息
+    assert RoutingIndex([{'pattern': 'x', 'bot': '@x'}]).extract(None, 'x') == {}
+    assert RoutingIndex([{'pattern': 'x', 'bot': '@x'}]).match(None, 'x', deliver='forward') == ['@x']
+    with pytest.raises(ValueError):
+        RoutingIndex([{'pattern': 'x', 'bot': '@x', 'deliver': 'mail'}])
+
+def test_only_new_tokens_are_sent(pipeline):
+    outbox, tokens = pipeline
+    routing = RoutingIndex(RULES)
+
+    async def scenario():
+        client = FakeClient()
+        await outbox.start(client)
+        await tokens.start()
+        try:
+            assert await str_handler('tok_1 tok_2 tok_1', -200, 1, routing=routing) == 1
+            await drain(outbox)
+            assert await str_handler('tok_2 tok_3', -200, 2, routing=routing) == 1
+            await drain(outbox)
+            # 重启后内存缓存为空，已发送的令牌由数据库去重
+            restarted = SeenTokenIndex(memory_size=100, max_rows=1000)
+            assert await restarted.filter_new('@tokens', ['tok_1', 'tok_4']) == ['tok_4']
+        finally:
+            await outbox.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client.calls == [('@tokens', None, 'tok_1\ntok_2'), ('@tokens', None, 'tok_3')]
+
+class FailFirstClient(FakeClient):
+    """第一次发送文本失败的假客户端"""
+
+    async def send_message(self, entity, message='', **kwargs):
+        if not getattr(self, 'failed', False):
+            self.failed = True
+            raise ConnectionError('网络错误')
+        await super().send_message(entity, message, **kwargs)
+
+def test_tokens_of_failed_sends_can_be_sent_again(database, monkeypatch):
+    outbox = Outbox(workers=1, max_attempts=1)
+    tokens = SeenTokenIndex(memory_size=100, max_rows=1000)
+    monkeypatch.setattr('handlers.str_handler.outbox', outbox)
+    monkeypatch.setattr('handlers.str_handler.seen_tokens', tokens)
+    outbox.add_failure_listener(release_failed_tokens)
+    routing = RoutingIndex(RULES)
+
+    async def scenario():
+        client = FailFirstClient()
+        await outbox.start(client)
+        await tokens.start()
+        try:
+            assert await str_handler('tok_1', -200, 1, routing=routing) == 1
+            await drain(outbox)
+            # 最终失败的令牌不会被永久跳过
+            assert await str_handler('tok_1', -200, 2, routing=routing) == 1
+            await drain(outbox)
+            assert await str_handler('tok_1', -200, 3, routing=routing) == 0
+        finally:
+            await outbox.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    assert client.calls == [('@tokens', None, 'tok_1')]
+
+def make_event(message_id, chat_id, text):
+    message = SimpleNamespace(
+        out=False, id=message_id, chat_id=chat_id, media=None,
+        message=text, text=text, raw_text=text,
+        date=datetime.datetime.now(datetime.timezone.utc)
+    )
+    return SimpleNamespace(chat_id=chat_id, message=message, sender=None, chat=None)
+
+def test_message_handler_sends_tokens_and_forwards(pipeline):
+    outbox, tokens = pipeline
+
+    async def scenario():
+        client = FakeClient()
+        await outbox.start(client)
+        await tokens.start()
+        handler = MessageHandler(client)
+        handler.target_channel = None
+        handler.routing = RoutingIndex(RULES)
+        try:
+            await handler.handle_message(make_event(7, -100, 'see tok_5'))
+            await drain(outbox)
+        finally:
+            await outbox.stop()
+        return client
+
+    client = asyncio.run(scenario())
+    assert sorted(client.calls, key=lambda call: call[0]) == [
+        ('@mirror', -100, 7),
+        ('@only_a', None, 'tok_5'),
+        ('@tokens', None, 'tok_5')
+    ]
@@ -0,0 +1,72 @@
+"""机器人主循环测试：任何退出路径都会执行 stop"""
+
+import os
+import signal
+import asyncio
+import pytest
+from core.Tgbot import Tgbot
+
+class FakeClient:
+    """只提供 run 所需接口的假客户端"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.disconnected = loop.create_future()
+
+    async def disconnect(self):
+        if not self.disconnected.done():
+            self.disconnected.set_result(None)
+
+@pytest.fixture
+def make_bot():
+    loops = []
+
+    def factory(on_start):
+        loop = asyncio.new_event_loop()
+        loops.append(loop)
+        bot = Tgbot.__new__(Tgbot)
+        bot.client = FakeClient(loop)
+        bot.calls = []
+
+        async def start():
+            bot.calls.append('start')
+            on_start(bot)
+
+        async def stop():
+            bot.calls.append('stop')
+
+        bot.start, bot.stop = start, stop
+        return bot
+
+    yield factory
+    for loop in loops:
+        loop.close()
+
+def test_stop_runs_after_client_disconnects(make_bot):
+    bot = make_bot(lambda bot: bot.client.loop.create_task(bot.client.disconnect()))
+    bot.run()
+    assert bot.calls == ['start', 'stop']
+
+def test_sigterm_disconnects_and_stops(make_bot):
+    bot = make_bot(lambda bot: bot.client.loop.call_later(0.01, os.kill, os.getpid(), signal.SIGTERM))
+    bot.run()
+    assert bot.calls == ['start', 'stop']
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
+
+def test_keyboard_interrupt_still_stops(make_bot):
+    def interrupt(bot):
+        raise KeyboardInterrupt
+
+    bot = make_bot(interrupt)
+    bot.run()
+    assert bot.calls == ['start', 'stop']
+
+def test_start_failure_stops_and_exits_with_error(make_bot):
+    def fail(bot):
+        raise RuntimeError('认证失败')
+
+    bot = make_bot(fail)
+    with pytest.raises(SystemExit) as excinfo:
+        bot.run()
+    assert excinfo.value.code == 1
+    assert bot.calls == ['start', 'stop']
@@ -1,18 +1,42 @@
 from typing import Optional, Dict, Any
-from telethon.tl.types import PeerChat, Channel
+from telethon.tl.types import Channel, ChannelForbidden, Chat, ChatForbidden, User
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageMediaDice
 from core.db_handler import db
 
-def print_text(event) -> Dict[str, Any]:
+def _silent(*args, **kwargs) -> None:
+    """静默模式下替代print的空操作"""
+
+def chat_type_of(chat: Any) -> Optional[str]:
+    """
+    根据聊天实体判断聊天类型
+    
+    参数:
+        chat: 聊天实体（event.chat）
+        
+    返回:
+        'channel'、'supergroup'、'group' 或 'private'，无法判断时返回None
+    """
+    if isinstance(chat, (Channel, ChannelForbidden)):
+        return 'channel' if chat.broadcast else 'supergroup'
+    if isinstance(chat, (Chat, ChatForbidden)):
+        return 'group'
+    if isinstance(chat, User):
+        return 'private'
+    return None
+
+def print_text(event, verbose: bool = True, persist: bool = True) -> Dict[str, Any]:
     """
     打印消息详细信息并返回结构化数据
     
     参数:
         event: Telegram事件对象
+        verbose: 是否在控制台打印消息详情
+        persist: 是否将消息保存到数据库
         
     返回:
         包含消息信息的字典
     """
+    emit = print if verbose else _silent
     data = {
         'username': '否',
         'first_name': '否',
@@ -32,69 +56,71 @@ def print_text(event) -> Dict[str, Any]:
         message = getattr(event, 'message', '')
         chat = getattr(event, 'chat', None)
         
-        print(f"\n📥 新消息!================================================")
+        emit(f"\n📥 新消息!================================================")
         
         # 处理发送者信息
         if sender:
             username = getattr(sender, 'username', None)
             if username:
-                print(f"🧔用户名: @{username}")
+                emit(f"🧔用户名: @{username}")
                 data['username'] = username
             
             first_name = getattr(sender, 'first_name', None)
             if first_name:
-                print(f"👤 名称: {first_name}")
+                emit(f"👤 名称: {first_name}")
                 data['first_name'] = first_name
             
             last_name = getattr(sender, 'last_name', None)
             if last_name:
-                print(f"👥 姓氏: {last_name}")
+                emit(f"👥 姓氏: {last_name}")
                 data['last_name'] = last_name
             
             user_id = getattr(sender, 'id', None)
             if user_id:
-                print(f"🆔 用户ID: {user_id}")
+                emit(f"🆔 用户ID: {user_id}")
                 data['user_id'] = user_id
             
             bot = getattr(sender, 'bot', False)
             if bot:
-                print(f"🤖 是否Bot: 是")
+                emit(f"🤖 是否Bot: 是")
                 data['is_bot'] = True
         
         # 处理消息时间和Chat ID
         if message:
             date = getattr(message, 'date', '')
             if date:
-                print(f"⏰ 发送时间: {date}")
+                emit(f"⏰ 发送时间: {date}")
                 data['date'] = date
             
             chat_id = getattr(message, 'chat_id', None)
             if chat_id:
-                print(f"🏠 Chat ID: {chat_id}")
+                emit(f"🏠 Chat ID: {chat_id}")
                 data['chat_id'] = chat_id
         
         # 处理聊天信息
         if chat:
-            if isinstance(chat, Channel):
-                if chat.broadcast:
-                    print(f"📢 这是频道: {chat.title}")
-                    data['chat_type'] = 'channel'
+            # event.chat 是聊天实体而不是 Peer，普通群组为 Chat/ChatForbidden
+            chat_type = chat_type_of(chat)
+            if chat_type in ('channel', 'supergroup'):
+                if chat_type == 'channel':
+                    emit(f"📢 这是频道: {chat.title}")
                 else:
-                    print(f"👥 这是超级群组: {chat.title}")
-                    data['chat_type'] = 'supergroup'
+                    emit(f"👥 这是超级群组: {chat.title}")
+                data['chat_type'] = chat_type
                 data['chat_title'] = chat.title
-            elif isinstance(chat, PeerChat):
-                print("👥 这是一个群组。")
+            elif chat_type == 'group':
+                emit(f"👥 这是一个群组: {chat.title}")
                 data['chat_type'] = 'group'
+                data['chat_title'] = chat.title
             else:
-                print("🏷️ 这是私人聊天。")
+                emit("🏷️ 这是私人聊天。")
                 data['chat_type'] = 'private'
 
         # 处理消息内容
         if message:
             if hasattr(message, 'media') and message.media:
                 media_type = type(message.media).__name__
-                print(f"📎 媒体类型: {media_type}")
+                emit(f"📎 媒体类型: {media_type}")
                 
                 if isinstance(message.media, MessageMediaPhoto):
                     media_text = '[图片消息]'
@@ -108,22 +134,23 @@ def print_text(event) -> Dict[str, Any]:
                 else:
                     media_text = f"[{media_type} 消息]"
                 
-                print(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n {media_text}")
+                emit(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n {media_text}")
                 data['message'] = media_text
             else:
                 # 检查是否有文本内容
                 text = getattr(message, 'text', None) or getattr(message, 'raw_text', None) or getattr(message, 'message', None)
                 if text:
-                    print(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n {text}")
+                    emit(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n {text}")
                     data['message'] = text
                 else:
-                    print(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n [空消息]")
+                    emit(f"💬 消息内容👇👇👇👇👇👇👇👇👇\n [空消息]")
                     data['message'] = '[空消息]'
         
-        print("\n")
+        emit("\n")
         
         # 保存数据到数据库
-        db.save_message(data)
+        if persist:
+            db.save_message(data)
         
         return data
         